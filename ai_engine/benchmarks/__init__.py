@@ -0,0 +1,3 @@
+"""
+Бенчмарки AI Engine (запуск из директории ai_engine: python -m benchmarks.<module>).
+"""
@@ -0,0 +1,91 @@
+"""
+Бенчмарк провайдеров эмбеддингов: секций в секунду для удаленного API и локальной модели.
+
+Запуск (из директории ai_engine):
+    python -m benchmarks.bench_embeddings --providers remote local --sections 500
+
+Для remote нужны OPENAI_API_KEY / YANDEX_API_KEY (или OPENAI_BASE_URL на локальный стенд),
+для local - установленный sentence-transformers.
+"""
+import argparse
+import asyncio
+import random
+import time
+from typing import List
+
+from services.embeddings import EMBEDDING_DIMENSION, LocalEmbeddingProvider, RemoteEmbeddingProvider
+from services.llm import LLMClient
+from config import settings
+
+_WORDS = (
+    "study patients randomized placebo dose efficacy safety endpoint adverse events "
+    "inclusion exclusion criteria visit screening baseline treatment arm analysis "
+    "population protocol investigator clinical phase pharmacokinetics"
+).split()
+
+
+def make_section_texts(count: int, seed: int = 42) -> List[str]:
+    """
+    Генерирует синтетические тексты секций: заголовок + ~500 символов контента,
+    как в _save_sections_to_db.
+    """
+    rng = random.Random(seed)
+    texts = []
+    for index in range(count):
+        header = f"{index // 10 + 1}.{index % 10 + 1} " + " ".join(rng.choices(_WORDS, k=3)).title()
+        body = " ".join(rng.choices(_WORDS, k=90))[:500]
+        texts.append(f"{header} {body}")
+    return texts
+
+
+async def run_provider(provider, texts: List[str], rounds: int) -> dict:
+    """
+    Прогоняет провайдер по текстам несколько раз (первый прогон - прогрев) и замеряет пропускную способность.
+    """
+    await provider.embed(texts[:2])  # warm-up: model load / connection setup
+
+    timings = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        vectors = await provider.embed(texts)
+        timings.append(time.perf_counter() - started)
+        assert len(vectors) == len(texts)
+        assert all(len(v) == EMBEDDING_DIMENSION for v in vectors)
+
+    best = min(timings)
+    return {
+        "provider": provider.name,
+        "sections": len(texts),
+        "best_seconds": round(best, 3),
+        "sections_per_second": round(len(texts) / best, 1),
+    }
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--providers", nargs="+", default=["local"], choices=["remote", "local"])
+    parser.add_argument("--sections", type=int, default=500)
+    parser.add_argument("--rounds", type=int, default=3)
+    args = parser.parse_args()
+
+    texts = make_section_texts(args.sections)
+    for name in args.providers:
+        if name == "remote":
+            provider = RemoteEmbeddingProvider(LLMClient(), batch_size=settings.EMBEDDING_BATCH_SIZE)
+        else:
+            provider = LocalEmbeddingProvider(
+                model_name=settings.LOCAL_EMBEDDING_MODEL,
+                backend=settings.LOCAL_EMBEDDING_BACKEND,
+                batch_size=settings.EMBEDDING_BATCH_SIZE,
+                workers=settings.LOCAL_EMBEDDING_WORKERS,
+                device=settings.LOCAL_EMBEDDING_DEVICE
+            )
+        result = await run_provider(provider, texts, args.rounds)
+        print(
+            f"{result['provider']:>6}: {result['sections']} sections in {result['best_seconds']}s "
+            f"-> {result['sections_per_second']} sections/s"
+        )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
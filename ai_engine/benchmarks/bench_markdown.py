@@ -0,0 +1,127 @@
+"""
+Бенчмарк рендеринга Markdown в HTML: MarkdownRenderer (markdown-it-py) против прежнего
+построчного Writer._markdown_to_html (только заголовки и абзацы).
+
+Запуск (из директории ai_engine):
+    python -m benchmarks.bench_markdown --sections 200 --rounds 5
+"""
+import argparse
+import random
+import time
+from typing import Callable, List
+
+from services.markdown_renderer import MarkdownRenderer
+
+_WORDS = (
+    "study patients randomized placebo dose efficacy safety endpoint adverse events "
+    "inclusion exclusion criteria visit screening baseline treatment arm analysis"
+).split()
+
+
+def legacy_markdown_to_html(markdown_text: str, title: str) -> str:
+    """
+    Прежняя реализация Writer._markdown_to_html (для сравнения).
+    Списки и таблицы не поддерживаются и выводятся как текст абзацев.
+    """
+    html_lines = []
+    in_paragraph = False
+
+    for line in markdown_text.split("\n"):
+        line_stripped = line.strip()
+
+        if line_stripped.startswith("# "):
+            if in_paragraph:
+                html_lines.append("</p>")
+                in_paragraph = False
+            html_lines.append(f"<h1>{line_stripped[2:]}</h1>")
+        elif line_stripped.startswith("## "):
+            if in_paragraph:
+                html_lines.append("</p>")
+                in_paragraph = False
+            html_lines.append(f"<h2>{line_stripped[3:]}</h2>")
+        elif line_stripped.startswith("### "):
+            if in_paragraph:
+                html_lines.append("</p>")
+                in_paragraph = False
+            html_lines.append(f"<h3>{line_stripped[4:]}</h3>")
+        elif line_stripped == "":
+            if in_paragraph:
+                html_lines.append("</p>")
+                in_paragraph = False
+        else:
+            if not in_paragraph:
+                html_lines.append("<p>")
+                in_paragraph = True
+            html_lines.append(line_stripped + " ")
+
+    if in_paragraph:
+        html_lines.append("</p>")
+
+    html = "".join(html_lines)
+    if not html.strip().startswith("<h1>") and not html.strip().startswith("<h2>"):
+        html = f"<h1>{title}</h1>{html}"
+    return html
+
+
+def make_section_markdown(index: int, rng: random.Random) -> str:
+    """
+    Генерирует типичный ответ LLM для клинической секции: заголовки, абзацы, списки и таблицу.
+    """
+    def sentence(words: int) -> str:
+        return " ".join(rng.choices(_WORDS, k=words)).capitalize() + "."
+
+    rows = "\n".join(
+        f"| Visit {row} | {rng.randint(1, 200)} | {rng.randint(0, 100)}% | {sentence(3)} |"
+        for row in range(1, 9)
+    )
+    return (
+        f"## {index}. {sentence(3)}\n\n"
+        f"{sentence(25)} {sentence(20)}\n{sentence(18)}\n\n"
+        f"### Inclusion criteria\n\n"
+        + "\n".join(f"- {sentence(8)}" for _ in range(6))
+        + "\n\n"
+        + "\n".join(f"{n}. {sentence(10)}" for n in range(1, 5))
+        + "\n\n| Visit | N | Response | Comment |\n|---|---:|---:|---|\n"
+        + rows
+        + f"\n\n{sentence(30)} **{sentence(4)}** *{sentence(3)}*\n"
+    )
+
+
+def run(render: Callable[[str, str], str], texts: List[str], rounds: int) -> float:
+    """Возвращает лучшее время рендеринга всех текстов за rounds прогонов."""
+    best = float("inf")
+    for _ in range(rounds):
+        started = time.perf_counter()
+        for text in texts:
+            render(text, "Section")
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sections", type=int, default=200)
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    texts = [make_section_markdown(index, rng) for index in range(args.sections)]
+    total_kb = sum(len(text) for text in texts) / 1024
+    renderer = MarkdownRenderer()
+
+    results = {
+        "legacy": run(legacy_markdown_to_html, texts, args.rounds),
+        "markdown-it": run(renderer.render_section, texts, args.rounds),
+    }
+    for name, seconds in results.items():
+        print(f"{name:>12}: {args.sections} sections ({total_kb:.0f} KB) in {seconds:.3f}s "
+              f"-> {total_kb / seconds:.0f} KB/s")
+
+    sample = renderer.render_section(texts[0], "Section")
+    legacy_sample = legacy_markdown_to_html(texts[0], "Section")
+    print("tables:", "<table>" in sample, "(legacy:", "<table>" in legacy_sample, ")")
+    print("lists: ", "<ul>" in sample and "<ol>" in sample, "(legacy:", "<ul>" in legacy_sample, ")")
+
+
+if __name__ == "__main__":
+    main()
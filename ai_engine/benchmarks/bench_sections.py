@@ -0,0 +1,195 @@
+"""
+Бенчмарк памяти секций документа: компактный Section (__slots__, content_text из Markdown
+при обращении, таблицы по ID из общего списка документа) против прежнего dataclass
+(копия текста в content_text и словарь content_structure со всеми таблицами страницы
+в каждой секции).
+
+Документ синтетический: --sections секций по --sections-per-page на страницу, на каждой
+странице --tables-per-page таблиц. Для каждого представления измеряется (tracemalloc)
+память, которую занимают секции между этапами обработки, пик при их создании и размер
+чекпоинта sections.json; "resumed" - секции, восстановленные из чекпоинта при повторной
+попытке задачи (в прежнем формате таблицы страницы копируются в каждую секцию).
+
+Запуск (из директории ai_engine):
+    python -m benchmarks.bench_sections --sections 5000
+"""
+import argparse
+import gc
+import json
+import random
+import tracemalloc
+from dataclasses import asdict, dataclass
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from services.types import Section, index_tables, markdown_to_text
+
+_WORDS = (
+    "study patients randomized placebo dose efficacy safety endpoint adverse events "
+    "inclusion exclusion criteria visit screening baseline treatment arm analysis"
+).split()
+
+# (section_number, header, content_markdown, page_number, hierarchy_level)
+RawSection = Tuple[str, str, str, int, int]
+
+
+@dataclass
+class LegacySection:
+    """Прежний services.types.Section (для сравнения)."""
+    section_number: Optional[str] = None
+    header: Optional[str] = None
+    content_text: Optional[str] = None
+    content_markdown: Optional[str] = None
+    content_structure: Optional[Dict[str, Any]] = None
+    page_number: Optional[int] = None
+    hierarchy_level: Optional[int] = None
+
+
+def make_document(
+    sections: int,
+    sections_per_page: int,
+    tables_per_page: int,
+    seed: int = 42
+) -> Tuple[List[RawSection], Dict[int, List[Dict[str, Any]]]]:
+    """Синтетические секции (как после разбора Markdown) и таблицы по страницам."""
+    rng = random.Random(seed)
+
+    def sentence(words: int) -> str:
+        return " ".join(rng.choices(_WORDS, k=words)).capitalize() + "."
+
+    raw: List[RawSection] = []
+    tables_data: Dict[int, List[Dict[str, Any]]] = {}
+    for index in range(sections):
+        page = index // sections_per_page + 1
+        if page not in tables_data:
+            tables_data[page] = [
+                {
+                    "type": "table",
+                    "headers": ["Visit", "Day", "Patients", "Procedure", "Comment"],
+                    "rows": [[f"V{row}", str(row * 7), str(rng.randint(20, 200)), sentence(3), sentence(5)]
+                             for row in range(12)],
+                    "row_count": 12,
+                    "column_count": 5,
+                    "has_merged_cells": False,
+                    "page_number": page,
+                }
+                for _ in range(tables_per_page)
+            ]
+        paragraphs = [" ".join(sentence(rng.randint(10, 18)) for _ in range(3)) for _ in range(3)]
+        markdown = f"[Page {page}]\n\n**{sentence(2)}** " + "\n\n".join(paragraphs) + "\n\n- " + sentence(6)
+        raw.append((f"{index // 10 + 1}.{index % 10 + 1}", sentence(3)[:-1], markdown, page, 2))
+    return raw, tables_data
+
+
+def build_legacy(raw: List[RawSection], tables_data: Dict[int, List[Dict[str, Any]]]) -> List[LegacySection]:
+    """Секции так, как их создавал прежний DoclingParser._split_into_sections."""
+    sections = []
+    for number, header, markdown, page, level in raw:
+        content_structure = None
+        if page in tables_data and tables_data[page]:
+            content_structure = {"tables": tables_data[page], "table_count": len(tables_data[page])}
+        sections.append(LegacySection(
+            section_number=number,
+            header=header,
+            content_text=markdown_to_text(markdown),
+            content_markdown=markdown,
+            content_structure=content_structure,
+            page_number=page,
+            hierarchy_level=level,
+        ))
+    return sections
+
+
+def build_compact(raw: List[RawSection], tables_data: Dict[int, List[Dict[str, Any]]]) -> List[Section]:
+    """Секции так, как их создает DoclingParser._split_into_sections."""
+    tables, table_ids_by_page = index_tables(tables_data)
+    return [
+        Section(
+            section_number=number,
+            header=header,
+            content_markdown=markdown,
+            page_number=page,
+            hierarchy_level=level,
+            table_ids=table_ids_by_page.get(page, ()),
+            tables=tables,
+        )
+        for number, header, markdown, page, level in raw
+    ]
+
+
+def measure(build: Callable[[], Any]) -> Tuple[Any, Dict[str, float]]:
+    """Память результата build() и пик во время построения (МБ)."""
+    gc.collect()
+    tracemalloc.start()
+    started_bytes = tracemalloc.get_traced_memory()[0]
+    result = build()
+    gc.collect()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, {
+        "retained_mb": round((current - started_bytes) / 1024 / 1024, 2),
+        "peak_mb": round((peak - started_bytes) / 1024 / 1024, 2),
+    }
+
+
+def run(sections: int, sections_per_page: int, tables_per_page: int) -> Dict[str, Dict[str, float]]:
+    raw, tables_data = make_document(sections, sections_per_page, tables_per_page)
+    tables, _ = index_tables(tables_data)
+    results: Dict[str, Dict[str, float]] = {}
+
+    legacy, results["legacy"] = measure(lambda: build_legacy(raw, tables_data))
+    legacy_checkpoint = json.dumps([asdict(section) for section in legacy])
+    results["legacy"]["checkpoint_kb"] = round(len(legacy_checkpoint) / 1024)
+    del legacy
+
+    compact, results["compact"] = measure(lambda: build_compact(raw, tables_data))
+    compact_checkpoint = json.dumps([section.to_dict() for section in compact])
+    results["compact"]["checkpoint_kb"] = round(len(compact_checkpoint) / 1024)
+    # Same data through the properties the pipeline reads
+    assert build_legacy(raw[:50], tables_data) == [
+        LegacySection(
+            section_number=s.section_number, header=s.header, content_text=s.content_text,
+            content_markdown=s.content_markdown, content_structure=s.content_structure,
+            page_number=s.page_number, hierarchy_level=s.hierarchy_level,
+        )
+        for s in compact[:50]
+    ]
+    del compact
+
+    _, results["legacy (resumed)"] = measure(
+        lambda: [LegacySection(**data) for data in json.loads(legacy_checkpoint)]
+    )
+    _, results["compact (resumed)"] = measure(
+        lambda: [Section.from_dict(data, tables) for data in json.loads(compact_checkpoint)]
+    )
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sections", type=int, nargs="+", default=[500, 5000])
+    parser.add_argument("--sections-per-page", type=int, default=4)
+    parser.add_argument("--tables-per-page", type=int, default=2)
+    parser.add_argument("--output", help="JSON с результатами")
+    args = parser.parse_args()
+
+    all_results = {}
+    for count in args.sections:
+        results = run(count, args.sections_per_page, args.tables_per_page)
+        all_results[f"sections_{count}"] = results
+        print(f"\n{count} sections ({args.sections_per_page} per page, {args.tables_per_page} tables per page)")
+        print(f"{'representation':<20} {'retained MB':>12} {'peak MB':>9} {'checkpoint KB':>14}")
+        for name, result in results.items():
+            print(
+                f"{name:<20} {result['retained_mb']:>12.1f} {result['peak_mb']:>9.1f} "
+                f"{result.get('checkpoint_kb', ''):>14}"
+            )
+        legacy, compact = results["legacy (resumed)"], results["compact (resumed)"]
+        print(f"resumed: {legacy['retained_mb'] / compact['retained_mb']:.1f}x less memory")
+
+    if args.output:
+        with open(args.output, "w") as output:
+            json.dump(all_results, output, indent=2)
+
+
+if __name__ == "__main__":
+    main()
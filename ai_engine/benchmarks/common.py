@@ -0,0 +1,159 @@
+"""
+Общие части бенчмарков, работающих с БД: подготовка проекта в локальной БД,
+подсчет SQL-запросов, перцентили и сравнение с baseline-файлом.
+"""
+import json
+import math
+import time
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+from sqlalchemy import Column, Table, event, text
+from sqlalchemy.dialects.postgresql import UUID
+
+BASELINES_DIR = Path(__file__).parent / "baselines"
+
+
+def register_projects_table() -> None:
+    """
+    Добавляет в метаданные моделей заглушку таблицы projects (таблица платформы, на которую
+    ссылаются внешние ключи моделей): без нее SQLAlchemy не может упорядочить вставки
+    и создать схему. Вызывается в каждом процессе бенчмарка, который пишет в БД через ORM.
+    """
+    import models  # noqa: F401 - registers the model tables in Base.metadata
+    from database import Base
+
+    if "projects" not in Base.metadata.tables:
+        Table("projects", Base.metadata, Column("id", UUID(as_uuid=True), primary_key=True))
+
+
+async def prepare_project(project_id: Optional[str] = None) -> str:
+    """
+    Возвращает проект для данных бенчмарка.
+    Без project_id создает схему моделей в пустой локальной БД (с заглушкой таблицы projects)
+    и проект в ней - только для одноразовой БД бенчмарка.
+    """
+    register_projects_table()
+    if project_id:
+        return project_id
+
+    from database import engine, init_db
+
+    await init_db()
+    project_id = str(uuid.uuid4())
+    async with engine.begin() as conn:
+        await conn.execute(text("INSERT INTO projects (id) VALUES (:id)"), {"id": project_id})
+    await engine.dispose()
+    return project_id
+
+
+class QueryCounter:
+    """
+    Счетчик SQL-запросов движка (события before_cursor_execute).
+
+    Пример:
+        counter = QueryCounter(engine)
+        with counter.measure() as queries:
+            await writer.generate_section(...)
+        print(queries["count"])
+    """
+
+    def __init__(self, engine):
+        self.total = 0
+        event.listen(getattr(engine, "sync_engine", engine), "before_cursor_execute", self._on_execute)
+
+    def _on_execute(self, *args) -> None:
+        self.total += 1
+
+    @contextmanager
+    def measure(self) -> Iterator[Dict[str, int]]:
+        result = {"count": 0}
+        started = self.total
+        try:
+            yield result
+        finally:
+            result["count"] = self.total - started
+
+
+@contextmanager
+def timer() -> Iterator[Dict[str, float]]:
+    """Измеряет wall time блока: result["seconds"] заполняется после выхода."""
+    result = {"seconds": 0.0}
+    started = time.perf_counter()
+    try:
+        yield result
+    finally:
+        result["seconds"] = time.perf_counter() - started
+
+
+def percentile(values: Iterable[float], percent: float) -> float:
+    """Перцентиль по ближайшему рангу: при нескольких прогонах p95 - самый медленный."""
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(percent / 100 * len(ordered)) - 1)]
+
+
+def compare_with_baseline(
+    results: Dict[str, Dict[str, Any]],
+    baseline: Dict[str, Dict[str, Any]],
+    threshold: float,
+    timing_metrics: List[str],
+    exact_metrics: List[str]
+) -> List[str]:
+    """
+    Возвращает описания регрессий относительно baseline (для всех метрик больше - хуже).
+
+    Args:
+        results: {случай: {метрика: значение}} текущего прогона
+        baseline: То же из baseline-файла
+        threshold: Допустимый относительный рост timing_metrics (0.2 - 20%)
+        timing_metrics: Метрики с разбросом (время, память)
+        exact_metrics: Детерминированные метрики (число запросов): регрессия - любой рост
+    """
+    regressions = []
+    for name, result in results.items():
+        reference = baseline.get(name)
+        if not reference:
+            continue
+        for metric in timing_metrics:
+            before, after = reference.get(metric), result.get(metric)
+            if before and after and after > before * (1 + threshold):
+                regressions.append(f"{name}: {metric} {before} -> {after} (+{(after / before - 1) * 100:.0f}%)")
+        for metric in exact_metrics:
+            before, after = reference.get(metric), result.get(metric)
+            if before is not None and after is not None and after > before:
+                regressions.append(f"{name}: {metric} {before} -> {after}")
+    return regressions
+
+
+def check_baseline(
+    results: Dict[str, Dict[str, Any]],
+    path: Path,
+    threshold: float,
+    timing_metrics: List[str],
+    exact_metrics: List[str]
+) -> List[str]:
+    """Сравнивает результаты с baseline-файлом (если он есть) и печатает регрессии."""
+    if not path.exists():
+        print(f"\nbaseline {path} not found (create it with --save-baseline)")
+        return []
+    baseline = json.loads(path.read_text())
+    regressions = compare_with_baseline(
+        results, baseline.get("results", {}), threshold, timing_metrics, exact_metrics
+    )
+    print(f"\nbaseline {path}: " + ("no regressions" if not regressions else "REGRESSIONS"))
+    for line in regressions:
+        print(f"  {line}")
+    return regressions
+
+
+def save_baseline(results: Dict[str, Dict[str, Any]], path: Path, settings: Dict[str, Any]) -> None:
+    """Записывает результаты и параметры прогона в baseline-файл."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps({
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "settings": settings,
+        "results": results,
+    }, indent=2, ensure_ascii=False, default=str))
+    print(f"baseline saved to {path}")
@@ -0,0 +1,240 @@
+"""
+Синтетические документы для бенчмарков: PDF и DOCX заданного числа страниц
+с нумерованными разделами, абзацами и таблицами (как в клинических протоколах).
+
+Файлы собираются без сторонних библиотек и детерминированы (seed), поэтому размеры
+и содержимое одинаковы от прогона к прогону.
+"""
+import random
+import zipfile
+from pathlib import Path
+from typing import List, Tuple, Union
+from xml.sax.saxutils import escape
+
+_WORDS = (
+    "study patients randomized placebo dose efficacy safety endpoint adverse events "
+    "inclusion exclusion criteria visit screening baseline treatment arm analysis "
+    "population protocol investigator clinical phase pharmacokinetics"
+).split()
+
+# Blocks: ("heading", level, text), ("paragraph", text), ("table", rows), ("page_break",)
+Block = Tuple
+_PARAGRAPHS_PER_PAGE = 4
+_TABLE_EVERY_PAGES = 3
+
+
+def make_outline(pages: int, seed: int = 42) -> List[Block]:
+    """
+    Содержимое документа: на странице - заголовок раздела (или подраздела), 4 абзаца,
+    на каждой третьей странице - таблица визитов.
+    """
+    rng = random.Random(seed)
+
+    def sentence(words: int) -> str:
+        return " ".join(rng.choices(_WORDS, k=words)).capitalize() + "."
+
+    blocks: List[Block] = []
+    chapter = 0
+    subsection = 0
+    for page in range(1, pages + 1):
+        if page % 4 == 1:
+            chapter += 1
+            subsection = 0
+            blocks.append(("heading", 1, f"{chapter}. {sentence(3)[:-1]}"))
+        else:
+            subsection += 1
+            blocks.append(("heading", 2, f"{chapter}.{subsection} {sentence(3)[:-1]}"))
+        for _ in range(_PARAGRAPHS_PER_PAGE):
+            blocks.append(("paragraph", " ".join(sentence(rng.randint(10, 18)) for _ in range(4))))
+        if page % _TABLE_EVERY_PAGES == 0:
+            rows = [["Visit", "Day", "Patients", "Procedure"]]
+            rows += [
+                [f"V{row}", str(row * 7), str(rng.randint(20, 200)), sentence(2)[:-1]]
+                for row in range(1, 7)
+            ]
+            blocks.append(("table", rows))
+        if page < pages:
+            blocks.append(("page_break",))
+    return blocks
+
+
+# ---------------------------------------------------------------- PDF
+
+def _pdf_text(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def _wrap(text: str, width: int) -> List[str]:
+    lines, current = [], ""
+    for word in text.split():
+        if current and len(current) + 1 + len(word) > width:
+            lines.append(current)
+            current = word
+        else:
+            current = f"{current} {word}" if current else word
+    if current:
+        lines.append(current)
+    return lines
+
+
+def _pdf_page_stream(blocks: List[Block]) -> bytes:
+    commands = []
+    y = 790.0
+
+    def text(x: float, font: str, size: int, value: str) -> None:
+        commands.append(f"BT /{font} {size} Tf {x:.1f} {y:.1f} Td ({_pdf_text(value)}) Tj ET")
+
+    for block in blocks:
+        if block[0] == "heading":
+            size = 15 if block[1] == 1 else 12
+            y -= 10
+            text(56, "F2", size, block[2])
+            y -= size + 8
+        elif block[0] == "paragraph":
+            for line in _wrap(block[1], 95):
+                text(56, "F1", 10, line)
+                y -= 13
+            y -= 6
+        elif block[0] == "table":
+            col_widths = (60, 60, 80, 280)
+            row_height = 16
+            for row in block[1]:
+                x = 56.0
+                for width, cell in zip(col_widths, row):
+                    commands.append(f"{x:.1f} {y - 4:.1f} {width} {row_height} re S")
+                    text(x + 4, "F2" if row is block[1][0] else "F1", 9, cell)
+                    x += width
+                y -= row_height
+            y -= 10
+    return "\n".join(commands).encode("latin-1")
+
+
+def write_pdf(path: Union[str, Path], pages: int, seed: int = 42) -> Path:
+    """Записывает PDF (A4, Helvetica) с pages страницами."""
+    page_blocks: List[List[Block]] = [[]]
+    for block in make_outline(pages, seed):
+        if block[0] == "page_break":
+            page_blocks.append([])
+        else:
+            page_blocks[-1].append(block)
+
+    # Object numbers: 1 catalog, 2 pages, 3-4 fonts, then page + content pairs
+    objects: List[bytes] = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        b"",  # pages tree, filled below
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica-Bold >>",
+    ]
+    kids = []
+    for blocks in page_blocks:
+        stream = _pdf_page_stream(blocks)
+        page_number = len(objects) + 1
+        kids.append(f"{page_number} 0 R")
+        objects.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+            f"/Resources << /Font << /F1 3 0 R /F2 4 0 R >> >> /Contents {page_number + 1} 0 R >>".encode()
+        )
+        objects.append(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {len(kids)} >>".encode()
+
+    output = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(output))
+        output += b"%d 0 obj\n" % number + body + b"\nendobj\n"
+    xref = len(output)
+    output += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    output += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    output += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+
+    path = Path(path)
+    path.write_bytes(bytes(output))
+    return path
+
+
+# ---------------------------------------------------------------- DOCX
+
+_CONTENT_TYPES = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">
+<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>
+<Default Extension="xml" ContentType="application/xml"/>
+<Override PartName="/word/document.xml" ContentType="application/vnd.openxmlformats-officedocument.wordprocessingml.document.main+xml"/>
+<Override PartName="/word/styles.xml" ContentType="application/vnd.openxmlformats-officedocument.wordprocessingml.styles+xml"/>
+</Types>"""
+
+_ROOT_RELS = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">
+<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="word/document.xml"/>
+</Relationships>"""
+
+_DOCUMENT_RELS = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">
+<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles" Target="styles.xml"/>
+</Relationships>"""
+
+_W = 'xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main"'
+
+_STYLES = f"""<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<w:styles {_W}>
+<w:style w:type="paragraph" w:default="1" w:styleId="Normal"><w:name w:val="Normal"/></w:style>
+<w:style w:type="paragraph" w:styleId="Heading1"><w:name w:val="heading 1"/><w:basedOn w:val="Normal"/>
+<w:pPr><w:outlineLvl w:val="0"/></w:pPr><w:rPr><w:b/><w:sz w:val="32"/></w:rPr></w:style>
+<w:style w:type="paragraph" w:styleId="Heading2"><w:name w:val="heading 2"/><w:basedOn w:val="Normal"/>
+<w:pPr><w:outlineLvl w:val="1"/></w:pPr><w:rPr><w:b/><w:sz w:val="26"/></w:rPr></w:style>
+<w:style w:type="table" w:styleId="TableGrid"><w:name w:val="Table Grid"/>
+<w:tblPr><w:tblBorders><w:top w:val="single" w:sz="4"/><w:left w:val="single" w:sz="4"/>
+<w:bottom w:val="single" w:sz="4"/><w:right w:val="single" w:sz="4"/>
+<w:insideH w:val="single" w:sz="4"/><w:insideV w:val="single" w:sz="4"/></w:tblBorders></w:tblPr></w:style>
+</w:styles>"""
+
+
+def _docx_paragraph(text: str, style: str = "") -> str:
+    properties = f'<w:pPr><w:pStyle w:val="{style}"/></w:pPr>' if style else ""
+    return f'<w:p>{properties}<w:r><w:t xml:space="preserve">{escape(text)}</w:t></w:r></w:p>'
+
+
+def _docx_table(rows: List[List[str]]) -> str:
+    body = "".join(
+        "<w:tr>" + "".join(f"<w:tc>{_docx_paragraph(cell)}</w:tc>" for cell in row) + "</w:tr>"
+        for row in rows
+    )
+    grid = "".join('<w:gridCol w:w="2000"/>' for _ in rows[0])
+    return f'<w:tbl><w:tblPr><w:tblStyle w:val="TableGrid"/></w:tblPr><w:tblGrid>{grid}</w:tblGrid>{body}</w:tbl>'
+
+
+def write_docx(path: Union[str, Path], pages: int, seed: int = 42) -> Path:
+    """Записывает DOCX с тем же содержимым, что и write_pdf (страницы разделены разрывами)."""
+    parts = []
+    for block in make_outline(pages, seed):
+        if block[0] == "heading":
+            parts.append(_docx_paragraph(block[2], f"Heading{block[1]}"))
+        elif block[0] == "paragraph":
+            parts.append(_docx_paragraph(block[1]))
+        elif block[0] == "table":
+            parts.append(_docx_table(block[1]))
+        else:
+            parts.append('<w:p><w:r><w:br w:type="page"/></w:r></w:p>')
+    document = (
+        f'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n<w:document {_W}><w:body>'
+        + "".join(parts)
+        + "</w:body></w:document>"
+    )
+
+    path = Path(path)
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr("[Content_Types].xml", _CONTENT_TYPES)
+        archive.writestr("_rels/.rels", _ROOT_RELS)
+        archive.writestr("word/_rels/document.xml.rels", _DOCUMENT_RELS)
+        archive.writestr("word/styles.xml", _STYLES)
+        archive.writestr("word/document.xml", document)
+    return path
+
+
+def write_document(path: Union[str, Path], pages: int, seed: int = 42) -> Path:
+    """Записывает PDF или DOCX в зависимости от расширения path."""
+    suffix = Path(path).suffix.lower()
+    if suffix == ".pdf":
+        return write_pdf(path, pages, seed)
+    if suffix == ".docx":
+        return write_docx(path, pages, seed)
+    raise ValueError(f"Unsupported fixture format: {suffix} (expected .pdf or .docx)")
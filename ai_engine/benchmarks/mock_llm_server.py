@@ -0,0 +1,269 @@
+"""
+Локальный OpenAI-совместимый сервер для бенчмарков: /v1/embeddings и /v1/chat/completions
+(включая stream) с настраиваемой задержкой, лимитом запросов и долей ошибок.
+
+Эмбеддинги детерминированы (зависят только от текста), поэтому прогоны воспроизводимы.
+Превышение лимита отвечает 429 с Retry-After и x-ratelimit-* заголовками, как у провайдера,
+чтобы в бенчмарк попадала и работа ResiliencePolicy (services/llm_resilience.py).
+
+Запуск (из директории ai_engine):
+    python -m benchmarks.mock_llm_server --port 8090 --latency-ms 80 --jitter-ms 20 --rps 20
+
+Клиенту: OPENAI_BASE_URL=http://127.0.0.1:8090/v1 OPENAI_API_KEY=bench
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import math
+import random
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+from services.embeddings import EMBEDDING_DIMENSION
+
+_WORDS = (
+    "study patients randomized placebo dose efficacy safety endpoint adverse events "
+    "inclusion exclusion criteria visit screening baseline treatment arm analysis "
+    "population protocol investigator clinical phase pharmacokinetics"
+).split()
+
+
+@dataclass
+class MockLLMConfig:
+    """Параметры поведения сервера."""
+    latency_ms: float = 50.0  # базовая задержка ответа
+    jitter_ms: float = 10.0  # равномерный разброс задержки (+/-)
+    per_item_ms: float = 0.5  # дополнительная задержка на текст эмбеддинга / токен ответа
+    rps: float = 0.0  # лимит запросов в секунду (0 - без лимита)
+    failure_rate: float = 0.0  # доля ответов 500
+    completion_tokens: int = 400  # длина ответа чата в словах (не больше max_tokens)
+    stream_chunk_words: int = 8
+    seed: int = 42
+
+
+class _Window:
+    """Лимит запросов: фиксированное окно в 1 секунду."""
+
+    def __init__(self, rps: float):
+        self.rps = rps
+        self.window_started = time.monotonic()
+        self.count = 0
+
+    def allow(self) -> Optional[float]:
+        """Возвращает None, если запрос разрешен, иначе - секунды до следующего окна."""
+        if self.rps <= 0:
+            return None
+        now = time.monotonic()
+        if now - self.window_started >= 1.0:
+            self.window_started = now
+            self.count = 0
+        if self.count < self.rps:
+            self.count += 1
+            return None
+        return max(0.0, 1.0 - (now - self.window_started))
+
+
+def mock_embedding(text: str, dimension: int = EMBEDDING_DIMENSION) -> List[float]:
+    """Детерминированный нормированный вектор для текста."""
+    rng = random.Random(hashlib.sha256(text.encode("utf-8")).digest())
+    vector = [rng.gauss(0.0, 1.0) for _ in range(dimension)]
+    norm = math.sqrt(sum(value * value for value in vector)) or 1.0
+    return [value / norm for value in vector]
+
+
+def create_app(config: MockLLMConfig) -> FastAPI:
+    """
+    Создает приложение сервера. Счетчики запросов доступны на GET /v1/_stats
+    (requests, throttled, failed по операциям).
+    """
+    app = FastAPI(title="Mock LLM API")
+    window = _Window(config.rps)
+    rng = random.Random(config.seed)
+    stats: Dict[str, Dict[str, int]] = {}
+
+    def count(operation: str, outcome: str) -> None:
+        entry = stats.setdefault(operation, {"requests": 0, "throttled": 0, "failed": 0, "items": 0})
+        entry[outcome] += 1
+
+    async def admit(operation: str, items: int) -> Optional[JSONResponse]:
+        retry_after = window.allow()
+        if retry_after is not None:
+            count(operation, "throttled")
+            return JSONResponse(
+                {"error": {"message": "Rate limit exceeded", "type": "rate_limit_error"}},
+                status_code=429,
+                headers={
+                    "retry-after": f"{retry_after:.3f}",
+                    "x-ratelimit-remaining-requests": "0",
+                    "x-ratelimit-reset-requests": f"{retry_after:.3f}s",
+                },
+            )
+        count(operation, "requests")
+        stats[operation]["items"] += items
+        delay = config.latency_ms + rng.uniform(-config.jitter_ms, config.jitter_ms) + config.per_item_ms * items
+        await asyncio.sleep(max(0.0, delay) / 1000)
+        if config.failure_rate and rng.random() < config.failure_rate:
+            count(operation, "failed")
+            return JSONResponse({"error": {"message": "Injected failure", "type": "server_error"}}, status_code=500)
+        return None
+
+    def completion_text(seed_text: str, max_tokens: Optional[int]) -> str:
+        words = min(config.completion_tokens, max_tokens or config.completion_tokens)
+        text_rng = random.Random(hashlib.sha256(seed_text.encode("utf-8")).digest())
+        return " ".join(text_rng.choices(_WORDS, k=words)).capitalize() + "."
+
+    @app.post("/v1/embeddings")
+    async def embeddings(request: Request):
+        body = await request.json()
+        texts = body["input"] if isinstance(body["input"], list) else [body["input"]]
+        rejected = await admit("embed", len(texts))
+        if rejected is not None:
+            return rejected
+        dimension = body.get("dimensions") or EMBEDDING_DIMENSION
+        return {
+            "object": "list",
+            "model": body.get("model", "mock-embedding"),
+            "data": [
+                {"object": "embedding", "index": index, "embedding": mock_embedding(text, dimension)}
+                for index, text in enumerate(texts)
+            ],
+            "usage": {"prompt_tokens": sum(len(text.split()) for text in texts), "total_tokens": 0},
+        }
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        prompt = "\n".join(str(message.get("content", "")) for message in body.get("messages", []))
+        text = completion_text(prompt, body.get("max_tokens"))
+        words = text.split(" ")
+        model = body.get("model", "mock-llm")
+        prompt_tokens = len(prompt.split())
+
+        if not body.get("stream"):
+            rejected = await admit("generate", len(words))
+            if rejected is not None:
+                return rejected
+            return {
+                "id": "chatcmpl-mock",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": text},
+                    "finish_reason": "stop",
+                }],
+                "usage": {
+                    "prompt_tokens": prompt_tokens,
+                    "completion_tokens": len(words),
+                    "total_tokens": prompt_tokens + len(words),
+                },
+            }
+
+        # Streaming: latency applies to the first chunk, per_item_ms to every word
+        rejected = await admit("stream", 0)
+        if rejected is not None:
+            return rejected
+
+        async def events():
+            step = max(1, config.stream_chunk_words)
+            for start in range(0, len(words), step):
+                chunk_words = words[start:start + step]
+                await asyncio.sleep(config.per_item_ms * len(chunk_words) / 1000)
+                content = " ".join(chunk_words) + (" " if start + step < len(words) else "")
+                chunk = {
+                    "id": "chatcmpl-mock",
+                    "object": "chat.completion.chunk",
+                    "created": int(time.time()),
+                    "model": model,
+                    "choices": [{"index": 0, "delta": {"content": content}, "finish_reason": None}],
+                }
+                yield f"data: {json.dumps(chunk)}\n\n"
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    @app.get("/v1/_stats")
+    async def get_stats():
+        return stats
+
+    @app.post("/v1/_stats/reset")
+    async def reset_stats():
+        stats.clear()
+        return stats
+
+    return app
+
+
+class MockLLMServer:
+    """
+    Сервер в фоновом потоке текущего процесса (для бенчмарков).
+
+    Пример:
+        with MockLLMServer(MockLLMConfig(latency_ms=80, rps=20)) as server:
+            os.environ["OPENAI_BASE_URL"] = server.base_url
+    """
+
+    def __init__(self, config: MockLLMConfig, host: str = "127.0.0.1", port: int = 0):
+        self.config = config
+        self._server = uvicorn.Server(
+            uvicorn.Config(create_app(config), host=host, port=port, log_level="warning")
+        )
+        self._thread = threading.Thread(target=self._server.run, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.servers[0].sockets[0].getsockname()[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self) -> "MockLLMServer":
+        self._thread.start()
+        while not self._server.started:
+            if not self._thread.is_alive():
+                raise RuntimeError("Mock LLM server failed to start")
+            time.sleep(0.01)
+        return self
+
+    def stop(self) -> None:
+        self._server.should_exit = True
+        self._thread.join(timeout=5)
+
+    def __enter__(self) -> "MockLLMServer":
+        return self.start()
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8090)
+    parser.add_argument("--latency-ms", type=float, default=50.0)
+    parser.add_argument("--jitter-ms", type=float, default=10.0)
+    parser.add_argument("--per-item-ms", type=float, default=0.5)
+    parser.add_argument("--rps", type=float, default=0.0)
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    parser.add_argument("--completion-tokens", type=int, default=400)
+    args = parser.parse_args()
+
+    config = MockLLMConfig(
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        per_item_ms=args.per_item_ms,
+        rps=args.rps,
+        failure_rate=args.failure_rate,
+        completion_tokens=args.completion_tokens,
+    )
+    uvicorn.run(create_app(config), host=args.host, port=args.port, log_level="info")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,36 @@
 """
 Celery application configuration.
 Initializes Celery with Redis as broker and backend.
+
+Tasks are routed to separate queues per workload, so a bulk re-ingestion
+does not starve interactive uploads, exports or generation:
+- parse_interactive - single document uploads (POST /api/v1/parse)
+- parse_large - documents estimated as large (see tasks.parse_queue), served by a worker
+  with low concurrency and a higher memory limit
+- parse_bulk - batch ingestion (POST /api/v1/parse/batch) and its finalization
+- export - document export (Pandoc)
+- generation - section generation (LLM)
+Each queue can be served by its own worker with its own concurrency (see docker-compose.yml).
 """
 from celery import Celery
+from kombu import Queue
+
 from config import settings
 
+# Queue names
+QUEUE_PARSE_INTERACTIVE = "parse_interactive"
+QUEUE_PARSE_LARGE = "parse_large"
+QUEUE_PARSE_BULK = "parse_bulk"
+QUEUE_EXPORT = "export"
+QUEUE_GENERATION = "generation"
+QUEUES = (QUEUE_PARSE_INTERACTIVE, QUEUE_PARSE_LARGE, QUEUE_PARSE_BULK, QUEUE_EXPORT, QUEUE_GENERATION)
+
+# Message priorities within a queue (Redis transport: lower value is served first)
+PRIORITY_HIGH = 0
+PRIORITY_NORMAL = 3
+PRIORITY_LOW = 6
+PRIORITY_STEPS = [0, 3, 6, 9]
+
 # Create Celery app instance
 celery_app = Celery(
     "ai_engine",
@@ -24,5 +50,39 @@ celery_app.conf.update(
     task_time_limit=30 * 60,  # 30 minutes max task time
     task_soft_time_limit=25 * 60,  # 25 minutes soft limit
     worker_prefetch_multiplier=1,  # Process one task at a time for better resource control
-    worker_max_tasks_per_child=50,  # Restart worker after 50 tasks to prevent memory leaks
+    # Recycle a pool process after the task that pushed its peak RSS over the limit (KiB),
+    # not after a fixed number of tasks: warm Docling models survive small documents
+    worker_max_memory_per_child=settings.WORKER_MAX_MEMORY_MB * 1024 or None,
+    worker_max_tasks_per_child=settings.WORKER_MAX_TASKS_PER_CHILD or None,
+    # Results are compact summaries (full results are stored in Postgres)
+    result_expires=settings.CELERY_RESULT_EXPIRES_SECONDS,
+    # Routing: a worker started without -Q consumes all queues, in the order listed here
+    task_queues=[Queue(name, routing_key=name) for name in QUEUES],
+    task_default_queue=QUEUE_PARSE_INTERACTIVE,
+    task_routes={
+        "ai_engine.process_document": {"queue": QUEUE_PARSE_INTERACTIVE},  # overridden by tasks.parse_queue
+        "ai_engine.finalize_ingestion_batch": {"queue": QUEUE_PARSE_BULK},
+        "ai_engine.export_deliverable": {"queue": QUEUE_EXPORT},
+        "ai_engine.generate_section": {"queue": QUEUE_GENERATION},
+    },
+    task_default_priority=PRIORITY_NORMAL,
+    broker_transport_options={
+        "priority_steps": PRIORITY_STEPS,
+        "sep": ":",  # priority sub-queues are stored as <queue>:<priority> (see services/queue_metrics.py)
+        "queue_order_strategy": "priority",  # a worker serving several queues drains them in QUEUES order
+    },
 )
+
+# Queue wait/run time samples for GET /api/v1/queues/metrics
+from services.queue_metrics import register_signal_handlers  # noqa: E402
+# Prometheus exporter of the worker (see services/metrics.py)
+from services.metrics import register_worker_exporter  # noqa: E402
+# OpenTelemetry in pool processes (see services/tracing.py)
+from services.tracing import register_worker_tracing  # noqa: E402
+# Per-task RSS and memory release (see services/worker_memory.py)
+from services.worker_memory import register_memory_tracking  # noqa: E402
+
+register_signal_handlers(celery_app)
+register_worker_exporter(celery_app)
+register_worker_tracing(celery_app)
+register_memory_tracking(celery_app)
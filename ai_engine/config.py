@@ -3,6 +3,7 @@
 Загрузка переменных окружения из .env файла.
 """
 import os
+import tempfile
 from typing import Optional
 from urllib.parse import quote_plus
 from dotenv import load_dotenv
@@ -83,11 +84,113 @@ class Settings:
     SUPABASE_URL: Optional[str] = os.getenv("SUPABASE_URL")
     SUPABASE_KEY: Optional[str] = os.getenv("SUPABASE_KEY")
     SUPABASE_STORAGE_BUCKET: str = os.getenv("SUPABASE_STORAGE_BUCKET", "documents")
+    # Хранилище файлов документов: 'supabase' или 'local' (локальная директория, для бенчмарков и разработки)
+    STORAGE_BACKEND: str = os.getenv("STORAGE_BACKEND", "supabase")
+    LOCAL_STORAGE_DIR: str = os.getenv("LOCAL_STORAGE_DIR", "storage")
     
     # Celery (Redis)
     CELERY_BROKER_URL: str = os.getenv("CELERY_BROKER_URL", "redis://localhost:6379/0")
     CELERY_RESULT_BACKEND: str = os.getenv("CELERY_RESULT_BACKEND", "redis://localhost:6379/0")
     
+    # Память Celery worker'ов: процесс пула перезапускается после задачи, если его пиковый RSS
+    # превысил WORKER_MAX_MEMORY_MB (0 - без ограничения); WORKER_MAX_TASKS_PER_CHILD - страховка от утечек (0 - выключена)
+    WORKER_MAX_MEMORY_MB: int = int(os.getenv("WORKER_MAX_MEMORY_MB", "2048"))
+    WORKER_MAX_TASKS_PER_CHILD: int = int(os.getenv("WORKER_MAX_TASKS_PER_CHILD", "0"))
+    # Документы от этих размеров обрабатываются в очереди parse_large (worker с запасом памяти)
+    PARSE_LARGE_MIN_BYTES: int = int(os.getenv("PARSE_LARGE_MIN_BYTES", str(20 * 1024 * 1024)))
+    PARSE_LARGE_MIN_PAGES: int = int(os.getenv("PARSE_LARGE_MIN_PAGES", "150"))
+    
+    # Устойчивость вызовов LLM API (ретраи, лимитер, hedging)
+    LLM_MAX_ATTEMPTS: int = int(os.getenv("LLM_MAX_ATTEMPTS", "5"))
+    LLM_RETRY_BASE_DELAY: float = float(os.getenv("LLM_RETRY_BASE_DELAY", "1.0"))
+    LLM_RETRY_MAX_DELAY: float = float(os.getenv("LLM_RETRY_MAX_DELAY", "30.0"))
+    LLM_REQUEST_TIMEOUT: float = float(os.getenv("LLM_REQUEST_TIMEOUT", "120.0"))
+    LLM_RATE_LIMIT_RPS: float = float(os.getenv("LLM_RATE_LIMIT_RPS", "0"))  # 0 - без ограничения
+    LLM_RATE_LIMIT_BURST: float = float(os.getenv("LLM_RATE_LIMIT_BURST", "0"))  # 0 - равен RPS
+    LLM_HEDGE_DELAY_SECONDS: float = float(os.getenv("LLM_HEDGE_DELAY_SECONDS", "0"))  # 0 - hedging выключен
+    
+    # Эмбеддинги: 'remote' (OpenAI/YandexGPT API) или 'local' (sentence-transformers на CPU)
+    EMBEDDING_PROVIDER: str = os.getenv("EMBEDDING_PROVIDER", "remote")
+    EMBEDDING_BATCH_SIZE: int = int(os.getenv("EMBEDDING_BATCH_SIZE", "64"))
+    LOCAL_EMBEDDING_MODEL: str = os.getenv(
+        "LOCAL_EMBEDDING_MODEL", "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2"
+    )
+    LOCAL_EMBEDDING_BACKEND: str = os.getenv("LOCAL_EMBEDDING_BACKEND", "torch")  # 'torch' или 'onnx'
+    LOCAL_EMBEDDING_WORKERS: int = int(os.getenv("LOCAL_EMBEDDING_WORKERS", "2"))
+    LOCAL_EMBEDDING_DEVICE: str = os.getenv("LOCAL_EMBEDDING_DEVICE", "cpu")
+    
+    # Фрагменты (чанки) секций с собственными эмбеддингами (source_section_chunks)
+    CHUNK_EMBEDDINGS_ENABLED: bool = os.getenv("CHUNK_EMBEDDINGS_ENABLED", "true").lower() == "true"
+    CHUNK_MAX_TOKENS: int = int(os.getenv("CHUNK_MAX_TOKENS", "400"))
+    CHUNK_OVERLAP_TOKENS: int = int(os.getenv("CHUNK_OVERLAP_TOKENS", "60"))  # Перекрытие соседних фрагментов
+    
+    # Гибридный поиск по source_sections (страховка, когда маппинги Template Graph ничего не нашли)
+    HYBRID_SEARCH_ENABLED: bool = os.getenv("HYBRID_SEARCH_ENABLED", "true").lower() == "true"
+    HYBRID_SEARCH_LIMIT: int = int(os.getenv("HYBRID_SEARCH_LIMIT", "5"))  # Секций в результате
+    HYBRID_SEARCH_CANDIDATES: int = int(os.getenv("HYBRID_SEARCH_CANDIDATES", "50"))  # Кандидатов каждой ветки
+    HYBRID_SEARCH_RRF_K: int = int(os.getenv("HYBRID_SEARCH_RRF_K", "60"))
+    HYBRID_SEARCH_MIN_SIMILARITY: float = float(os.getenv("HYBRID_SEARCH_MIN_SIMILARITY", "0.3"))
+    HYBRID_SEARCH_EF_SEARCH: int = int(os.getenv("HYBRID_SEARCH_EF_SEARCH", "100"))  # hnsw.ef_search
+    HYBRID_SEARCH_ITERATIVE_SCAN: str = os.getenv("HYBRID_SEARCH_ITERATIVE_SCAN", "relaxed_order")  # pgvector >= 0.8, '' - выкл.
+    
+    # Кэш ответов LLM (opt-in)
+    LLM_CACHE_ENABLED: bool = os.getenv("LLM_CACHE_ENABLED", "false").lower() == "true"
+    LLM_CACHE_BACKEND: str = os.getenv("LLM_CACHE_BACKEND", "memory")  # 'memory' или 'redis'
+    LLM_CACHE_TTL_SECONDS: int = int(os.getenv("LLM_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+    LLM_CACHE_MAX_ENTRIES: int = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "1000"))
+    LLM_CACHE_REDIS_URL: Optional[str] = os.getenv("LLM_CACHE_REDIS_URL")  # по умолчанию CELERY_BROKER_URL
+    
+    # Чекпоинты этапов обработки документов (для дешевых повторных попыток)
+    INGESTION_CHECKPOINT_DIR: str = os.getenv(
+        "INGESTION_CHECKPOINT_DIR", os.path.join(tempfile.gettempdir(), "ai_engine_checkpoints")
+    )
+    INGESTION_CHECKPOINT_TTL_HOURS: float = float(os.getenv("INGESTION_CHECKPOINT_TTL_HOURS", "48"))
+    
+    # Экспорт документов (Pandoc)
+    EXPORT_DIR: str = os.getenv(
+        "EXPORT_DIR", os.path.join(tempfile.gettempdir(), "ai_engine_exports")
+    )  # должна быть общей для API и Celery worker (общий volume)
+    # Файлы фоновых экспортов в EXPORT_DIR (после срока хранения результата задачи скачать их уже нельзя)
+    EXPORT_TTL_HOURS: float = float(os.getenv("EXPORT_TTL_HOURS", "24"))
+    EXPORT_MAX_WORKERS: int = int(os.getenv("EXPORT_MAX_WORKERS", str(os.cpu_count() or 2)))
+    EXPORT_STREAM_BATCH_SIZE: int = int(os.getenv("EXPORT_STREAM_BATCH_SIZE", "50"))  # секций за выборку курсора
+    EXPORT_PDF_ENGINE: str = os.getenv("EXPORT_PDF_ENGINE", "wkhtmltopdf")  # движок pandoc для PDF (wkhtmltopdf, weasyprint, xelatex)
+    EXPORT_CACHE_ENABLED: bool = os.getenv("EXPORT_CACHE_ENABLED", "true").lower() == "true"
+    EXPORT_CACHE_DIR: str = os.getenv(
+        "EXPORT_CACHE_DIR", os.path.join(tempfile.gettempdir(), "ai_engine_export_cache")
+    )
+    EXPORT_CACHE_TTL_HOURS: float = float(os.getenv("EXPORT_CACHE_TTL_HOURS", str(7 * 24)))
+    
+    # Прогресс пакетной загрузки документов (Redis)
+    BATCH_PROGRESS_TTL_SECONDS: int = int(os.getenv("BATCH_PROGRESS_TTL_SECONDS", str(7 * 24 * 3600)))
+    
+    # Метрики очередей Celery (глубина, время ожидания и выполнения)
+    QUEUE_METRICS_ENABLED: bool = os.getenv("QUEUE_METRICS_ENABLED", "true").lower() == "true"
+    QUEUE_METRICS_SAMPLES: int = int(os.getenv("QUEUE_METRICS_SAMPLES", "500"))  # последних выборок на очередь
+    
+    # Результаты Celery-задач в Redis (полные результаты хранятся в Postgres)
+    CELERY_RESULT_EXPIRES_SECONDS: int = int(os.getenv("CELERY_RESULT_EXPIRES_SECONDS", str(24 * 3600)))
+    
+    # Метрики Prometheus (API: GET /metrics; Celery worker: HTTP-экспортер на этом порту, 0 - выключен)
+    METRICS_WORKER_PORT: int = int(os.getenv("METRICS_WORKER_PORT", "9808"))
+    
+    # Трассировка OpenTelemetry (opt-in, нужен opentelemetry-sdk)
+    TRACING_ENABLED: bool = os.getenv("TRACING_ENABLED", "false").lower() == "true"
+    TRACING_EXPORTER: str = os.getenv("TRACING_EXPORTER", "otlp")  # 'otlp', 'console' или 'file'
+    TRACING_OTLP_ENDPOINT: str = os.getenv("TRACING_OTLP_ENDPOINT", "http://localhost:4318/v1/traces")
+    TRACING_FILE_PATH: str = os.getenv(
+        "TRACING_FILE_PATH", os.path.join(tempfile.gettempdir(), "ai_engine_traces.jsonl")
+    )
+    TRACING_SAMPLE_RATIO: float = float(os.getenv("TRACING_SAMPLE_RATIO", "1.0"))
+    
+    # Профилирование отдельных запусков по запросу (X-Profile / ?profile=true / profile=True, нужен pyinstrument)
+    PROFILING_ENABLED: bool = os.getenv("PROFILING_ENABLED", "false").lower() == "true"
+    PROFILING_DIR: str = os.getenv(
+        "PROFILING_DIR", os.path.join(tempfile.gettempdir(), "ai_engine_profiles")
+    )  # должна быть общей для API и Celery worker (общий volume)
+    PROFILING_INTERVAL_SECONDS: float = float(os.getenv("PROFILING_INTERVAL_SECONDS", "0.001"))
+    PROFILING_TTL_HOURS: float = float(os.getenv("PROFILING_TTL_HOURS", str(7 * 24)))
+    
     # Настройки приложения
     APP_NAME: str = "AI Engine"
     APP_VERSION: str = "1.0.0"
@@ -6,6 +6,7 @@ from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sess
 from sqlalchemy.orm import declarative_base
 from sqlalchemy.pool import NullPool
 from config import settings
+from services.metrics import instrument_engine
 
 # Базовый класс для моделей
 Base = declarative_base()
@@ -108,6 +109,9 @@ engine = create_async_engine(
     **get_engine_kwargs()
 )
 
+# Счетчики соединений для метрик Prometheus
+instrument_engine(engine)
+
 # Создаем фабрику сессий
 AsyncSessionLocal = async_sessionmaker(
     engine,
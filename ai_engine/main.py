@@ -2,26 +2,42 @@
 Точка входа для микросервиса AI Engine на FastAPI.
 Включает настройку CORS, эндпоинты и запуск Uvicorn.
 """
-from fastapi import FastAPI, HTTPException, Depends, Query
+from fastapi import FastAPI, HTTPException, Depends, Header, Query
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import StreamingResponse
+from fastapi.responses import FileResponse, Response, StreamingResponse
+from starlette.background import BackgroundTask
 from pydantic import BaseModel
-from typing import List, Optional
+from typing import Any, Dict, List, Optional
 from uuid import UUID
 from contextlib import asynccontextmanager
 import uvicorn
-import io
+import json
+import os
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from celery.result import AsyncResult
+
 from config import settings
-from database import init_db, close_db, get_db
+from database import init_db, close_db, get_db, AsyncSessionLocal
 from models import IdealTemplate, CustomTemplate, DeliverableSection, Deliverable
-from services import DoclingParser, Section
-from tasks import process_document_task
+from services import Section, get_docling_parser
+from celery_app import celery_app
+from tasks import (
+    process_document_task,
+    export_deliverable_task,
+    generate_section_task,
+    parse_queue,
+    start_ingestion_batch,
+)
 from services.llm import LLMClient
 from services.extractor import GlobalExtractor
+from services.progress import BatchProgressTracker
+from services.metrics import render_metrics
+from services.profiling import PROFILE_FORMATS, profile_path, profile_run
+from services.queue_metrics import QueueMetrics
+from services.tracing import set_attributes, setup_tracing
 from services.writer import Writer
-from services.exporter import export_deliverable_to_docx
+from services.exporter import render_deliverable, export_filename, get_exporter
 from sqlalchemy import select
 
 
@@ -46,6 +62,9 @@ app = FastAPI(
     lifespan=lifespan,
 )
 
+# Трассировка OpenTelemetry (если TRACING_ENABLED=true)
+setup_tracing("ai-engine-api", app=app)
+
 # Настройка CORS
 # Разрешаем запросы с фронтенда (Next.js)
 app.add_middleware(
@@ -58,7 +77,23 @@ app.add_middleware(
 
 # Инициализация парсера
 # Можно легко заменить на AzureParser или другой парсер
-parser = DoclingParser()
+parser = get_docling_parser()
+
+
+def _profile_requested(
+    x_profile: Optional[str] = Header(None, description="1 - профилировать запуск (нужно PROFILING_ENABLED=true)"),
+    profile: bool = Query(False, description="Профилировать запуск (нужно PROFILING_ENABLED=true)")
+) -> bool:
+    """
+    Зависимость: запрошено ли профилирование заголовком X-Profile или параметром profile.
+    
+    Raises:
+        HTTPException: 403 если профилирование запрошено, но выключено на сервере
+    """
+    requested = profile or (x_profile or "").strip().lower() in ("1", "true", "yes")
+    if requested and not settings.PROFILING_ENABLED:
+        raise HTTPException(status_code=403, detail="Профилирование выключено (PROFILING_ENABLED=false)")
+    return requested
 
 
 @app.get("/health")
@@ -73,6 +108,16 @@ async def health_check():
     }
 
 
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """
+    Метрики сервиса в формате Prometheus (этапы пайплайна, LLM, соединения с БД, кэши).
+    Метрики Celery worker'ов отдаются их собственным экспортером (METRICS_WORKER_PORT).
+    """
+    body, content_type = render_metrics()
+    return Response(content=body, media_type=content_type)
+
+
 # Модели для API
 class ParseRequest(BaseModel):
     """Запрос на парсинг документа."""
@@ -86,7 +131,9 @@ class SectionResponse(BaseModel):
     content_text: Optional[str] = None
     content_markdown: Optional[str] = None
     page_number: Optional[int] = None
+    page_end: Optional[int] = None
     hierarchy_level: Optional[int] = None
+    bbox: Optional[Dict[str, Any]] = None
     
     @classmethod
     def from_section(cls, section: Section) -> "SectionResponse":
@@ -97,7 +144,9 @@ class SectionResponse(BaseModel):
             content_text=section.content_text,
             content_markdown=section.content_markdown,
             page_number=section.page_number,
+            page_end=section.page_end,
             hierarchy_level=section.hierarchy_level,
+            bbox=section.bbox,
         )
 
 
@@ -147,6 +196,9 @@ class ParseDocumentRequest(BaseModel):
     file_path: str
     file_url: Optional[str] = None
     template_id: Optional[str] = None  # UUID шаблона для классификации секций
+    # Оценка размера для выбора очереди (большие документы - в parse_large)
+    file_size_bytes: Optional[int] = None
+    page_count: Optional[int] = None
 
 
 class ParseDocumentResponse(BaseModel):
@@ -161,12 +213,15 @@ class GenerateRequest(BaseModel):
     project_id: str
     target_section_id: str  # UUID целевой секции шаблона
     deliverable_id: str  # UUID документа (deliverable), в который сохраняется секция
+    user_id: str  # UUID пользователя, инициировавшего генерацию (автор записи в deliverable_section_history)
+    regenerate: bool = False  # Сгенерировать заново, не используя кэш ответов LLM
 
 
 class GenerateResponse(BaseModel):
     """Ответ на запрос генерации секции."""
     content: str  # Markdown текст секции
     target_section_id: str
+    profile_url: Optional[str] = None  # профиль запуска (если запрошен X-Profile / ?profile=true)
 
 
 class TemplateResponse(BaseModel):
@@ -179,13 +234,17 @@ class TemplateResponse(BaseModel):
 
 @app.post("/api/v1/parse", response_model=ParseDocumentResponse)
 async def parse_document_background(
-    request: ParseDocumentRequest
+    request: ParseDocumentRequest,
+    profile: bool = Depends(_profile_requested)
 ):
     """
     Запускает парсинг документа через Celery и сохраняет секции в БД.
     
     Args:
-        request: Запрос с document_id, file_path (или file_url) и template_id
+        request: Запрос с document_id, file_path (или file_url), template_id и оценкой размера
+            (file_size_bytes, page_count) для выбора очереди
+        profile: Профилировать обработку (X-Profile: 1 или ?profile=true); профиль
+            сохраняется в parsing_metadata["profile"] документа
         
     Returns:
         Ответ с подтверждением начала обработки
@@ -194,12 +253,16 @@ async def parse_document_background(
         HTTPException: Если произошла ошибка при запуске задачи
     """
     try:
-        # Запускаем Celery задачу
-        task = process_document_task.delay(
-            doc_id=request.document_id,
-            file_url=request.file_url,
-            file_path=request.file_path,
-            template_id=request.template_id
+        # Запускаем Celery задачу (большие документы - в очередь parse_large)
+        task = process_document_task.apply_async(
+            kwargs={
+                "doc_id": request.document_id,
+                "file_url": request.file_url,
+                "file_path": request.file_path,
+                "template_id": request.template_id,
+                "profile": profile,
+            },
+            queue=parse_queue(request.file_size_bytes, request.page_count)
         )
         
         return ParseDocumentResponse(
@@ -216,38 +279,151 @@ async def parse_document_background(
         )
 
 
+class BatchDocument(BaseModel):
+    """Документ пакетной загрузки."""
+    document_id: str
+    file_path: Optional[str] = None
+    file_url: Optional[str] = None
+    template_id: Optional[str] = None  # UUID шаблона для классификации секций
+    file_size_bytes: Optional[int] = None
+    page_count: Optional[int] = None
+
+
+class ParseBatchRequest(BaseModel):
+    """Запрос на пакетную загрузку документов проекта."""
+    project_id: str
+    documents: List[BatchDocument]
+
+
+class ParseBatchResponse(BaseModel):
+    """Ответ на запрос пакетной загрузки."""
+    batch_id: str
+    total: int
+    status: str
+    status_url: str
+
+
+@app.post("/api/v1/parse/batch", response_model=ParseBatchResponse, status_code=202)
+async def parse_documents_batch(request: ParseBatchRequest):
+    """
+    Запускает парсинг пакета документов проекта (Celery chord).
+    Документы обрабатываются параллельно; после завершения всех автоматически
+    извлекаются глобальные переменные исследования (GlobalExtractor).
+    
+    Args:
+        request: project_id и список документов (document_id, file_path или file_url, template_id)
+        
+    Returns:
+        batch_id для опроса прогресса через GET /api/v1/parse/batch/{batch_id}
+        
+    Raises:
+        HTTPException: Если список пуст, у документа нет файла или произошла ошибка при запуске
+    """
+    if not request.documents:
+        raise HTTPException(status_code=400, detail="Список документов пуст")
+    for document in request.documents:
+        if not document.file_path and not document.file_url:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Для документа {document.document_id} не указан file_path или file_url"
+            )
+    
+    batch_id = BatchProgressTracker.new_batch_id()
+    tracker = BatchProgressTracker(batch_id)
+    try:
+        await tracker.create(request.project_id, [document.document_id for document in request.documents])
+        start_ingestion_batch(
+            project_id=request.project_id,
+            documents=[
+                {
+                    "doc_id": document.document_id,
+                    "file_url": document.file_url,
+                    "file_path": document.file_path,
+                    "template_id": document.template_id,
+                    "file_size_bytes": document.file_size_bytes,
+                    "page_count": document.page_count,
+                }
+                for document in request.documents
+            ],
+            batch_id=batch_id
+        )
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Ошибка при запуске пакетной загрузки: {str(e)}"
+        )
+    finally:
+        await tracker.close()
+    
+    return ParseBatchResponse(
+        batch_id=batch_id,
+        total=len(request.documents),
+        status="running",
+        status_url=f"/api/v1/parse/batch/{batch_id}"
+    )
+
+
+@app.get("/api/v1/parse/batch/{batch_id}")
+async def get_parse_batch_status(batch_id: UUID):
+    """
+    Возвращает агрегированный прогресс пакетной загрузки: количество документов
+    по этапам, ошибки, пропускную способность (документов в минуту) и ETA.
+    
+    Raises:
+        HTTPException: 404 если пакет не найден или истек срок хранения прогресса
+    """
+    tracker = BatchProgressTracker(str(batch_id))
+    try:
+        batch_progress = await tracker.get()
+    finally:
+        await tracker.close()
+    
+    if batch_progress is None:
+        raise HTTPException(status_code=404, detail=f"Пакет не найден: {batch_id}")
+    return batch_progress
+
+
 @app.post("/parse", response_model=ParseDocumentResponse)
 async def parse_document(
-    request: ParseDocumentRequest
+    request: ParseDocumentRequest,
+    profile: bool = Depends(_profile_requested)
 ):
     """
     Запускает парсинг документа через Celery (алиас для /api/v1/parse).
     """
-    return await parse_document_background(request)
+    return await parse_document_background(request, profile)
 
 
 @app.post("/generate", response_model=GenerateResponse)
 async def generate_section(
     request: GenerateRequest,
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_db),
+    profile: bool = Depends(_profile_requested)
 ):
     """
     Генерирует целевую секцию документа на основе Template Graph.
     
     Args:
-        request: Запрос с project_id и target_section_id
+        request: Запрос с project_id, target_section_id, deliverable_id и user_id
         db: SQLAlchemy асинхронная сессия
+        profile: Профилировать генерацию (X-Profile: 1 или ?profile=true)
         
     Returns:
-        Сгенерированный текст секции в формате Markdown
+        Сгенерированный текст секции в формате Markdown (и profile_url, если запрошен профиль)
         
     Raises:
         HTTPException: Если произошла ошибка при генерации
     """
     try:
-        project_uuid = UUID(request.project_id)
+        UUID(request.project_id)
         target_section_uuid = UUID(request.target_section_id)
         deliverable_uuid = UUID(request.deliverable_id)
+        user_uuid = UUID(request.user_id)
+        set_attributes(**{
+            "project.id": request.project_id,
+            "deliverable.id": request.deliverable_id,
+            "deliverable_section.id": request.target_section_id,
+        })
         
         # Инициализируем сервисы
         llm_client = LLMClient()
@@ -267,15 +443,18 @@ async def generate_section(
             raise HTTPException(status_code=404, detail="Deliverable section not found")
         
         # Генерируем секцию используя новый метод
-        content = await writer.generate_section(
-            session=db,
-            deliverable_section_id=target_section_uuid,
-            changed_by_user_id=project_uuid  # TODO: получить реальный user_id из запроса
-        )
+        with profile_run("generate_section", profile, **{"deliverable_section.id": request.target_section_id}) as run:
+            content = await writer.generate_section(
+                session=db,
+                deliverable_section_id=target_section_uuid,
+                changed_by_user_id=user_uuid,
+                bypass_cache=request.regenerate
+            )
         
         return GenerateResponse(
             content=content,
-            target_section_id=request.target_section_id
+            target_section_id=request.target_section_id,
+            profile_url=run.info["download_url"] if run and run.info else None
         )
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
@@ -286,26 +465,202 @@ async def generate_section(
         )
 
 
+def _format_sse(event: str, data: dict) -> str:
+    """Форматирует событие в формате Server-Sent Events."""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+@app.post("/generate/stream")
+async def generate_section_stream(request: GenerateRequest):
+    """
+    Потоковая генерация секции документа (Server-Sent Events).
+    
+    Токены от LLM пересылаются клиенту по мере поступления:
+    - event "delta": фрагмент Markdown
+    - event "html": HTML завершенных блоков (инкрементальная конвертация)
+    - event "done": итоговый HTML после сохранения секции и истории
+    - event "error": описание ошибки (поток после этого закрывается)
+    
+    Args:
+        request: Запрос с project_id, target_section_id, deliverable_id и user_id
+        
+    Returns:
+        StreamingResponse с media_type text/event-stream
+        
+    Raises:
+        HTTPException: Если переданы некорректные UUID или секция не найдена
+    """
+    try:
+        UUID(request.project_id)
+        target_section_uuid = UUID(request.target_section_id)
+        deliverable_uuid = UUID(request.deliverable_id)
+        user_uuid = UUID(request.user_id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    set_attributes(**{
+        "project.id": request.project_id,
+        "deliverable.id": request.deliverable_id,
+        "deliverable_section.id": request.target_section_id,
+    })
+    
+    # The stream outlives the request handler, so it owns its session
+    # instead of using the get_db dependency
+    session = AsyncSessionLocal()
+    try:
+        deliverable_section_result = await session.execute(
+            select(DeliverableSection).where(
+                DeliverableSection.deliverable_id == deliverable_uuid,
+                DeliverableSection.id == target_section_uuid
+            )
+        )
+        if not deliverable_section_result.scalar_one_or_none():
+            raise HTTPException(status_code=404, detail="Deliverable section not found")
+    except Exception:
+        await session.close()
+        raise
+    
+    writer = Writer(LLMClient())
+    
+    async def event_stream():
+        try:
+            async for item in writer.stream_section(
+                session=session,
+                deliverable_section_id=target_section_uuid,
+                changed_by_user_id=user_uuid,
+                bypass_cache=request.regenerate
+            ):
+                if item["event"] == "done":
+                    # Persist before telling the client the section is saved
+                    await session.commit()
+                yield _format_sse(item["event"], item["data"])
+        except Exception as e:
+            await session.rollback()
+            yield _format_sse("error", {"detail": f"Ошибка при генерации секции: {str(e)}"})
+        finally:
+            await session.close()
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no",  # Disable proxy buffering (nginx)
+        }
+    )
+
+
+class GenerateJobResponse(BaseModel):
+    """Статус задачи генерации секции."""
+    job_id: str
+    status: str  # PENDING, STARTED, RETRY, SUCCESS, FAILURE
+    target_section_id: Optional[str] = None
+    content: Optional[str] = None
+    profile_url: Optional[str] = None
+    error: Optional[str] = None
+
+
+@app.post("/api/v1/generate/jobs", response_model=GenerateJobResponse, status_code=202)
+async def create_generate_job(request: GenerateRequest, profile: bool = Depends(_profile_requested)):
+    """
+    Запускает генерацию секции через Celery (очередь generation).
+    Подходит для массовой генерации: запросы не держат процесс API на время ответа LLM.
+    
+    Args:
+        request: Запрос с project_id, target_section_id, deliverable_id и user_id
+        profile: Профилировать генерацию в worker (X-Profile: 1 или ?profile=true)
+        
+    Returns:
+        job_id задачи для опроса статуса через GET /api/v1/generate/jobs/{job_id}
+    """
+    try:
+        UUID(request.project_id)
+        UUID(request.target_section_id)
+        UUID(request.deliverable_id)
+        UUID(request.user_id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    try:
+        task = generate_section_task.delay(
+            deliverable_id=request.deliverable_id,
+            deliverable_section_id=request.target_section_id,
+            changed_by_user_id=request.user_id,
+            regenerate=request.regenerate,
+            profile=profile
+        )
+        return GenerateJobResponse(job_id=task.id, status="PENDING", target_section_id=request.target_section_id)
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Ошибка при запуске генерации секции: {str(e)}"
+        )
+
+
+@app.get("/api/v1/generate/jobs/{job_id}", response_model=GenerateJobResponse)
+async def get_generate_job(job_id: UUID, db: AsyncSession = Depends(get_db)):
+    """
+    Возвращает статус задачи генерации секции и, после завершения, сгенерированный текст
+    (из deliverable_sections: задача возвращает только ID секции).
+    """
+    result = AsyncResult(str(job_id), app=generate_section_task.app)
+    response = GenerateJobResponse(job_id=str(job_id), status=result.status)
+    if result.successful():
+        payload = result.result or {}
+        response.target_section_id = payload.get("deliverable_section_id")
+        if response.target_section_id:
+            content_result = await db.execute(
+                select(DeliverableSection.content_html).where(
+                    DeliverableSection.id == UUID(response.target_section_id)
+                )
+            )
+            response.content = content_result.scalar_one_or_none()
+        response.profile_url = (payload.get("profile") or {}).get("download_url")
+    elif result.failed():
+        response.error = str(result.result)
+    return response
+
+
+@app.get("/api/v1/queues/metrics")
+async def get_queue_metrics():
+    """
+    Возвращает метрики очередей Celery для подбора worker'ов под нагрузку:
+    глубину очереди (всего и по приоритетам), время ожидания в очереди и время
+    выполнения задач (p50/p95/max по последним выборкам), число упавших задач.
+    """
+    metrics = QueueMetrics(celery_app)
+    try:
+        return {"queues": await metrics.collect()}
+    finally:
+        await metrics.close()
+
+
 @app.get("/api/v1/export/{deliverable_id}")
 async def export_deliverable(
     deliverable_id: UUID,
     reference_docx: Optional[str] = Query(None, description="Путь к шаблону DOCX с корпоративными стилями"),
-    db: AsyncSession = Depends(get_db)
+    format: str = Query("docx", description="Формат экспорта: docx, pdf, markdown, html (ZIP-архив)"),
+    db: AsyncSession = Depends(get_db),
+    profile: bool = Depends(_profile_requested)
 ):
     """
-    Экспортирует deliverable в формат DOCX используя Pandoc.
+    Экспортирует deliverable в DOCX, PDF, Markdown или HTML-архив используя Pandoc.
     
     Args:
         deliverable_id: UUID документа для экспорта
-        reference_docx: Опциональный путь к шаблону DOCX с корпоративными стилями
+        reference_docx: Опциональный путь к шаблону DOCX с корпоративными стилями (только для docx)
+        format: Формат экспорта
         db: SQLAlchemy асинхронная сессия
+        profile: Профилировать экспорт (X-Profile: 1 или ?profile=true)
         
     Returns:
-        StreamingResponse с DOCX файлом
+        FileResponse с файлом (отдается частями); при профилировании ссылка на профиль
+        в заголовке X-Profile-Url
         
     Raises:
-        HTTPException: Если deliverable не найден, нет секций или произошла ошибка конвертации
+        HTTPException: Если формат не поддерживается, deliverable не найден, нет секций
+            или произошла ошибка конвертации
     """
+    exporter = _get_exporter_or_400(format)
     try:
         # Получаем deliverable для имени файла
         deliverable_result = await db.execute(
@@ -316,27 +671,25 @@ async def export_deliverable(
         if not deliverable:
             raise HTTPException(status_code=404, detail=f"Deliverable not found: {deliverable_id}")
         
-        # Экспортируем в DOCX
-        docx_bytes = await export_deliverable_to_docx(
-            deliverable_id=deliverable_id,
-            db=db,
-            reference_docx=reference_docx
-        )
+        # Экспортируем (файл на диске, не в памяти)
+        with profile_run("export_deliverable", profile, **{"deliverable.id": deliverable_id}) as run:
+            export_path, is_temporary = await render_deliverable(
+                deliverable_id=deliverable_id,
+                db=db,
+                export_format=exporter.format,
+                reference_docx=reference_docx
+            )
         
         # Формируем имя файла
-        filename = f"{deliverable.title or 'document'}.docx"
-        # Очищаем имя файла от недопустимых символов
-        filename = "".join(c for c in filename if c.isalnum() or c in (' ', '-', '_', '.')).strip()
-        if not filename.endswith('.docx'):
-            filename += '.docx'
+        filename = export_filename(deliverable.title, exporter.extension)
         
-        # Возвращаем файл как поток
-        return StreamingResponse(
-            io.BytesIO(docx_bytes),
-            media_type="application/vnd.openxmlformats-officedocument.wordprocessingml.document",
-            headers={
-                "Content-Disposition": f'attachment; filename="{filename}"'
-            }
+        # Отдаем файл частями; временный файл удаляется после отправки
+        return FileResponse(
+            export_path,
+            media_type=exporter.media_type,
+            filename=filename,
+            headers={"X-Profile-Url": run.info["download_url"]} if run and run.info else None,
+            background=BackgroundTask(os.remove, export_path) if is_temporary else None
         )
         
     except ValueError as e:
@@ -350,6 +703,135 @@ async def export_deliverable(
         )
 
 
+def _get_exporter_or_400(export_format: str):
+    """Возвращает экспортер формата или HTTP 400 для неподдерживаемого формата."""
+    try:
+        return get_exporter(export_format)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+class ExportJobResponse(BaseModel):
+    """Статус задачи экспорта."""
+    job_id: str
+    status: str  # PENDING, STARTED, RETRY, SUCCESS, FAILURE
+    filename: Optional[str] = None
+    size_bytes: Optional[int] = None
+    download_url: Optional[str] = None
+    profile_url: Optional[str] = None
+    error: Optional[str] = None
+
+
+def _export_job_response(job_id: str) -> ExportJobResponse:
+    """Собирает статус задачи экспорта из результата Celery."""
+    result = AsyncResult(job_id, app=export_deliverable_task.app)
+    response = ExportJobResponse(job_id=job_id, status=result.status)
+    if result.successful():
+        payload = result.result or {}
+        response.filename = payload.get("filename")
+        response.size_bytes = payload.get("size_bytes")
+        response.download_url = f"/api/v1/export/jobs/{job_id}/download"
+        response.profile_url = (payload.get("profile") or {}).get("download_url")
+    elif result.failed():
+        response.error = str(result.result)
+    return response
+
+
+@app.post("/api/v1/export/{deliverable_id}/jobs", response_model=ExportJobResponse, status_code=202)
+async def create_export_job(
+    deliverable_id: UUID,
+    reference_docx: Optional[str] = Query(None, description="Путь к шаблону DOCX с корпоративными стилями"),
+    format: str = Query("docx", description="Формат экспорта: docx, pdf, markdown, html (ZIP-архив)"),
+    profile: bool = Depends(_profile_requested)
+):
+    """
+    Запускает экспорт deliverable через Celery.
+    Конвертация Pandoc выполняется в worker, не занимая процесс API.
+    
+    Args:
+        deliverable_id: UUID документа для экспорта
+        reference_docx: Опциональный путь к шаблону DOCX с корпоративными стилями (только для docx)
+        format: Формат экспорта
+        profile: Профилировать экспорт в worker (X-Profile: 1 или ?profile=true)
+        
+    Returns:
+        job_id задачи для опроса статуса и скачивания
+    """
+    exporter = _get_exporter_or_400(format)
+    try:
+        task = export_deliverable_task.delay(
+            deliverable_id=str(deliverable_id),
+            reference_docx=reference_docx,
+            export_format=exporter.format,
+            profile=profile
+        )
+        return ExportJobResponse(job_id=task.id, status="PENDING")
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Ошибка при запуске экспорта документа: {str(e)}"
+        )
+
+
+@app.get("/api/v1/export/jobs/{job_id}", response_model=ExportJobResponse)
+async def get_export_job(job_id: UUID):
+    """
+    Возвращает статус задачи экспорта.
+    
+    Args:
+        job_id: ID задачи, полученный от POST /api/v1/export/{deliverable_id}/jobs
+    """
+    return _export_job_response(str(job_id))
+
+
+@app.get("/api/v1/export/jobs/{job_id}/download")
+async def download_export_job(job_id: UUID):
+    """
+    Отдает готовый файл задачи экспорта.
+    
+    Raises:
+        HTTPException: 409 если задача еще не завершена, 404 если файл не найден,
+            500 если экспорт завершился ошибкой
+    """
+    job = _export_job_response(str(job_id))
+    if job.status == "FAILURE":
+        raise HTTPException(status_code=500, detail=f"Ошибка при экспорте: {job.error}")
+    if job.status != "SUCCESS":
+        raise HTTPException(status_code=409, detail=f"Экспорт еще не завершен (status: {job.status})")
+    
+    payload = AsyncResult(str(job_id), app=export_deliverable_task.app).result or {}
+    # Only the file name is taken from the task result; the directory is always EXPORT_DIR
+    file_path = os.path.join(settings.EXPORT_DIR, os.path.basename(payload.get("file_path", "")))
+    if not os.path.isfile(file_path):
+        raise HTTPException(status_code=404, detail=f"Файл экспорта не найден: {job_id}")
+    
+    return FileResponse(
+        file_path,
+        media_type=payload.get("media_type", "application/octet-stream"),
+        filename=job.filename or os.path.basename(file_path)
+    )
+
+
+@app.get("/api/v1/profiles/{profile_id}")
+async def download_profile(
+    profile_id: UUID,
+    format: str = Query("html", description="Формат профиля: html (дерево вызовов) или speedscope (flamegraph)")
+):
+    """
+    Отдает профиль запуска, записанный по X-Profile / ?profile=true / profile=True.
+    
+    Raises:
+        HTTPException: 400 если формат не поддерживается, 404 если профиль не найден или удален по TTL
+    """
+    try:
+        path = profile_path(profile_id.hex, format)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if not path.is_file():
+        raise HTTPException(status_code=404, detail=f"Профиль не найден: {profile_id}")
+    return FileResponse(path, media_type=PROFILE_FORMATS[format][1], filename=path.name)
+
+
 # Эндпоинт /templates удален - используйте ideal_templates или custom_templates напрямую
 # Для получения списка шаблонов используйте соответствующие таблицы через Supabase клиент
 
@@ -6,8 +6,8 @@ SQLAlchemy модели для всех таблиц системы.
 - Source (исходные документы)
 - Deliverable (готовые документы)
 """
-from sqlalchemy import String, Integer, Text, ForeignKey, DateTime, Boolean
-from sqlalchemy.dialects.postgresql import UUID, ARRAY, JSONB
+from sqlalchemy import String, Integer, Text, ForeignKey, DateTime, Boolean, Computed
+from sqlalchemy.dialects.postgresql import UUID, ARRAY, JSONB, TSVECTOR
 from sqlalchemy.orm import mapped_column, relationship
 from sqlalchemy.sql import func, text
 from pgvector.sqlalchemy import Vector
@@ -211,6 +211,7 @@ class SourceDocument(Base):
     template = relationship("CustomTemplate", back_populates="source_documents")
     parent_document = relationship("SourceDocument", remote_side=[id], backref="child_versions")
     sections = relationship("SourceSection", back_populates="source_document", cascade="all, delete-orphan")
+    tables = relationship("SourceTable", back_populates="source_document", cascade="all, delete-orphan")
 
 
 class SourceSection(Base):
@@ -219,6 +220,8 @@ class SourceSection(Base):
     Хранит структурированные секции исходных документов (Inputs) с поддержкой векторов для гибридного поиска.
     """
     __tablename__ = "source_sections"
+    # content_tsv is computed by the DB and only read in SQL: do not fetch it back on INSERT
+    __mapper_args__ = {"eager_defaults": False}
     
     id = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     document_id = mapped_column(UUID(as_uuid=True), ForeignKey("source_documents.id", ondelete="CASCADE"), nullable=False)
@@ -236,6 +239,17 @@ class SourceSection(Base):
     
     # Вектор для гибридного поиска
     embedding = mapped_column(Vector(1536), nullable=True)
+    # Полнотекстовый индекс для гибридного поиска (генерируемая колонка, GIN индекс)
+    content_tsv = mapped_column(
+        TSVECTOR,
+        Computed(
+            "setweight(to_tsvector('simple', coalesce(header, '')), 'A') || "
+            "setweight(to_tsvector('simple', coalesce(content_text, '')), 'B')",
+            persisted=True
+        ),
+        nullable=True,
+        deferred=True
+    )
     
     # Классификация
     classification_confidence = mapped_column(Integer, nullable=True)  # FLOAT в БД, но используем Integer для совместимости
@@ -248,6 +262,56 @@ class SourceSection(Base):
     # Relationships
     source_document = relationship("SourceDocument", back_populates="sections")
     custom_section = relationship("CustomSection", back_populates="source_sections")
+    chunks = relationship("SourceSectionChunk", back_populates="section", cascade="all, delete-orphan")
+
+
+class SourceSectionChunk(Base):
+    """
+    Модель для таблицы source_section_chunks.
+    Перекрывающиеся фрагменты текста секции (services/chunker.py) с собственными эмбеддингами:
+    векторный поиск находит нужный фрагмент длинной секции, а не только ее начало.
+    """
+    __tablename__ = "source_section_chunks"
+    
+    id = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    section_id = mapped_column(UUID(as_uuid=True), ForeignKey("source_sections.id", ondelete="CASCADE"), nullable=False)
+    # Denormalized from the section: the search filters chunks by the project's current documents
+    document_id = mapped_column(UUID(as_uuid=True), ForeignKey("source_documents.id", ondelete="CASCADE"), nullable=False)
+    chunk_index = mapped_column(Integer, nullable=False)  # Порядковый номер фрагмента в секции
+    content = mapped_column(Text, nullable=False)
+    token_count = mapped_column(Integer, nullable=False)
+    char_start = mapped_column(Integer, nullable=False)  # Позиция фрагмента в source_sections.content_text
+    char_end = mapped_column(Integer, nullable=False)
+    
+    # Вектор для гибридного поиска (HNSW индекс)
+    embedding = mapped_column(Vector(1536), nullable=True)
+    
+    created_at = mapped_column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    
+    # Relationships
+    section = relationship("SourceSection", back_populates="chunks")
+
+
+class SourceTable(Base):
+    """
+    Модель для таблицы source_tables.
+    Таблицы исходного документа: каждая хранится один раз на документ, секции ссылаются
+    на нее из content_structure по ID и диапазону строк.
+    """
+    __tablename__ = "source_tables"
+    
+    id = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    document_id = mapped_column(UUID(as_uuid=True), ForeignKey("source_documents.id", ondelete="CASCADE"), nullable=False)
+    table_index = mapped_column(Integer, nullable=False)  # Порядковый номер таблицы в документе (Section.table_ids)
+    page_number = mapped_column(Integer, nullable=True)
+    row_count = mapped_column(Integer, nullable=False, default=0)
+    column_count = mapped_column(Integer, nullable=False, default=0)
+    content = mapped_column(JSONB, nullable=False)  # {"headers": [...], "rows": [[...]], "has_merged_cells": false}
+    
+    created_at = mapped_column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    
+    # Relationships
+    source_document = relationship("SourceDocument", back_populates="tables")
 
 
 class StudyGlobal(Base):
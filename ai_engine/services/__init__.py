@@ -2,7 +2,14 @@
 Сервисы для парсинга документов.
 """
 from .base_parser import BaseParser
-from .docling_parser import DoclingParser
 from .types import Section
 
-__all__ = ["BaseParser", "DoclingParser", "Section"]
+__all__ = ["BaseParser", "DoclingParser", "Section", "get_docling_parser"]
+
+
+def __getattr__(name):
+    # Docling is heavy: import it on first use so modules like markdown_renderer load without it
+    if name in ("DoclingParser", "get_docling_parser"):
+        from . import docling_parser
+        return getattr(docling_parser, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
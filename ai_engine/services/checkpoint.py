@@ -0,0 +1,136 @@
+"""
+Чекпоинты этапов обработки документа.
+Позволяют повторной попытке Celery-задачи продолжить с последнего завершенного этапа
+(downloaded -> converted -> sectioned -> embedded -> classified -> stored),
+не скачивая файл и не запуская Docling заново.
+"""
+import json
+import os
+import shutil
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from config import settings
+
+# Этапы обработки документа в порядке выполнения
+STAGES = ("downloaded", "converted", "sectioned", "embedded", "classified", "stored")
+
+
+class IngestionCheckpoint:
+    """
+    Чекпоинты обработки одного документа во временном хранилище.
+
+    Каждый документ получает директорию <root>/<doc_id> с файлом manifest.json
+    (завершенные этапы и источник файла) и артефактами этапов.
+    """
+
+    MANIFEST = "manifest.json"
+
+    def __init__(self, doc_id: str, source: str, root: Optional[Path] = None):
+        """
+        Args:
+            doc_id: UUID документа
+            source: Источник файла (file_url или file_path); при смене источника чекпоинты сбрасываются
+            root: Корневая директория чекпоинтов (по умолчанию INGESTION_CHECKPOINT_DIR)
+        """
+        self.root = Path(root or settings.INGESTION_CHECKPOINT_DIR)
+        self.dir = self.root / str(doc_id)
+        self.source = source
+        self._manifest = self._load_manifest()
+
+    def _load_manifest(self) -> Dict[str, Any]:
+        manifest_path = self.dir / self.MANIFEST
+        if manifest_path.exists():
+            try:
+                manifest = json.loads(manifest_path.read_text(encoding="utf-8"))
+                if manifest.get("source") == self.source:
+                    return manifest
+            except (OSError, ValueError):
+                pass
+            # Unreadable manifest or a different file for the same document: start over
+            shutil.rmtree(self.dir, ignore_errors=True)
+        return {"source": self.source, "stages": {}}
+
+    @property
+    def last_stage(self) -> Optional[str]:
+        """Последний завершенный этап или None."""
+        completed = [stage for stage in STAGES if stage in self._manifest["stages"]]
+        return completed[-1] if completed else None
+
+    def is_done(self, stage: str) -> bool:
+        """Проверяет, завершен ли этап."""
+        return stage in self._manifest["stages"]
+
+    def mark(self, stage: str, **meta: Any) -> None:
+        """
+        Отмечает этап как завершенный и атомарно сохраняет manifest.
+
+        Args:
+            stage: Название этапа из STAGES
+            **meta: Дополнительные данные этапа (например, время выполнения)
+        """
+        if stage not in STAGES:
+            raise ValueError(f"Unknown ingestion stage: {stage}")
+        self._manifest["stages"][stage] = {"completed_at": time.time(), **meta}
+        self._write_atomic(self.MANIFEST, json.dumps(self._manifest, ensure_ascii=False))
+
+    def stage_meta(self, stage: str) -> Dict[str, Any]:
+        """Возвращает данные, сохраненные при завершении этапа."""
+        return self._manifest["stages"].get(stage, {})
+
+    def path(self, name: str) -> Path:
+        """Путь к артефакту в директории чекпоинтов документа."""
+        self.dir.mkdir(parents=True, exist_ok=True)
+        return self.dir / name
+
+    def save_json(self, name: str, data: Any) -> None:
+        """Атомарно сохраняет JSON-артефакт."""
+        self._write_atomic(name, json.dumps(data, ensure_ascii=False, separators=(",", ":")))
+
+    def load_json(self, name: str) -> Any:
+        """Загружает JSON-артефакт."""
+        return json.loads(self.path(name).read_text(encoding="utf-8"))
+
+    def clear(self) -> None:
+        """Удаляет все чекпоинты документа (после успешного завершения)."""
+        shutil.rmtree(self.dir, ignore_errors=True)
+
+    def _write_atomic(self, name: str, content: str) -> None:
+        # Write to a temp file and rename, so a crash never leaves a half-written artifact
+        target = self.path(name)
+        fd, tmp_path = tempfile.mkstemp(dir=self.dir, prefix=f".{name}.")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                f.write(content)
+            os.replace(tmp_path, target)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+
+def prune_stale_checkpoints(root: Optional[Path] = None, max_age_hours: Optional[float] = None) -> int:
+    """
+    Удаляет чекпоинты документов, которые не обновлялись дольше max_age_hours
+    (например, после окончательно упавших задач).
+
+    Returns:
+        Количество удаленных директорий
+    """
+    root = Path(root or settings.INGESTION_CHECKPOINT_DIR)
+    max_age_hours = settings.INGESTION_CHECKPOINT_TTL_HOURS if max_age_hours is None else max_age_hours
+    if not root.exists():
+        return 0
+
+    cutoff = time.time() - max_age_hours * 3600
+    removed = 0
+    for entry in root.iterdir():
+        try:
+            if entry.is_dir() and entry.stat().st_mtime < cutoff:
+                shutil.rmtree(entry, ignore_errors=True)
+                removed += 1
+        except OSError:
+            continue
+    return removed
@@ -0,0 +1,173 @@
+"""
+Разбиение секций на перекрывающиеся фрагменты (чанки) ограниченной длины в токенах.
+
+Эмбеддинг секции строится по заголовку и первым 500 символам, поэтому остальной текст
+длинной секции векторному поиску не виден. Каждый фрагмент получает собственный эмбеддинг
+(таблица source_section_chunks), и поиск находит нужный абзац секции на 20 страниц,
+а в промпт попадает фрагмент, а не вся секция.
+
+Текст делится по границам предложений (и абзацев); предложение длиннее CHUNK_MAX_TOKENS
+делится по словам. Соседние фрагменты перекрываются последними предложениями предыдущего
+фрагмента (до CHUNK_OVERLAP_TOKENS токенов). Токены считаются токенизатором эмбеддингов
+OpenAI (tiktoken, cl100k_base), если он установлен, иначе - приближенно (4 символа на токен).
+"""
+import math
+import re
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from config import settings
+from services.types import Section
+
+# Sentence boundary: whitespace after terminal punctuation, or a line break
+_SENTENCE_BOUNDARY = re.compile(r"(?<=[.!?;:])\s+|\s*\n\s*")
+_WORD = re.compile(r"\S+")
+
+# (char_start, char_end, token_count) of a piece of the section text
+Piece = Tuple[int, int, int]
+
+_count_tokens: Optional[Callable[[str], int]] = None
+
+
+def count_tokens(text: str) -> int:
+    """
+    Число токенов текста: tiktoken (cl100k_base), если установлен, иначе оценка по длине.
+
+    Args:
+        text: Текст
+
+    Returns:
+        Число токенов
+    """
+    global _count_tokens
+    if _count_tokens is None:
+        try:
+            import tiktoken
+            encoding = tiktoken.get_encoding("cl100k_base")
+            _count_tokens = lambda value: len(encoding.encode(value, disallowed_special=()))
+        except ImportError:
+            _count_tokens = lambda value: math.ceil(len(value) / 4)
+    return _count_tokens(text)
+
+
+def split_text(
+    text: Optional[str],
+    max_tokens: Optional[int] = None,
+    overlap_tokens: Optional[int] = None
+) -> List[Dict[str, Any]]:
+    """
+    Делит текст на перекрывающиеся фрагменты не длиннее max_tokens токенов.
+
+    Args:
+        text: Текст секции (content_text)
+        max_tokens: Максимум токенов во фрагменте (по умолчанию CHUNK_MAX_TOKENS)
+        overlap_tokens: Перекрытие соседних фрагментов (по умолчанию CHUNK_OVERLAP_TOKENS)
+
+    Returns:
+        Фрагменты {"chunk_index", "content", "token_count", "char_start", "char_end"};
+        char_start/char_end - позиции фрагмента в text
+    """
+    if not text or not text.strip():
+        return []
+    max_tokens = max_tokens or settings.CHUNK_MAX_TOKENS
+    overlap_tokens = settings.CHUNK_OVERLAP_TOKENS if overlap_tokens is None else overlap_tokens
+    # The overlap must leave room for new text in every chunk
+    overlap_tokens = min(overlap_tokens, max_tokens // 2)
+
+    chunks: List[Dict[str, Any]] = []
+    current: List[Piece] = []
+    current_tokens = 0
+    for piece in _pieces(text, max_tokens):
+        if current and current_tokens + piece[2] > max_tokens:
+            chunks.append(_make_chunk(text, current, len(chunks)))
+            # Carry the trailing sentences of the chunk over into the next one
+            overlap: List[Piece] = []
+            overlap_total = 0
+            for previous in reversed(current):
+                if overlap_total + previous[2] > overlap_tokens:
+                    break
+                overlap.insert(0, previous)
+                overlap_total += previous[2]
+            while overlap and overlap_total + piece[2] > max_tokens:
+                overlap_total -= overlap.pop(0)[2]
+            current, current_tokens = overlap, overlap_total
+        current.append(piece)
+        current_tokens += piece[2]
+    if current:
+        chunks.append(_make_chunk(text, current, len(chunks)))
+    return chunks
+
+
+def chunk_sections(
+    sections: Sequence[Section],
+    max_tokens: Optional[int] = None,
+    overlap_tokens: Optional[int] = None
+) -> List[Dict[str, Any]]:
+    """
+    Фрагменты всех секций документа (в порядке секций).
+
+    Args:
+        sections: Секции документа
+        max_tokens: Максимум токенов во фрагменте (по умолчанию CHUNK_MAX_TOKENS)
+        overlap_tokens: Перекрытие соседних фрагментов (по умолчанию CHUNK_OVERLAP_TOKENS)
+
+    Returns:
+        Фрагменты split_text с "section_index" - позицией секции в sections
+    """
+    chunks = []
+    for section_index, section in enumerate(sections):
+        for chunk in split_text(section.content_text, max_tokens, overlap_tokens):
+            chunk["section_index"] = section_index
+            chunks.append(chunk)
+    return chunks
+
+
+def embedding_text(chunk: Dict[str, Any], section: Section) -> str:
+    """
+    Текст для эмбеддинга фрагмента: заголовок секции (контекст фрагмента) и текст фрагмента.
+    """
+    if section.header:
+        return f"{section.header}\n{chunk['content']}"
+    return chunk["content"]
+
+
+def _pieces(text: str, max_tokens: int) -> Iterator[Piece]:
+    """Предложения текста; предложения длиннее max_tokens - группами слов."""
+    start = 0
+    for boundary in _SENTENCE_BOUNDARY.finditer(text):
+        yield from _sentence_pieces(text, start, boundary.start(), max_tokens)
+        start = boundary.end()
+    yield from _sentence_pieces(text, start, len(text), max_tokens)
+
+
+def _sentence_pieces(text: str, start: int, end: int, max_tokens: int) -> Iterator[Piece]:
+    if start >= end or not text[start:end].strip():
+        return
+    tokens = count_tokens(text[start:end])
+    if tokens <= max_tokens:
+        yield start, end, tokens
+        return
+    # Sentence longer than a chunk: split by words
+    piece_start = piece_end = None
+    piece_tokens = 0
+    for word in _WORD.finditer(text, start, end):
+        word_tokens = count_tokens(word.group())
+        if piece_start is not None and piece_tokens + word_tokens > max_tokens:
+            yield piece_start, piece_end, piece_tokens
+            piece_start, piece_tokens = None, 0
+        if piece_start is None:
+            piece_start = word.start()
+        piece_end = word.end()
+        piece_tokens += word_tokens
+    if piece_start is not None:
+        yield piece_start, piece_end, piece_tokens
+
+
+def _make_chunk(text: str, pieces: List[Piece], chunk_index: int) -> Dict[str, Any]:
+    char_start, char_end = pieces[0][0], pieces[-1][1]
+    return {
+        "chunk_index": chunk_index,
+        "content": text[char_start:char_end],
+        "token_count": sum(piece[2] for piece in pieces),
+        "char_start": char_start,
+        "char_end": char_end,
+    }
@@ -1,16 +1,27 @@
 """
 Парсер документов на основе Docling.
-Конвертирует PDF/DOCX в Markdown и разбивает на секции по заголовкам.
+Конвертирует PDF/DOCX и разбивает на секции по заголовкам.
+
+Секции строятся по дереву документа Docling (DoclingDocument): элементы обходятся один раз
+в порядке чтения вместе с provenance (страница и координаты), поэтому у секции есть точный
+диапазон страниц, bbox для подсветки в PDF, а таблицы привязаны к секции, внутри которой
+они стоят. Если дерево недоступно, секции строятся по Markdown (_split_into_sections).
 """
 import re
 import asyncio
 import json
-from typing import List, Dict, Any, Optional
+from functools import lru_cache
+from typing import List, Dict, Any, Optional, Tuple
 from pathlib import Path
 from docling.document_converter import DocumentConverter
 from docling.datamodel.document import ConversionResult
 from .base_parser import BaseParser
-from .types import Section
+from .ingestion_stats import IngestionStats, stage
+from .types import Section, index_tables, markdown_to_text
+from .worker_memory import release_memory
+
+# Document tree labels that are not part of section content
+_SKIPPED_LABELS = {"page_header", "page_footer", "picture", "chart", "key_value_region", "form"}
 
 
 class DoclingParser(BaseParser):
@@ -36,6 +47,34 @@ class DoclingParser(BaseParser):
         Returns:
             Список секций документа
             
+        Raises:
+            FileNotFoundError: Если файл не найден
+            ValueError: Если файл не может быть обработан
+        """
+        markdown_content, tables_data, blocks = await self.convert(file_path)
+        
+        # Разбиваем на секции по заголовкам
+        return self.split_sections(markdown_content, tables_data, blocks)
+    
+    async def convert(
+        self,
+        file_path: str,
+        stats: Optional[IngestionStats] = None
+    ) -> Tuple[Optional[str], Dict[int, List[Dict[str, Any]]], Optional[List[Dict[str, Any]]]]:
+        """
+        Конвертирует документ через Docling и извлекает блоки секций и таблицы.
+        Первый (самый дорогой) этап parse, вынесен отдельно для чекпоинтов обработки.
+        
+        Args:
+            file_path: Путь к файлу (PDF или DOCX)
+            stats: Статистика обработки документа (время этапов)
+            
+        Returns:
+            Кортеж (Markdown контент, таблицы по номерам страниц, блоки документа):
+            блоки - результат _walk_document (JSON-сериализуемы, для чекпоинта), Markdown
+            в этом случае не экспортируется (None); без дерева документа блоки None,
+            а секции строятся по Markdown
+            
         Raises:
             FileNotFoundError: Если файл не найден
             ValueError: Если файл не может быть обработан
@@ -47,18 +86,121 @@ class DoclingParser(BaseParser):
         
         # Конвертируем документ в Markdown через Docling
         # Оборачиваем синхронный вызов в executor, чтобы не блокировать event loop
-        result: ConversionResult = await asyncio.to_thread(self.converter.convert, file_path)
+        with stage(stats, "docling_convert"):
+            result: ConversionResult = await asyncio.to_thread(self.converter.convert, file_path)
         
-        # Получаем Markdown контент
-        markdown_content = await asyncio.to_thread(result.document.export_to_markdown)
+        try:
+            # Один проход по дереву документа: блоки секций с provenance и таблицы
+            with stage(stats, "document_walk"):
+                walked = await asyncio.to_thread(self._walk_document, result.document)
+            
+            if walked is not None:
+                blocks, tables_data = walked
+                markdown_content = None
+            else:
+                blocks = None
+                # Получаем Markdown контент
+                with stage(stats, "markdown_export"):
+                    markdown_content = await asyncio.to_thread(result.document.export_to_markdown)
+                
+                # Извлекаем таблицы из документа
+                with stage(stats, "table_extraction"):
+                    tables_data = await self._extract_tables(result)
+        finally:
+            # The ConversionResult (pages, layout predictions) is the largest intermediate of
+            # the pipeline: release it before the next stages instead of at the end of the task
+            del result
+            release_memory()
         
-        # Извлекаем таблицы из документа
-        tables_data = await self._extract_tables(result)
+        return markdown_content, tables_data, blocks
+    
+    def split_sections(
+        self,
+        markdown: Optional[str],
+        tables_data: Dict[int, List[Dict[str, Any]]],
+        blocks: Optional[List[Dict[str, Any]]] = None
+    ) -> List[Section]:
+        """
+        Разбивает результат convert на секции (второй этап parse).
         
-        # Разбиваем на секции по заголовкам
-        sections = self._split_into_sections(markdown_content, tables_data)
+        Args:
+            markdown: Markdown контент документа (используется, если нет блоков)
+            tables_data: Словарь таблиц, сгруппированных по страницам
+            blocks: Блоки документа из convert (дерево Docling)
+            
+        Returns:
+            Список секций
+        """
+        if blocks is not None:
+            return self._split_blocks_into_sections(blocks, tables_data)
+        return self._split_into_sections(markdown or "", tables_data)
+    
+    def _walk_document(
+        self,
+        document: Any
+    ) -> Optional[Tuple[List[Dict[str, Any]], Dict[int, List[Dict[str, Any]]]]]:
+        """
+        Обходит дерево DoclingDocument один раз в порядке чтения.
         
-        return sections
+        Каждый элемент становится блоком:
+        - {"type": "heading", "text", "level", "prov"} - заголовок (title - уровень 1,
+          section_header - level + 1, как в Markdown-экспорте Docling)
+        - {"type": "text", "markdown", "prov"} - текст, пункт списка, код, формула
+        - {"type": "table", "markdown", "table": [страница, позиция], "prov"} - таблица;
+          "table" - ссылка на tables_data[страница][позиция]
+        где prov - список [страница, x, y, w, h] (координаты от левого верхнего угла страницы).
+        
+        Args:
+            document: DoclingDocument (result.document)
+            
+        Returns:
+            Кортеж (блоки, таблицы по номерам страниц) или None, если дерево недоступно
+        """
+        if not hasattr(document, "iterate_items"):
+            return None
+        
+        try:
+            page_heights = {
+                page_no: page.size.height
+                for page_no, page in (getattr(document, "pages", None) or {}).items()
+            }
+        except AttributeError:
+            page_heights = {}
+        
+        blocks: List[Dict[str, Any]] = []
+        tables_by_page: Dict[int, List[Dict[str, Any]]] = {}
+        try:
+            for item, _ in document.iterate_items():
+                label = getattr(item.label, "value", item.label)
+                if label in _SKIPPED_LABELS:
+                    continue
+                prov = _item_provenance(item, page_heights)
+                
+                if label in ("title", "section_header"):
+                    text = (getattr(item, "text", None) or "").strip()
+                    if text:
+                        level = 1 if label == "title" else (getattr(item, "level", None) or 1) + 1
+                        blocks.append({"type": "heading", "text": text, "level": level, "prov": prov})
+                elif label == "table":
+                    block = {"type": "table", "markdown": item.export_to_markdown(doc=document), "prov": prov}
+                    table_data = self._table_to_json(item, document)
+                    if table_data is not None:
+                        table_data["page_number"] = prov[0][0] if prov else None
+                        # Tables without provenance go to page 0, as in _extract_tables
+                        page_tables = tables_by_page.setdefault(table_data["page_number"] or 0, [])
+                        block["table"] = [table_data["page_number"] or 0, len(page_tables)]
+                        page_tables.append(table_data)
+                    blocks.append(block)
+                else:
+                    markdown = _item_markdown(item, label)
+                    if markdown:
+                        blocks.append({"type": "text", "markdown": markdown, "prov": prov})
+        except Exception as e:
+            # Unknown tree layout (other Docling version): sections are built from Markdown
+            print(f"Не удалось обойти дерево документа Docling, разбиение по Markdown: {str(e)}")
+            return None
+        
+        return blocks, tables_by_page
     
     async def _extract_tables(self, result: ConversionResult) -> Dict[int, List[Dict[str, Any]]]:
         """
@@ -76,82 +218,21 @@ class DoclingParser(BaseParser):
         def _extract_sync():
             tables_list = []
             for table in result.document.tables:
-                try:
-                    # Пытаемся использовать pandas DataFrame, если доступен
-                    try:
-                        import pandas as pd
-                        # Экспортируем таблицу в DataFrame (doc опционален, но может помочь с контекстом)
-                        df = table.export_to_dataframe(doc=result.document) if hasattr(table, 'export_to_dataframe') else None
-                        
-                        if df is None:
-                            # Если export_to_dataframe не доступен, пропускаем таблицу
-                            continue
-                        
-                        # Преобразуем DataFrame в структурированный JSON
-                        # Формат: список списков (первая строка - заголовки, остальные - данные)
-                        headers = df.columns.tolist() if len(df.columns) > 0 else []
-                        rows = []
-                        has_merged_cells = False
-                        
-                        # Преобразуем каждую строку, обрабатывая NaN значения
-                        for idx, row in df.iterrows():
-                            row_data = []
-                            for val in row:
-                                if pd.isna(val):
-                                    row_data.append("")
-                                    has_merged_cells = True
-                                else:
-                                    # Преобразуем значение в строку, сохраняя None как пустую строку
-                                    row_data.append(str(val) if val is not None else "")
-                            rows.append(row_data)
-                        
-                        table_data = {
-                            "type": "table",
-                            "headers": headers,
-                            "rows": rows,
-                            "row_count": len(df),
-                            "column_count": len(df.columns) if len(df.columns) > 0 else 0,
-                            "has_merged_cells": has_merged_cells
-                        }
-                    except ImportError:
-                        # Если pandas недоступен, используем альтернативный подход
-                        # Пытаемся получить данные таблицы напрямую
-                        # Docling может предоставить доступ к ячейкам таблицы
-                        if hasattr(table, 'cells') or hasattr(table, 'rows'):
-                            # Простой подход: пытаемся получить структуру таблицы
-                            # Это зависит от внутренней структуры Docling Table
-                            table_data = {
-                                "type": "table",
-                                "headers": [],
-                                "rows": [],
-                                "row_count": 0,
-                                "column_count": 0,
-                                "has_merged_cells": False,
-                                "note": "Table structure extracted without pandas - may need manual processing"
-                            }
-                        else:
-                            # Если нет доступа к структуре, пропускаем таблицу
-                            continue
-                    
-                    # Получаем номер страницы таблицы, если доступен
-                    page_num = None
-                    if hasattr(table, 'prov') and table.prov:
-                        # Пытаемся извлечь номер страницы из provenance
-                        for prov_item in table.prov:
-                            if hasattr(prov_item, 'page') and prov_item.page is not None:
-                                page_num = prov_item.page
-                                break
-                            # Альтернативный способ: проверяем, есть ли атрибут page_num
-                            if hasattr(prov_item, 'page_num') and prov_item.page_num is not None:
-                                page_num = prov_item.page_num
-                                break
-                    
-                    table_data["page_number"] = page_num
-                    tables_list.append(table_data)
-                except Exception as e:
-                    # Логируем ошибку, но продолжаем обработку других таблиц
-                    print(f"Ошибка при извлечении таблицы: {str(e)}")
+                table_data = self._table_to_json(table, result.document)
+                if table_data is None:
                     continue
+                
+                # Получаем номер страницы таблицы из provenance
+                page_num = None
+                for prov_item in getattr(table, 'prov', None) or []:
+                    page_num = getattr(prov_item, 'page_no', None)
+                    if page_num is None:
+                        page_num = getattr(prov_item, 'page', None)
+                    if page_num is not None:
+                        break
+                
+                table_data["page_number"] = page_num
+                tables_list.append(table_data)
             
             return tables_list
         
@@ -172,6 +253,135 @@ class DoclingParser(BaseParser):
         
         return tables_by_page
     
+    def _table_to_json(self, table: Any, document: Any) -> Optional[Dict[str, Any]]:
+        """
+        Преобразует таблицу Docling в структурированный JSON.
+        
+        Args:
+            table: Таблица Docling (TableItem)
+            document: Документ Docling (контекст для export_to_dataframe)
+            
+        Returns:
+            Таблица в структурированном формате или None, если структура недоступна
+        """
+        try:
+            # Пытаемся использовать pandas DataFrame, если доступен
+            try:
+                import pandas as pd
+                # Экспортируем таблицу в DataFrame (doc опционален, но может помочь с контекстом)
+                df = table.export_to_dataframe(doc=document) if hasattr(table, 'export_to_dataframe') else None
+                
+                if df is None:
+                    # Если export_to_dataframe не доступен, пропускаем таблицу
+                    return None
+                
+                # Преобразуем DataFrame в структурированный JSON
+                # Формат: список списков (первая строка - заголовки, остальные - данные)
+                headers = df.columns.tolist() if len(df.columns) > 0 else []
+                rows = []
+                has_merged_cells = False
+                
+                # Преобразуем каждую строку, обрабатывая NaN значения
+                for idx, row in df.iterrows():
+                    row_data = []
+                    for val in row:
+                        if pd.isna(val):
+                            row_data.append("")
+                            has_merged_cells = True
+                        else:
+                            # Преобразуем значение в строку, сохраняя None как пустую строку
+                            row_data.append(str(val) if val is not None else "")
+                    rows.append(row_data)
+                
+                table_data = {
+                    "type": "table",
+                    "headers": headers,
+                    "rows": rows,
+                    "row_count": len(df),
+                    "column_count": len(df.columns) if len(df.columns) > 0 else 0,
+                    "has_merged_cells": has_merged_cells
+                }
+                del df
+                return table_data
+            except ImportError:
+                # Если pandas недоступен, используем альтернативный подход
+                # Docling может предоставить доступ к ячейкам таблицы
+                if hasattr(table, 'cells') or hasattr(table, 'rows'):
+                    # Простой подход: структура таблицы зависит от внутреннего формата Docling Table
+                    return {
+                        "type": "table",
+                        "headers": [],
+                        "rows": [],
+                        "row_count": 0,
+                        "column_count": 0,
+                        "has_merged_cells": False,
+                        "note": "Table structure extracted without pandas - may need manual processing"
+                    }
+                # Если нет доступа к структуре, пропускаем таблицу
+                return None
+        except Exception as e:
+            # Логируем ошибку, но продолжаем обработку других таблиц
+            print(f"Ошибка при извлечении таблицы: {str(e)}")
+            return None
+    
+    def _split_blocks_into_sections(
+        self,
+        blocks: List[Dict[str, Any]],
+        tables_data: Dict[int, List[Dict[str, Any]]]
+    ) -> List[Section]:
+        """
+        Разбивает блоки дерева документа (_walk_document) на секции по заголовкам за один проход.
+        Секция получает диапазон страниц своих блоков (page_number - page_end), bbox
+        и таблицы, стоящие внутри нее.
+        
+        Args:
+            blocks: Блоки документа в порядке чтения
+            tables_data: Словарь таблиц, сгруппированных по страницам
+            
+        Returns:
+            Список секций
+        """
+        sections: List[Section] = []
+        tables, table_ids_by_page = index_tables(tables_data)
+        
+        heading: Optional[Dict[str, Any]] = None
+        parts: List[str] = []
+        boxes: List[List[Any]] = []
+        table_ids: List[int] = []
+        
+        def flush() -> None:
+            if heading is None and not parts:
+                return
+            content_markdown = "\n\n".join(parts).strip()
+            pages = [box[0] for box in boxes]
+            header = heading["text"] if heading else None
+            sections.append(Section(
+                section_number=_section_number(header) if header else None,
+                header=header,
+                content_markdown=content_markdown if content_markdown else None,
+                page_number=min(pages) if pages else None,
+                page_end=max(pages) if pages else None,
+                hierarchy_level=heading["level"] if heading else None,
+                bbox=_section_bbox(boxes),
+                table_ids=table_ids,
+                tables=tables
+            ))
+        
+        for block in blocks:
+            if block["type"] == "heading":
+                flush()
+                heading, parts, boxes, table_ids = block, [], list(block["prov"]), []
+                continue
+            
+            parts.append(block["markdown"])
+            boxes.extend(block["prov"])
+            if "table" in block:
+                page, position = block["table"]
+                table_ids.append(table_ids_by_page[page][position])
+        flush()
+        
+        return sections
+    
     def _split_into_sections(self, markdown: str, tables_data: Dict[int, List[Dict[str, Any]]]) -> List[Section]:
         """
         Разбивает Markdown контент на секции по заголовкам (H1, H2, H3).
@@ -186,6 +396,8 @@ class DoclingParser(BaseParser):
         """
         sections: List[Section] = []
         lines = markdown.split('\n')
+        # Tables are stored once per document; sections of a page share its tuple of table ids
+        tables, table_ids_by_page = index_tables(tables_data)
         
         current_section: Section = None
         current_content_lines: List[str] = []
@@ -202,26 +414,16 @@ class DoclingParser(BaseParser):
                 # Сохраняем предыдущую секцию, если она есть
                 if current_section is not None or current_content_lines:
                     content_markdown = '\n'.join(current_content_lines).strip()
-                    content_text = self._markdown_to_text(content_markdown)
-                    
-                    # Ищем таблицы для текущей секции по номеру страницы
-                    content_structure = None
-                    if current_page_number is not None and current_page_number in tables_data:
-                        tables_in_section = tables_data[current_page_number]
-                        if tables_in_section:
-                            content_structure = {
-                                "tables": tables_in_section,
-                                "table_count": len(tables_in_section)
-                            }
                     
+                    # Таблицы текущей секции - по номеру страницы (content_text вычисляется из Markdown)
                     section = Section(
                         section_number=current_section_number,
                         header=current_header,
-                        content_text=content_text,
                         content_markdown=content_markdown if content_markdown else None,
-                        content_structure=content_structure,
                         page_number=current_page_number,
-                        hierarchy_level=current_hierarchy_level
+                        hierarchy_level=current_hierarchy_level,
+                        table_ids=table_ids_by_page.get(current_page_number, ()),
+                        tables=tables
                     )
                     sections.append(section)
                 
@@ -229,12 +431,8 @@ class DoclingParser(BaseParser):
                 level = len(header_match.group(1))
                 header_text = header_match.group(2).strip()
                 
-                # Извлекаем номер секции из заголовка (например, "3.1 Study Design" -> "3.1")
-                section_number_match = re.match(r'^(\d+(?:\.\d+)*)', header_text)
-                section_number = section_number_match.group(1) if section_number_match else None
-                
                 current_header = header_text
-                current_section_number = section_number
+                current_section_number = _section_number(header_text)
                 current_hierarchy_level = level
                 current_content_lines = []
                 current_section = None
@@ -254,26 +452,15 @@ class DoclingParser(BaseParser):
         # Добавляем последнюю секцию
         if current_section is not None or current_content_lines:
             content_markdown = '\n'.join(current_content_lines).strip()
-            content_text = self._markdown_to_text(content_markdown)
-            
-            # Ищем таблицы для последней секции
-            content_structure = None
-            if current_page_number is not None and current_page_number in tables_data:
-                tables_in_section = tables_data[current_page_number]
-                if tables_in_section:
-                    content_structure = {
-                        "tables": tables_in_section,
-                        "table_count": len(tables_in_section)
-                    }
             
             section = Section(
                 section_number=current_section_number,
                 header=current_header,
-                content_text=content_text,
                 content_markdown=content_markdown if content_markdown else None,
-                content_structure=content_structure,
                 page_number=current_page_number,
-                hierarchy_level=current_hierarchy_level
+                hierarchy_level=current_hierarchy_level,
+                table_ids=table_ids_by_page.get(current_page_number, ()),
+                tables=tables
             )
             sections.append(section)
         
@@ -281,45 +468,102 @@ class DoclingParser(BaseParser):
     
     def _markdown_to_text(self, markdown: str) -> str:
         """
-        Преобразует Markdown в чистый текст (удаляет разметку).
-        
-        Args:
-            markdown: Markdown текст
-            
-        Returns:
-            Чистый текст без разметки
+        Преобразует Markdown в чистый текст (удаляет разметку), см. types.markdown_to_text.
         """
-        if not markdown:
-            return ""
-        
-        # Удаляем заголовки
-        text = re.sub(r'^#{1,6}\s+', '', markdown, flags=re.MULTILINE)
-        
-        # Удаляем жирный и курсив
-        text = re.sub(r'\*\*([^*]+)\*\*', r'\1', text)
-        text = re.sub(r'\*([^*]+)\*', r'\1', text)
-        text = re.sub(r'__([^_]+)__', r'\1', text)
-        text = re.sub(r'_([^_]+)_', r'\1', text)
-        
-        # Удаляем ссылки [текст](url) -> текст
-        text = re.sub(r'\[([^\]]+)\]\([^\)]+\)', r'\1', text)
-        
-        # Удаляем изображения ![alt](url)
-        text = re.sub(r'!\[([^\]]*)\]\([^\)]+\)', '', text)
-        
-        # Удаляем код блоки
-        text = re.sub(r'```[\s\S]*?```', '', text)
-        text = re.sub(r'`([^`]+)`', r'\1', text)
-        
-        # Удаляем списки (маркеры)
-        text = re.sub(r'^\s*[-*+]\s+', '', text, flags=re.MULTILINE)
-        text = re.sub(r'^\s*\d+\.\s+', '', text, flags=re.MULTILINE)
-        
-        # Удаляем горизонтальные линии
-        text = re.sub(r'^---+$', '', text, flags=re.MULTILINE)
-        
-        # Очищаем множественные пробелы и переносы строк
-        text = re.sub(r'\n\s*\n\s*\n+', '\n\n', text)
-        text = re.sub(r' +', ' ', text)
-        
-        return text.strip()
+        return markdown_to_text(markdown)
+
+
+def _section_number(header: str) -> Optional[str]:
+    """Номер секции из заголовка (например, "3.1 Study Design" -> "3.1")."""
+    section_number_match = re.match(r'^(\d+(?:\.\d+)*)', header)
+    return section_number_match.group(1) if section_number_match else None
+
+
+def _item_provenance(item: Any, page_heights: Dict[int, float]) -> List[List[Any]]:
+    """
+    Provenance элемента дерева: [страница, x, y, w, h] на каждую страницу элемента
+    ([страница] без координат, если bbox нет). Координаты Docling в PDF отсчитываются
+    от левого нижнего угла страницы и переводятся в отсчет от левого верхнего (как в bbox секций).
+    """
+    boxes: List[List[Any]] = []
+    for prov in getattr(item, "prov", None) or []:
+        page = getattr(prov, "page_no", None)
+        if page is None:
+            continue
+        bbox = getattr(prov, "bbox", None)
+        if bbox is None:
+            boxes.append([page])
+            continue
+        top, bottom = bbox.t, bbox.b
+        origin = getattr(getattr(bbox, "coord_origin", None), "value", None)
+        if origin == "BOTTOMLEFT" and page in page_heights:
+            top, bottom = page_heights[page] - bbox.t, page_heights[page] - bbox.b
+        top, bottom = min(top, bottom), max(top, bottom)
+        boxes.append([
+            page,
+            round(bbox.l, 1),
+            round(top, 1),
+            round(bbox.r - bbox.l, 1),
+            round(bottom - top, 1),
+        ])
+    return boxes
+
+
+def _item_markdown(item: Any, label: str) -> Optional[str]:
+    """Markdown текстового элемента дерева (пункт списка, код, формула, абзац)."""
+    text = (getattr(item, "text", None) or "").strip()
+    if not text:
+        return None
+    if label == "list_item":
+        return f"{getattr(item, 'marker', None) or '-'} {text}"
+    if label == "code":
+        return f"```\n{text}\n```"
+    if label == "formula":
+        return f"$${text}$$"
+    return text
+
+
+def _section_bbox(boxes: List[List[Any]]) -> Optional[Dict[str, Any]]:
+    """
+    bbox секции для source_sections.bbox: {"page", "x", "y", "w", "h"} - область секции
+    на ее первой странице (объединение областей элементов). Для секции на нескольких
+    страницах добавляются "page_end" и "regions" - такие же области по каждой странице.
+    """
+    regions: Dict[int, List[float]] = {}
+    for box in boxes:
+        if len(box) < 5:
+            continue
+        page, x, y, w, h = box
+        if page in regions:
+            left, top, right, bottom = regions[page]
+            regions[page] = [min(left, x), min(top, y), max(right, x + w), max(bottom, y + h)]
+        else:
+            regions[page] = [x, y, x + w, y + h]
+    if not regions:
+        return None
+    
+    areas = [
+        {
+            "page": page,
+            "x": left,
+            "y": top,
+            "w": round(right - left, 1),
+            "h": round(bottom - top, 1),
+        }
+        for page, (left, top, right, bottom) in sorted(regions.items())
+    ]
+    bbox = dict(areas[0])
+    if len(areas) > 1:
+        bbox["page_end"] = areas[-1]["page"]
+        bbox["regions"] = areas
+    return bbox
+
+
+@lru_cache(maxsize=1)
+def get_docling_parser() -> DoclingParser:
+    """
+    Общий DoclingParser процесса: модели Docling загружаются при первой конвертации
+    и переиспользуются следующими документами (процесс worker'а перезапускается
+    только по лимиту памяти, см. services/worker_memory.py).
+    """
+    return DoclingParser()
@@ -0,0 +1,239 @@
+"""
+Провайдеры эмбеддингов.
+Общий интерфейс для удаленного API (OpenAI/YandexGPT) и локальной CPU-модели
+(sentence-transformers, опционально ONNX), выбор через EMBEDDING_PROVIDER.
+"""
+import asyncio
+import time
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, Dict, List, Optional
+
+from config import settings
+from services.metrics import record_llm_call
+
+if TYPE_CHECKING:
+    from services.llm import LLMClient
+
+# Размерность колонок Vector(1536) в source_sections / ideal_sections
+EMBEDDING_DIMENSION = 1536
+
+
+class EmbeddingProvider(ABC):
+    """
+    Базовый класс провайдеров эмбеддингов.
+    Все провайдеры возвращают векторы размерности EMBEDDING_DIMENSION.
+    """
+
+    name: str = "base"
+
+    @abstractmethod
+    async def embed(self, texts: List[str]) -> List[List[float]]:
+        """
+        Получает эмбеддинги для списка текстов (порядок сохраняется).
+
+        Args:
+            texts: Тексты для векторизации
+
+        Returns:
+            Список векторов размерности EMBEDDING_DIMENSION
+        """
+        pass
+
+
+class RemoteEmbeddingProvider(EmbeddingProvider):
+    """
+    Эмбеддинги через OpenAI-compatible API (OpenAI или YandexGPT).
+    Тексты отправляются пачками, вызовы проходят через ResiliencePolicy клиента.
+    """
+
+    name = "remote"
+
+    def __init__(self, llm_client: "LLMClient", batch_size: int = 64):
+        """
+        Args:
+            llm_client: Клиент LLM (HTTP-клиент, модель и политика ретраев)
+            batch_size: Максимальное количество текстов в одном запросе
+        """
+        self.llm_client = llm_client
+        self.batch_size = batch_size
+
+    async def embed(self, texts: List[str]) -> List[List[float]]:
+        # Для YandexGPT используем специальную модель
+        if "yandex" in self.llm_client.base_url.lower():
+            model = "text-search-doc"
+        else:
+            model = self.llm_client.embedding_model
+
+        vectors: List[List[float]] = []
+        for start in range(0, len(texts), self.batch_size):
+            batch = texts[start:start + self.batch_size]
+            started = time.perf_counter()
+            try:
+                raw = await self.llm_client.resilience.call(
+                    lambda: self.llm_client.client.embeddings.with_raw_response.create(model=model, input=batch),
+                    headers_of=lambda r: r.headers,
+                    hedge=True
+                )
+                response = raw.parse()
+            except Exception:
+                record_llm_call(model, "embed", time.perf_counter() - started, status="error")
+                raise
+            record_llm_call(model, "embed", time.perf_counter() - started, usage=getattr(response, "usage", None))
+            # The API may return items out of order; "index" is authoritative
+            for item in sorted(response.data, key=lambda d: d.index):
+                vectors.append(item.embedding)
+        return vectors
+
+
+class LocalEmbeddingProvider(EmbeddingProvider):
+    """
+    Локальные эмбеддинги на CPU через sentence-transformers (бэкенд torch или onnx).
+    Пачки кодируются параллельно в пуле потоков; векторы приводятся к EMBEDDING_DIMENSION.
+
+    Модель загружается один раз на процесс и переиспользуется всеми экземплярами.
+    """
+
+    name = "local"
+
+    _models: Dict[str, object] = {}
+    _executor: Optional[ThreadPoolExecutor] = None
+
+    def __init__(
+        self,
+        model_name: str,
+        backend: str = "torch",
+        batch_size: int = 32,
+        workers: int = 2,
+        device: str = "cpu"
+    ):
+        """
+        Args:
+            model_name: Имя модели sentence-transformers
+            backend: "torch" или "onnx"
+            batch_size: Размер пачки для одного вызова encode
+            workers: Количество потоков для параллельного кодирования пачек
+            device: Устройство ("cpu" по умолчанию)
+        """
+        self.model_name = model_name
+        self.backend = backend
+        self.batch_size = batch_size
+        self.workers = workers
+        self.device = device
+
+    def _get_model(self):
+        key = f"{self.model_name}:{self.backend}:{self.device}"
+        model = self._models.get(key)
+        if model is None:
+            try:
+                from sentence_transformers import SentenceTransformer
+            except ImportError:
+                raise RuntimeError(
+                    "EMBEDDING_PROVIDER=local requires sentence-transformers: "
+                    "pip install sentence-transformers (and optimum[onnxruntime] for the onnx backend)"
+                )
+
+            kwargs = {"device": self.device}
+            if self.backend != "torch":
+                kwargs["backend"] = self.backend
+            model = SentenceTransformer(self.model_name, **kwargs)
+            self._models[key] = model
+        return model
+
+    @classmethod
+    def _get_executor(cls, workers: int) -> ThreadPoolExecutor:
+        if cls._executor is None:
+            cls._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="embeddings")
+        return cls._executor
+
+    def _encode_batch(self, batch: List[str]) -> List[List[float]]:
+        vectors = self._get_model().encode(
+            batch,
+            batch_size=self.batch_size,
+            normalize_embeddings=True,
+            convert_to_numpy=True
+        )
+        return [project_to_dimension(vector, EMBEDDING_DIMENSION) for vector in vectors]
+
+    async def embed(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+
+        # Load the model once before fanning out to worker threads
+        loop = asyncio.get_running_loop()
+        executor = self._get_executor(self.workers)
+        await loop.run_in_executor(executor, self._get_model)
+
+        batches = [texts[i:i + self.batch_size] for i in range(0, len(texts), self.batch_size)]
+        results = await asyncio.gather(*(
+            loop.run_in_executor(executor, self._encode_batch, batch) for batch in batches
+        ))
+        return [vector for batch_vectors in results for vector in batch_vectors]
+
+
+_projections: Dict[tuple, object] = {}
+
+
+def project_to_dimension(vector, dimension: int) -> List[float]:
+    """
+    Приводит вектор к нужной размерности.
+
+    - Меньшая размерность дополняется нулями: косинусное сходство между векторами
+      одной модели сохраняется точно.
+    - Большая размерность сжимается фиксированной случайной проекцией
+      (seed зафиксирован, сходство сохраняется приблизительно, лемма Джонсона-Линденштраусса).
+
+    Args:
+        vector: Исходный вектор (list или numpy array)
+        dimension: Целевая размерность
+
+    Returns:
+        Вектор длины dimension
+    """
+    size = len(vector)
+    if size == dimension:
+        return [float(x) for x in vector]
+    if size < dimension:
+        return [float(x) for x in vector] + [0.0] * (dimension - size)
+
+    import numpy as np
+
+    key = (size, dimension)
+    matrix = _projections.get(key)
+    if matrix is None:
+        rng = np.random.default_rng(seed=1536)
+        matrix = rng.standard_normal((size, dimension)) / np.sqrt(dimension)
+        _projections[key] = matrix
+
+    projected = np.asarray(vector, dtype=np.float64) @ matrix
+    norm = np.linalg.norm(projected)
+    if norm > 0:
+        projected = projected / norm
+    return projected.tolist()
+
+
+def create_embedding_provider(llm_client: "LLMClient") -> EmbeddingProvider:
+    """
+    Создает провайдер эмбеддингов согласно настройке EMBEDDING_PROVIDER.
+
+    Args:
+        llm_client: Клиент LLM (используется удаленным провайдером)
+
+    Returns:
+        Экземпляр EmbeddingProvider
+
+    Raises:
+        ValueError: Если указан неизвестный провайдер
+    """
+    provider = settings.EMBEDDING_PROVIDER
+    if provider == "remote":
+        return RemoteEmbeddingProvider(llm_client, batch_size=settings.EMBEDDING_BATCH_SIZE)
+    if provider == "local":
+        return LocalEmbeddingProvider(
+            model_name=settings.LOCAL_EMBEDDING_MODEL,
+            backend=settings.LOCAL_EMBEDDING_BACKEND,
+            batch_size=settings.EMBEDDING_BATCH_SIZE,
+            workers=settings.LOCAL_EMBEDDING_WORKERS,
+            device=settings.LOCAL_EMBEDDING_DEVICE
+        )
+    raise ValueError(f"Unknown EMBEDDING_PROVIDER: {provider}")
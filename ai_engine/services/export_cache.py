@@ -0,0 +1,288 @@
+"""
+Кэш экспорта документов.
+Хранит на диске промежуточное представление каждой секции (Pandoc JSON AST,
+ключ - хэш content_html) и готовые документы (ключ - версия deliverable и его секций),
+поэтому повторный экспорт не запускает Pandoc, а после правки одной секции
+конвертируется только она.
+"""
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import pypandoc
+
+from config import settings
+from services.metrics import record_cache
+
+# Prefix for fragment wrapper ids; hashes make collisions with user content ids impossible in practice
+_FRAGMENT_ID_PREFIX = "clinscriptum-frag-"
+
+# Superseded documents may still be streamed by FileResponse: they are removed only after this delay
+_STALE_DOCUMENT_GRACE_SECONDS = 3600
+
+
+def file_fingerprint(path: Optional[str]) -> str:
+    """
+    Отпечаток файла (путь, размер, mtime) для ключей кэша, например reference.docx.
+    Пустая строка, если файл не указан или не существует.
+    """
+    if not path or not os.path.exists(path):
+        return ""
+    stat = os.stat(path)
+    return f"{os.path.abspath(path)}:{stat.st_size}:{stat.st_mtime_ns}"
+
+
+def _hash(*parts: Any) -> str:
+    payload = json.dumps(parts, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ExportCache:
+    """
+    Дисковый кэш экспорта.
+
+    Структура директории:
+    - fragments/<kk>/<key>.json - блоки Pandoc AST секции
+    - documents/<deliverable_id>/<key>.<ext> - готовый документ (предыдущие версии удаляет prune)
+    """
+
+    def __init__(self, root: Optional[str] = None, ttl_hours: Optional[float] = None):
+        """
+        Args:
+            root: Корневая директория кэша (по умолчанию EXPORT_CACHE_DIR)
+            ttl_hours: Время жизни неиспользуемых фрагментов (по умолчанию EXPORT_CACHE_TTL_HOURS)
+        """
+        self.root = Path(root or settings.EXPORT_CACHE_DIR)
+        self.ttl_hours = settings.EXPORT_CACHE_TTL_HOURS if ttl_hours is None else ttl_hours
+        self._pandoc_version: Optional[str] = None
+        self._pruned_at = 0.0
+
+    @property
+    def pandoc_version(self) -> str:
+        # The AST format depends on the pandoc version, so it is part of every key
+        if self._pandoc_version is None:
+            self._pandoc_version = pypandoc.get_pandoc_version()
+        return self._pandoc_version
+
+    # --- Фрагменты секций ---
+
+    def fragment_key(self, html: str) -> str:
+        """Ключ фрагмента: хэш HTML секции и версии Pandoc."""
+        return _hash("fragment", self.pandoc_version, html)
+
+    def _fragment_path(self, key: str) -> Path:
+        return self.root / "fragments" / key[:2] / f"{key}.json"
+
+    def get_fragment(self, key: str) -> Optional[Dict[str, Any]]:
+        """Возвращает {"api_version": [...], "blocks": [...]} или None."""
+        path = self._fragment_path(key)
+        try:
+            data = json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return None
+        # Refresh mtime so frequently exported fragments survive pruning
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return data
+
+    def set_fragment(self, key: str, fragment: Dict[str, Any]) -> None:
+        self._write_atomic(self._fragment_path(key), json.dumps(fragment, ensure_ascii=False).encode("utf-8"))
+
+    def convert_fragments(self, htmls: Sequence[str]) -> List[Dict[str, Any]]:
+        """
+        Возвращает AST-фрагменты для списка HTML, конвертируя через Pandoc только отсутствующие в кэше.
+        Все промахи конвертируются одним вызовом Pandoc.
+
+        Args:
+            htmls: HTML секций в порядке документа
+
+        Returns:
+            Фрагменты {"api_version", "blocks"} в том же порядке
+        """
+        keys = [self.fragment_key(html) for html in htmls]
+        fragments: Dict[str, Dict[str, Any]] = {}
+        missing: Dict[str, str] = {}
+        for key, html in zip(keys, htmls):
+            if key in fragments or key in missing:
+                continue
+            cached = self.get_fragment(key)
+            record_cache("export_fragment", cached is not None)
+            if cached is not None:
+                fragments[key] = cached
+            else:
+                missing[key] = html
+
+        if missing:
+            converted = self._convert_batch(missing)
+            for key, fragment in converted.items():
+                self.set_fragment(key, fragment)
+            fragments.update(converted)
+            self._maybe_prune()
+
+        return [fragments[key] for key in keys]
+
+    def _convert_batch(self, missing: Dict[str, str]) -> Dict[str, Dict[str, Any]]:
+        # Wrap each fragment in a uniquely identified div and split pandoc's output by those ids
+        wrapped = "\n".join(
+            f'<div id="{_FRAGMENT_ID_PREFIX}{key}">\n{html}\n</div>' for key, html in missing.items()
+        )
+        document = json.loads(pypandoc.convert_text(wrapped, "json", format="html"))
+        api_version = document["pandoc-api-version"]
+
+        result: Dict[str, Dict[str, Any]] = {}
+        for block in document["blocks"]:
+            if block.get("t") != "Div":
+                continue
+            block_id = block["c"][0][0]
+            if block_id.startswith(_FRAGMENT_ID_PREFIX):
+                key = block_id[len(_FRAGMENT_ID_PREFIX):]
+                result[key] = {"api_version": api_version, "blocks": block["c"][1]}
+
+        # Pandoc may restructure malformed HTML across wrappers: convert those one by one
+        for key, html in missing.items():
+            if key not in result:
+                single = json.loads(pypandoc.convert_text(html, "json", format="html"))
+                result[key] = {"api_version": single["pandoc-api-version"], "blocks": single["blocks"]}
+        return result
+
+    # --- Готовые документы ---
+
+    def document_key(self, *version_parts: Any) -> str:
+        """Ключ готового документа из частей версии (updated_at, число секций, отпечаток шаблона и т.д.)."""
+        return _hash("document", self.pandoc_version, *version_parts)
+
+    def _document_path(self, deliverable_id: str, key: str, extension: str) -> Path:
+        return self.root / "documents" / str(deliverable_id) / f"{key}.{extension}"
+
+    def get_document(self, deliverable_id: str, key: str, extension: str) -> Optional[Path]:
+        """Возвращает путь к закэшированному документу или None."""
+        path = self._document_path(deliverable_id, key, extension)
+        exists = path.exists()
+        record_cache("export_document", exists)
+        return path if exists else None
+
+    def store_document(self, deliverable_id: str, key: str, extension: str, source_path: str) -> Path:
+        """
+        Копирует готовый документ в кэш.
+        Предыдущие версии этого формата не удаляются сразу (их еще может отдавать другой запрос),
+        а удаляются в prune.
+
+        Returns:
+            Путь к документу в кэше
+        """
+        path = self._document_path(deliverable_id, key, extension)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.")
+        os.close(fd)
+        try:
+            shutil.copyfile(source_path, tmp_path)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        self._maybe_prune()
+        return path
+
+    # --- Служебное ---
+
+    def prune(self) -> int:
+        """
+        Удаляет фрагменты, которые не использовались дольше ttl_hours, и устаревшие версии
+        готовых документов (кроме последней версии каждого формата).
+
+        Returns:
+            Количество удаленных файлов
+        """
+        return self._prune_fragments() + self._prune_documents()
+
+    def _prune_fragments(self) -> int:
+        fragments_dir = self.root / "fragments"
+        if not fragments_dir.exists():
+            return 0
+
+        cutoff = time.time() - self.ttl_hours * 3600
+        removed = 0
+        for path in fragments_dir.glob("*/*.json"):
+            try:
+                if path.stat().st_mtime < cutoff:
+                    path.unlink()
+                    removed += 1
+            except OSError:
+                continue
+        return removed
+
+    def _prune_documents(self) -> int:
+        documents_dir = self.root / "documents"
+        if not documents_dir.exists():
+            return 0
+
+        cutoff = time.time() - _STALE_DOCUMENT_GRACE_SECONDS
+        removed = 0
+        for deliverable_dir in documents_dir.iterdir():
+            # Versions of one format: the newest one is current, the rest are superseded
+            versions: Dict[str, List[Tuple[float, Path]]] = {}
+            try:
+                for path in deliverable_dir.iterdir():
+                    # Names are "<key>.<ext>", where ext may itself contain dots ("ast.json"); skip temp files
+                    if path.name.startswith(".") or "." not in path.name:
+                        continue
+                    extension = path.name.split(".", 1)[1]
+                    versions.setdefault(extension, []).append((path.stat().st_mtime, path))
+            except OSError:
+                continue
+            for entries in versions.values():
+                entries.sort(reverse=True)
+                for mtime, path in entries[1:]:
+                    if mtime >= cutoff:
+                        continue
+                    try:
+                        path.unlink()
+                        removed += 1
+                    except OSError:
+                        continue
+        return removed
+
+    def _maybe_prune(self) -> None:
+        # Scanning the cache tree is not free: at most once per hour per process
+        if time.time() - self._pruned_at > 3600:
+            self._pruned_at = time.time()
+            self.prune()
+
+    @staticmethod
+    def _write_atomic(path: Path, content: bytes) -> None:
+        # Concurrent exports may write the same entry: rename makes the last writer win cleanly
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(content)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+
+_default_cache: Optional[ExportCache] = None
+
+
+def get_export_cache() -> Optional[ExportCache]:
+    """
+    Возвращает общий для процесса кэш экспорта, если он включен (EXPORT_CACHE_ENABLED=true).
+    """
+    global _default_cache
+
+    if not settings.EXPORT_CACHE_ENABLED:
+        return None
+
+    if _default_cache is None:
+        _default_cache = ExportCache()
+    return _default_cache
@@ -1,17 +1,187 @@
 """
 Сервис для экспорта готовых документов (deliverables) в различные форматы.
-Использует Pandoc для высококачественной конвертации HTML в DOCX.
+Использует Pandoc для высококачественной конвертации HTML в DOCX, PDF, Markdown и HTML.
+Документ потоково передается в pandoc, результат пишется на диск - память на экспорт ограничена.
+
+Все форматы собираются из общего промежуточного представления (Pandoc JSON AST документа),
+которое кэшируется: экспорт в несколько форматов стоит одного чтения секций из БД.
 """
+import asyncio
+import html as html_lib
+import json
+import shutil
 import tempfile
+import time
 import os
+import weakref
+import zipfile
+from abc import ABC
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Optional
+from typing import AsyncIterator, Dict, List, Optional, Tuple
 from uuid import UUID
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from sqlalchemy import func, select
 import pypandoc
 
-from models import DeliverableSection, Deliverable
+from config import settings
+from models import CustomSection, DeliverableSection, Deliverable
+from services.export_cache import ExportCache, file_fingerprint, get_export_cache
+from services.metrics import track_stage
+from services.tracing import set_attributes, start_span
+
+# Пул для конвертации фрагментов секций через pypandoc (синхронные вызовы).
+# Каждая конвертация - отдельный процесс pandoc, поток лишь ждет его завершения,
+# поэтому экспорты выполняются параллельно на всех ядрах, не блокируя event loop.
+_pandoc_executor: Optional[ThreadPoolExecutor] = None
+
+
+def _get_pandoc_executor() -> ThreadPoolExecutor:
+    global _pandoc_executor
+    if _pandoc_executor is None:
+        _pandoc_executor = ThreadPoolExecutor(
+            max_workers=max(1, settings.EXPORT_MAX_WORKERS),
+            thread_name_prefix="pandoc"
+        )
+    return _pandoc_executor
+
+
+_PANDOC_FILTERS_DIR = Path(__file__).parent / "pandoc_filters"
+
+
+class DocumentExporter(ABC):
+    """
+    Базовый класс экспортера в конкретный формат.
+    Принимает документ по частям (Pandoc JSON AST или HTML) и пишет файл через pandoc.
+    """
+    
+    format: str = ""
+    extension: str = ""
+    media_type: str = "application/octet-stream"
+    pandoc_to: str = ""
+    # Шаблон reference.docx влияет на результат (входит в ключ кэша)
+    uses_reference_docx: bool = False
+    
+    def pandoc_args(self, output_path: str, reference_docx: Optional[str]) -> List[str]:
+        """Аргументы pandoc для записи результата в output_path."""
+        return [
+            "--to", self.pandoc_to,
+            "--output", output_path,
+            # Дополнительные параметры для лучшего качества конвертации
+            "--standalone",
+            "--wrap=none",  # Не переносим строки автоматически
+        ]
+    
+    async def write(
+        self,
+        chunks: AsyncIterator[str],
+        source_format: str,
+        output_path: str,
+        reference_docx: Optional[str] = None
+    ) -> None:
+        """
+        Конвертирует документ в формат экспортера.
+        
+        Args:
+            chunks: Документ по частям
+            source_format: Формат входа ("json" или "html")
+            output_path: Путь к файлу результата
+            reference_docx: Опциональный путь к шаблону DOCX с корпоративными стилями
+            
+        Raises:
+            RuntimeError: Если pandoc завершился с ошибкой
+        """
+        await _run_pandoc(chunks, source_format, self.pandoc_args(output_path, reference_docx), self.format)
+
+
+class DocxExporter(DocumentExporter):
+    """DOCX с опциональным корпоративным шаблоном (reference.docx)."""
+    
+    format = "docx"
+    extension = "docx"
+    media_type = "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+    pandoc_to = "docx"
+    uses_reference_docx = True
+    
+    def pandoc_args(self, output_path: str, reference_docx: Optional[str]) -> List[str]:
+        args = super().pandoc_args(output_path, reference_docx)
+        # Добавляем reference.docx если указан
+        if reference_docx and os.path.exists(reference_docx):
+            args.append(f"--reference-doc={reference_docx}")
+        return args
+
+
+class PdfExporter(DocumentExporter):
+    """PDF через внешний движок Pandoc (EXPORT_PDF_ENGINE: wkhtmltopdf, weasyprint, xelatex и т.д.)."""
+    
+    format = "pdf"
+    extension = "pdf"
+    media_type = "application/pdf"
+    pandoc_to = "pdf"
+    
+    def pandoc_args(self, output_path: str, reference_docx: Optional[str]) -> List[str]:
+        args = super().pandoc_args(output_path, reference_docx)
+        args.append(f"--pdf-engine={settings.EXPORT_PDF_ENGINE}")
+        return args
+
+
+class MarkdownExporter(DocumentExporter):
+    """GitHub Flavored Markdown (таблицы сохраняются как pipe tables или HTML)."""
+    
+    format = "markdown"
+    extension = "md"
+    media_type = "text/markdown; charset=utf-8"
+    pandoc_to = "gfm"
+    
+    def pandoc_args(self, output_path: str, reference_docx: Optional[str]) -> List[str]:
+        args = super().pandoc_args(output_path, reference_docx)
+        args.append(f"--lua-filter={_PANDOC_FILTERS_DIR / 'unwrap_sections.lua'}")
+        return args
+
+
+class HtmlBundleExporter(DocumentExporter):
+    """ZIP-архив: index.html и извлеченные изображения в media/."""
+    
+    format = "html"
+    extension = "zip"
+    media_type = "application/zip"
+    pandoc_to = "html5"
+    
+    async def write(
+        self,
+        chunks: AsyncIterator[str],
+        source_format: str,
+        output_path: str,
+        reference_docx: Optional[str] = None
+    ) -> None:
+        with tempfile.TemporaryDirectory() as bundle_dir:
+            args = self.pandoc_args(os.path.join(bundle_dir, "index.html"), reference_docx)
+            args.append(f"--extract-media={os.path.join(bundle_dir, 'media')}")
+            await _run_pandoc(chunks, source_format, args, self.format)
+            
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(_get_pandoc_executor(), _zip_directory, bundle_dir, output_path)
+
+
+EXPORTERS: Dict[str, DocumentExporter] = {
+    exporter.format: exporter
+    for exporter in (DocxExporter(), PdfExporter(), MarkdownExporter(), HtmlBundleExporter())
+}
+
+
+def get_exporter(export_format: str) -> DocumentExporter:
+    """
+    Возвращает экспортер для формата.
+    
+    Raises:
+        ValueError: Если формат не поддерживается
+    """
+    exporter = EXPORTERS.get(export_format)
+    if exporter is None:
+        raise ValueError(
+            f"Unsupported export format: {export_format}. Supported: {', '.join(EXPORTERS)}"
+        )
+    return exporter
 
 
 async def export_deliverable_to_docx(
@@ -20,14 +190,9 @@ async def export_deliverable_to_docx(
     reference_docx: Optional[str] = None
 ) -> bytes:
     """
-    Экспортирует deliverable в формат DOCX используя Pandoc.
-    
-    Процесс:
-    1. Получает все DeliverableSections для документа, отсортированные по order_index
-    2. Объединяет их content_html в один большой HTML документ
-    3. Конвертирует HTML в DOCX используя pypandoc.convert_text
-    4. Опционально применяет корпоративный шаблон (reference.docx)
-    5. Возвращает бинарные данные DOCX файла
+    Экспортирует deliverable в формат DOCX используя Pandoc и возвращает файл целиком.
+    Для больших документов используйте render_deliverable / export_deliverable_to_file,
+    которые не держат документ в памяти.
     
     Args:
         deliverable_id: UUID документа для экспорта
@@ -41,112 +206,13 @@ async def export_deliverable_to_docx(
         ValueError: Если deliverable не найден или нет секций для экспорта
         RuntimeError: Если произошла ошибка при конвертации через Pandoc
     """
-    # Step 1: Проверяем существование deliverable
-    deliverable_result = await db.execute(
-        select(Deliverable).where(Deliverable.id == deliverable_id)
-    )
-    deliverable = deliverable_result.scalar_one_or_none()
-    
-    if not deliverable:
-        raise ValueError(f"Deliverable not found: {deliverable_id}")
-    
-    # Step 2: Получаем все секции, отсортированные по order_index
-    sections_result = await db.execute(
-        select(DeliverableSection)
-        .where(DeliverableSection.deliverable_id == deliverable_id)
-        .order_by(DeliverableSection.order_index)
-    )
-    sections = sections_result.scalars().all()
-    
-    if not sections:
-        raise ValueError(f"No sections found for deliverable: {deliverable_id}")
-    
-    # Step 3: Объединяем content_html всех секций
-    html_parts = []
-    
-    # Добавляем базовую HTML структуру
-    html_parts.append("<!DOCTYPE html>")
-    html_parts.append("<html><head><meta charset='UTF-8'></head><body>")
-    
-    # Добавляем заголовок документа
-    html_parts.append(f"<h1>{deliverable.title}</h1>")
-    
-    # Объединяем контент секций
-    for section in sections:
-        if section.content_html:
-            # Обертываем каждую секцию в div для лучшей структуры
-            html_parts.append(f"<div class='section'>")
-            html_parts.append(section.content_html)
-            html_parts.append("</div>")
-    
-    html_parts.append("</body></html>")
-    
-    combined_html = "\n".join(html_parts)
-    
-    # Step 4: Конвертируем HTML в DOCX используя Pandoc
-    temp_file_path = None
+    path, is_temporary = await render_deliverable(deliverable_id, db, "docx", reference_docx)
     try:
-        # Подготавливаем extra_args для Pandoc
-        extra_args = []
-        
-        # Добавляем reference.docx если указан
-        if reference_docx and os.path.exists(reference_docx):
-            extra_args.append(f"--reference-doc={reference_docx}")
-        
-        # Дополнительные параметры для лучшего качества конвертации
-        extra_args.extend([
-            "--standalone",
-            "--wrap=none",  # Не переносим строки автоматически
-        ])
-        
-        # Конвертируем HTML в DOCX
-        # pypandoc.convert_text может вернуть bytes или путь к временному файлу
-        result = pypandoc.convert_text(
-            combined_html,
-            "docx",
-            format="html",
-            extra_args=extra_args,
-            encoding="utf-8"
-        )
-        
-        # Обрабатываем результат в зависимости от типа
-        if isinstance(result, bytes):
-            # Если вернулись bytes напрямую - возвращаем их
-            return result
-        elif isinstance(result, str):
-            # Если вернулась строка, это может быть путь к временному файлу
-            if os.path.exists(result):
-                # Читаем файл и удаляем его после чтения
-                try:
-                    with open(result, "rb") as f:
-                        docx_bytes = f.read()
-                    # Удаляем временный файл
-                    try:
-                        os.remove(result)
-                    except OSError:
-                        pass  # Игнорируем ошибки удаления
-                    return docx_bytes
-                except Exception as e:
-                    raise RuntimeError(f"Error reading temporary DOCX file: {str(e)}")
-            else:
-                # Если это не путь к файлу, пытаемся закодировать как UTF-8
-                # (хотя это маловероятно для DOCX)
-                return result.encode("utf-8")
-        else:
-            raise RuntimeError(f"Unexpected return type from pypandoc: {type(result)}")
-            
-    except RuntimeError:
-        # Пробрасываем RuntimeError дальше
-        raise
-    except Exception as e:
-        raise RuntimeError(f"Error converting HTML to DOCX with Pandoc: {str(e)}")
+        with open(path, "rb") as f:
+            return f.read()
     finally:
-        # Очищаем временный файл, если он был создан
-        if temp_file_path and os.path.exists(temp_file_path):
-            try:
-                os.remove(temp_file_path)
-            except OSError:
-                pass  # Игнорируем ошибки удаления
+        if is_temporary:
+            _remove_quietly(path)
 
 
 async def export_deliverable_to_docx_file(
@@ -171,17 +237,376 @@ async def export_deliverable_to_docx_file(
         ValueError: Если deliverable не найден или нет секций для экспорта
         RuntimeError: Если произошла ошибка при конвертации или записи файла
     """
-    # Получаем бинарные данные
-    docx_bytes = await export_deliverable_to_docx(
-        deliverable_id=deliverable_id,
-        db=db,
-        reference_docx=reference_docx
-    )
+    return await export_deliverable_to_file(deliverable_id, db, output_path, "docx", reference_docx)
+
+
+async def export_deliverable_to_file(
+    deliverable_id: UUID,
+    db: AsyncSession,
+    output_path: str,
+    export_format: str = "docx",
+    reference_docx: Optional[str] = None
+) -> str:
+    """
+    Экспортирует deliverable в файл на диске в указанном формате.
     
-    # Сохраняем в файл
+    Args:
+        deliverable_id: UUID документа для экспорта
+        db: SQLAlchemy асинхронная сессия
+        output_path: Путь для сохранения файла
+        export_format: Формат экспорта (docx, pdf, markdown, html)
+        reference_docx: Опциональный путь к шаблону DOCX с корпоративными стилями
+        
+    Returns:
+        Путь к созданному файлу
+        
+    Raises:
+        ValueError: Если deliverable не найден, нет секций или формат не поддерживается
+        RuntimeError: Если произошла ошибка при конвертации или записи файла
+    """
+    path, is_temporary = await render_deliverable(deliverable_id, db, export_format, reference_docx)
     try:
-        with open(output_path, "wb") as f:
-            f.write(docx_bytes)
+        if is_temporary:
+            shutil.move(path, output_path)
+        else:
+            shutil.copyfile(path, output_path)
         return output_path
     except Exception as e:
-        raise RuntimeError(f"Error writing DOCX file to {output_path}: {str(e)}")
+        if is_temporary:
+            _remove_quietly(path)
+        raise RuntimeError(f"Error writing export file to {output_path}: {str(e)}")
+
+
+async def render_deliverable(
+    deliverable_id: UUID,
+    db: AsyncSession,
+    export_format: str = "docx",
+    reference_docx: Optional[str] = None
+) -> Tuple[str, bool]:
+    """
+    Формирует файл экспорта deliverable на диске, не держа документ в памяти целиком.
+    
+    Процесс:
+    1. Проверяет кэш готовых документов (версия deliverable и его секций, формат, шаблон)
+    2. Берет собранный Pandoc JSON AST документа из кэша или собирает его: читает content_html
+       секций курсором БД пачками по EXPORT_STREAM_BATCH_SIZE (в порядке секций шаблона) и
+       конвертирует секции в AST (из кэша фрагментов - только изменившиеся секции)
+    3. Потоково передает AST в pandoc, который пишет файл нужного формата во временный файл
+    
+    При выключенном кэше (EXPORT_CACHE_ENABLED=false) в pandoc потоково пишется HTML секций.
+    
+    Args:
+        deliverable_id: UUID документа для экспорта
+        db: SQLAlchemy асинхронная сессия
+        export_format: Формат экспорта (docx, pdf, markdown, html)
+        reference_docx: Опциональный путь к шаблону DOCX с корпоративными стилями (только docx)
+        
+    Returns:
+        Кортеж (путь к файлу, временный ли файл). Временный файл удаляет вызывающий код;
+        файл из кэша удалять нельзя.
+        
+    Raises:
+        ValueError: Если deliverable не найден, нет секций или формат не поддерживается
+        RuntimeError: Если произошла ошибка при конвертации через Pandoc
+    """
+    exporter = get_exporter(export_format)
+    
+    # Step 1: Проверяем существование deliverable
+    deliverable_result = await db.execute(
+        select(Deliverable).where(Deliverable.id == deliverable_id)
+    )
+    deliverable = deliverable_result.scalar_one_or_none()
+    
+    if not deliverable:
+        raise ValueError(f"Deliverable not found: {deliverable_id}")
+    
+    # Cheap aggregate over sections: a cache hit never loads content_html
+    stamp_result = await db.execute(
+        select(func.count(DeliverableSection.id), func.max(DeliverableSection.updated_at))
+        .where(DeliverableSection.deliverable_id == deliverable_id)
+    )
+    sections_count, sections_updated_at = stamp_result.one()
+    if not sections_count:
+        raise ValueError(f"No sections found for deliverable: {deliverable_id}")
+    set_attributes(**{
+        "deliverable.id": deliverable_id,
+        "deliverable.sections_count": sections_count,
+        "export.format": exporter.format,
+    })
+    
+    cache = get_export_cache()
+    cache_id = str(deliverable_id)
+    ast_key = output_key = None
+    if cache is not None:
+        ast_key = cache.document_key(
+            deliverable.title,
+            deliverable.updated_at,
+            sections_count,
+            sections_updated_at
+        )
+        output_key = cache.document_key(
+            ast_key,
+            exporter.format,
+            file_fingerprint(reference_docx) if exporter.uses_reference_docx else ""
+        )
+        cached_path = cache.get_document(cache_id, output_key, exporter.extension)
+        set_attributes(**{"export.cache_hit": cached_path is not None})
+        if cached_path is not None:
+            return str(cached_path), False
+    
+    fd, output_path = tempfile.mkstemp(suffix=f".{exporter.extension}")
+    os.close(fd)
+    try:
+        if cache is None:
+            chunks = _html_document_chunks(deliverable.title, _iter_section_html(db, deliverable_id))
+            await exporter.write(chunks, "html", output_path, reference_docx)
+        else:
+            # Step 2: общий для всех форматов AST документа
+            ast_path = cache.get_document(cache_id, ast_key, AST_EXTENSION)
+            if ast_path is None:
+                ast_path = await _assemble_ast(cache, cache_id, ast_key, deliverable.title, db, deliverable_id)
+            # Step 3: AST -> pandoc -> файл формата
+            await exporter.write(_file_chunks(str(ast_path)), "json", output_path, reference_docx)
+    except BaseException:
+        _remove_quietly(output_path)
+        raise
+    
+    if cache is not None:
+        cache.store_document(cache_id, output_key, exporter.extension, output_path)
+    return output_path, True
+
+
+# Расширение закэшированного AST документа (не пересекается с расширениями форматов)
+AST_EXTENSION = "ast.json"
+
+
+async def _assemble_ast(
+    cache: ExportCache,
+    cache_id: str,
+    ast_key: str,
+    title: Optional[str],
+    db: AsyncSession,
+    deliverable_id: UUID
+) -> Path:
+    """
+    Собирает Pandoc JSON AST документа из секций во временный файл и сохраняет его в кэш.
+    """
+    fd, tmp_path = tempfile.mkstemp(suffix=".json")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            async for chunk in _ast_document_chunks(cache, title, _iter_section_html(db, deliverable_id)):
+                f.write(chunk)
+        return cache.store_document(cache_id, ast_key, AST_EXTENSION, tmp_path)
+    finally:
+        _remove_quietly(tmp_path)
+
+
+async def _file_chunks(path: str, chunk_size: int = 256 * 1024) -> AsyncIterator[str]:
+    """Читает текстовый файл частями."""
+    with open(path, "r", encoding="utf-8") as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                break
+            yield chunk
+
+
+def _zip_directory(source_dir: str, output_path: str) -> None:
+    with zipfile.ZipFile(output_path, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+        for root, _, files in os.walk(source_dir):
+            for name in files:
+                file_path = os.path.join(root, name)
+                archive.write(file_path, os.path.relpath(file_path, source_dir))
+
+
+async def _iter_section_html(db: AsyncSession, deliverable_id: UUID) -> AsyncIterator[List[str]]:
+    """
+    Читает content_html секций серверным курсором, пачками по EXPORT_STREAM_BATCH_SIZE.
+    """
+    # Порядок секций задается шаблоном (custom_sections.order_index)
+    result = await db.stream(
+        select(DeliverableSection.content_html)
+        .join(CustomSection, CustomSection.id == DeliverableSection.custom_section_id)
+        .where(DeliverableSection.deliverable_id == deliverable_id)
+        .order_by(CustomSection.order_index, DeliverableSection.created_at)
+        .execution_options(yield_per=settings.EXPORT_STREAM_BATCH_SIZE)
+    )
+    async for partition in result.partitions():
+        batch = [content_html for (content_html,) in partition if content_html]
+        if batch:
+            yield batch
+
+
+async def _html_document_chunks(
+    title: Optional[str],
+    sections: AsyncIterator[List[str]]
+) -> AsyncIterator[str]:
+    """
+    HTML документа по частям: заголовок, затем каждая секция в div с классом "section".
+    """
+    # Базовая HTML структура и заголовок документа
+    yield "<!DOCTYPE html>\n<html><head><meta charset='UTF-8'></head><body>\n"
+    yield _title_html(title) + "\n"
+    
+    async for batch in sections:
+        # Обертываем каждую секцию в div для лучшей структуры
+        yield "".join(f"<div class='section'>\n{section_html}\n</div>\n" for section_html in batch)
+    
+    yield "</body></html>\n"
+
+
+async def _ast_document_chunks(
+    cache: ExportCache,
+    title: Optional[str],
+    sections: AsyncIterator[List[str]]
+) -> AsyncIterator[str]:
+    """
+    Pandoc JSON AST документа по частям. Фрагменты секций берутся из кэша,
+    отсутствующие конвертируются одним вызовом Pandoc на пачку (в пуле потоков).
+    """
+    loop = asyncio.get_running_loop()
+    executor = _get_pandoc_executor()
+    
+    (title_fragment,) = await loop.run_in_executor(executor, cache.convert_fragments, [_title_html(title)])
+    header = {"pandoc-api-version": title_fragment["api_version"], "meta": {}}
+    # Open the "blocks" array by hand so sections can be appended one by one
+    yield json.dumps(header, ensure_ascii=False)[:-1] + ',"blocks":['
+    yield ",".join(json.dumps(block, ensure_ascii=False) for block in title_fragment["blocks"])
+    first = not title_fragment["blocks"]
+    
+    async for batch in sections:
+        fragments = await loop.run_in_executor(executor, cache.convert_fragments, batch)
+        parts = []
+        for fragment in fragments:
+            # Same structure as the HTML path: every section is a div with class "section"
+            div = {"t": "Div", "c": [["", ["section"], []], fragment["blocks"]]}
+            parts.append(("" if first else ",") + json.dumps(div, ensure_ascii=False))
+            first = False
+        yield "".join(parts)
+    
+    yield "]}"
+
+
+def _title_html(title: Optional[str]) -> str:
+    return f"<h1>{html_lib.escape(title or '')}</h1>"
+
+
+async def _run_pandoc(
+    chunks: AsyncIterator[str],
+    source_format: str,
+    output_args: List[str],
+    target_name: str
+) -> None:
+    """
+    Запускает pandoc, потоково передает документ в stdin и ждет записи результата.
+    Количество одновременно работающих pandoc ограничено EXPORT_MAX_WORKERS.
+    
+    Args:
+        chunks: Документ по частям
+        source_format: Формат входа ("json" или "html")
+        output_args: Аргументы формата выхода (--to, --output и т.д.)
+        target_name: Название формата для сообщений об ошибках
+    
+    Raises:
+        RuntimeError: Если pandoc завершился с ошибкой
+    """
+    args = [pypandoc.get_pandoc_path(), "--from", source_format] + output_args
+    
+    # stderr goes to a file: a filled stderr pipe would block pandoc while we write stdin
+    with tempfile.TemporaryFile() as stderr_file:
+        async with _pandoc_slots():
+            # Measured after acquiring a slot: waiting for a free pandoc is not conversion time
+            with start_span("export.pandoc", **{"export.from": source_format, "export.to": target_name}), \
+                    track_stage("pandoc_export"):
+                process = await asyncio.create_subprocess_exec(
+                    *args,
+                    stdin=asyncio.subprocess.PIPE,
+                    stdout=asyncio.subprocess.DEVNULL,
+                    stderr=stderr_file
+                )
+                try:
+                    async for chunk in chunks:
+                        process.stdin.write(chunk.encode("utf-8"))
+                        await process.stdin.drain()
+                    process.stdin.close()
+                except (BrokenPipeError, ConnectionResetError):
+                    # pandoc exited early; the error is reported through its exit code below
+                    pass
+                except BaseException:
+                    process.kill()
+                    await process.wait()
+                    raise
+                return_code = await process.wait()
+        
+        if return_code != 0:
+            stderr_file.seek(0)
+            error = stderr_file.read().decode("utf-8", errors="replace").strip()
+            raise RuntimeError(
+                f"Error converting {source_format.upper()} to {target_name.upper()} with Pandoc "
+                f"(exit code {return_code}): {error}"
+            )
+
+
+_pandoc_semaphores: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def _pandoc_slots() -> asyncio.Semaphore:
+    # One semaphore per event loop: Celery tasks run each export on a fresh loop
+    loop = asyncio.get_running_loop()
+    semaphore = _pandoc_semaphores.get(loop)
+    if semaphore is None:
+        semaphore = asyncio.Semaphore(max(1, settings.EXPORT_MAX_WORKERS))
+        _pandoc_semaphores[loop] = semaphore
+    return semaphore
+
+
+def _remove_quietly(path: str) -> None:
+    try:
+        os.remove(path)
+    except OSError:
+        pass  # Игнорируем ошибки удаления
+
+
+def export_filename(title: Optional[str], extension: str) -> str:
+    """
+    Формирует безопасное имя файла экспорта из названия документа.
+    
+    Args:
+        title: Название deliverable
+        extension: Расширение файла без точки (например, "docx")
+        
+    Returns:
+        Имя файла без недопустимых символов
+    """
+    filename = f"{title or 'document'}.{extension}"
+    # Очищаем имя файла от недопустимых символов
+    filename = "".join(c for c in filename if c.isalnum() or c in (' ', '-', '_', '.')).strip()
+    if not filename.endswith(f".{extension}"):
+        filename += f".{extension}"
+    return filename
+
+
+def prune_stale_exports(root: Optional[Path] = None, max_age_hours: Optional[float] = None) -> int:
+    """
+    Удаляет файлы фоновых экспортов старше max_age_hours (по умолчанию EXPORT_TTL_HOURS).
+    
+    Returns:
+        Количество удаленных файлов
+    """
+    root = Path(root or settings.EXPORT_DIR)
+    max_age_hours = settings.EXPORT_TTL_HOURS if max_age_hours is None else max_age_hours
+    if not root.exists():
+        return 0
+    
+    cutoff = time.time() - max_age_hours * 3600
+    removed = 0
+    for entry in root.iterdir():
+        try:
+            if entry.is_file() and entry.stat().st_mtime < cutoff:
+                entry.unlink()
+                removed += 1
+        except OSError:
+            continue
+    return removed
@@ -32,7 +32,8 @@ class GlobalExtractor:
     async def extract_globals(
         self,
         session: AsyncSession,
-        project_id: UUID
+        project_id: UUID,
+        bypass_cache: bool = False
     ) -> Dict[str, str]:
         """
         Извлекает глобальные переменные исследования из документов проекта.
@@ -40,6 +41,7 @@ class GlobalExtractor:
         Args:
             session: SQLAlchemy асинхронная сессия
             project_id: UUID проекта
+            bypass_cache: Извлечь заново, не используя кэш ответов LLM
             
         Returns:
             Словарь с глобальными переменными: {variable_name: variable_value}
@@ -100,7 +102,8 @@ class GlobalExtractor:
             response_text = await self.llm_client.generate_text(
                 system_prompt=system_prompt,
                 user_prompt=user_prompt,
-                temperature=0.3
+                temperature=0.3,
+                bypass_cache=bypass_cache
             )
             
             # Парсим JSON из ответа
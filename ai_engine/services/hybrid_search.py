@@ -0,0 +1,330 @@
+"""
+Гибридный поиск по секциям исходных документов - "страховка" Template Graph:
+используется, когда маппинги не нашли исходных секций (Writer._prepare_generation).
+
+Два ранжирования секций актуальных версий документов проекта (is_current_version = TRUE):
+- полнотекстовое: source_sections.content_tsv (tsvector по header и content_text, GIN индекс),
+  ts_rank_cd по OR-запросу из слов запроса (без служебных слов): запрос Writer - заголовок
+  и инструкции маппингов, секция не обязана содержать все их слова
+- векторное: cosine distance pgvector (оператор <=>) по эмбеддингам фрагментов секций
+  (source_section_chunks, HNSW индекс); секция ранжируется по ближайшему фрагменту, а найденные
+  фрагменты становятся выдержкой (excerpt) для промпта. При CHUNK_EMBEDDINGS_ENABLED=false -
+  по source_sections.embedding (заголовок и начало секции)
+объединяются reciprocal rank fusion (RRF): score = 1 / (k + rank_text) + 1 / (k + rank_vector).
+
+Обе ветки и слияние выполняются одним SQL-запросом. Каждая ветка берет не больше
+HYBRID_SEARCH_CANDIDATES кандидатов, поэтому время запроса определяется размером проекта
+и числом кандидатов, а не общим числом секций в БД: для небольшого проекта планировщик
+считает расстояния точно по секциям проекта (idx_source_sections_document_id), для
+крупного - обходит HNSW индекс. Индексы и колонка content_tsv - docs/migrations/005_hybrid_search.sql.
+"""
+import re
+from typing import Any, Dict, List, Optional
+from uuid import UUID
+
+from sqlalchemy import desc, false, literal_column, select, text
+from sqlalchemy.dialects.postgresql import aggregate_order_by
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import defer
+from sqlalchemy.sql import func
+
+from config import settings
+from models import SourceDocument, SourceSection, SourceSectionChunk
+from services.llm import LLMClient
+from services.metrics import track_stage
+
+# Text search configuration of source_sections.content_tsv (language-agnostic: RU and EN documents)
+TEXT_SEARCH_CONFIG = "simple"
+
+# Terms of the OR query: longer queries are cut (every term is a separate GIN lookup)
+MAX_QUERY_TERMS = 32
+
+# 'simple' keeps function words; in an OR query they would match nearly every section
+_STOP_WORDS = frozenset("""
+    a an and are as at be been by for from has have in into is it its not of on or such that the
+    their these this those to was were which with within without
+    а без более бы был была были было в во вы да для до его ее если есть же за и из или им их
+    к как ко ли на над не нет ни но о об от по под после при с со так также то только у что чтобы эти это
+""".split())
+
+_WORD = re.compile(r"[^\W_]+")
+
+# Set to False after the first failure: pgvector < 0.8 has no hnsw.iterative_scan
+_iterative_scan_supported = True
+
+
+class HybridSearch:
+    """
+    Гибридный (полнотекстовый + векторный) поиск по source_sections проекта.
+    """
+
+    def __init__(self, llm_client: LLMClient):
+        """
+        Инициализация поиска.
+
+        Args:
+            llm_client: Клиент для создания эмбеддинга запроса
+        """
+        self.llm_client = llm_client
+
+    async def search(
+        self,
+        session: AsyncSession,
+        project_id: UUID,
+        query_text: str,
+        limit: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Ищет секции актуальных версий документов проекта.
+
+        Если эмбеддинг запроса получить не удалось, работает только полнотекстовая ветка.
+
+        Args:
+            session: SQLAlchemy асинхронная сессия
+            project_id: UUID проекта
+            query_text: Текст запроса (например, заголовок целевой секции и инструкции)
+            limit: Количество секций (по умолчанию HYBRID_SEARCH_LIMIT)
+
+        Returns:
+            Список словарей {"section": SourceSection, "score": float, "text_rank": int | None,
+            "vector_rank": int | None, "excerpt": str | None} по убыванию score (rank - место
+            в своей ветке, с 1; excerpt - найденные векторной веткой фрагменты секции)
+        """
+        if not query_text or not query_text.strip():
+            return []
+        query_text = query_text.strip()
+        limit = limit or settings.HYBRID_SEARCH_LIMIT
+
+        query_embedding = None
+        try:
+            query_embedding = await self.llm_client.get_embedding(query_text)
+        except Exception as e:
+            print(f"Ошибка при получении эмбеддинга запроса гибридного поиска: {str(e)}")
+
+        with track_stage("hybrid_search"):
+            if query_embedding is not None:
+                await self._configure_vector_scan(session)
+            result = await session.execute(self._build_query(project_id, query_text, query_embedding, limit))
+            rows = result.all()
+
+        return [
+            {
+                "section": row.SourceSection,
+                "score": float(row.score),
+                "text_rank": row.text_rank,
+                "vector_rank": row.vector_rank,
+                "excerpt": _excerpt(row.SourceSection.content_text, row.chunk_starts, row.chunk_ends),
+            }
+            for row in rows
+        ]
+
+    def _build_query(
+        self,
+        project_id: UUID,
+        query_text: str,
+        query_embedding: Optional[List[float]],
+        limit: int
+    ):
+        """
+        Собирает запрос: ветки text_ranked и vector_ranked (CTE), FULL OUTER JOIN по ID секции и RRF.
+        """
+        candidates = settings.HYBRID_SEARCH_CANDIDATES
+        rrf_k = settings.HYBRID_SEARCH_RRF_K
+
+        # Documents of the project in scope: a semi-join that both index scans are filtered by
+        current_documents = select(SourceDocument.id).where(
+            SourceDocument.project_id == project_id,
+            SourceDocument.is_current_version == True
+        )
+
+        # Full-text branch: GIN index on content_tsv.
+        # websearch_to_tsquery would AND every word of the title and the instructions
+        terms = query_terms(query_text)
+        if terms:
+            tsquery = func.to_tsquery(literal_column(f"'{TEXT_SEARCH_CONFIG}'::regconfig"), " | ".join(terms))
+            text_candidates = (
+                select(
+                    SourceSection.id.label("id"),
+                    func.ts_rank_cd(SourceSection.content_tsv, tsquery).label("relevance")
+                )
+                .where(
+                    SourceSection.document_id.in_(current_documents),
+                    SourceSection.content_tsv.op("@@")(tsquery)
+                )
+                .order_by(desc("relevance"))
+                .limit(candidates)
+                .subquery("text_candidates")
+            )
+            text_ranked = select(
+                text_candidates.c.id,
+                func.row_number().over(order_by=text_candidates.c.relevance.desc()).label("rank")
+            ).cte("text_ranked")
+        else:
+            # Only function words or punctuation: nothing to search by text
+            text_ranked = select(
+                literal_column("NULL::uuid").label("id"),
+                literal_column("NULL::bigint").label("rank")
+            ).where(false()).cte("text_ranked")
+
+        if query_embedding is not None:
+            vector_ranked = self._vector_ranked(current_documents, query_embedding, candidates)
+            fused = (
+                select(
+                    func.coalesce(text_ranked.c.id, vector_ranked.c.id).label("id"),
+                    (
+                        func.coalesce(1.0 / (rrf_k + text_ranked.c.rank), 0)
+                        + func.coalesce(1.0 / (rrf_k + vector_ranked.c.rank), 0)
+                    ).label("score"),
+                    text_ranked.c.rank.label("text_rank"),
+                    vector_ranked.c.rank.label("vector_rank"),
+                    vector_ranked.c.chunk_starts,
+                    vector_ranked.c.chunk_ends
+                )
+                .select_from(
+                    text_ranked.outerjoin(vector_ranked, text_ranked.c.id == vector_ranked.c.id, full=True)
+                )
+            )
+        else:
+            fused = select(
+                text_ranked.c.id,
+                (1.0 / (rrf_k + text_ranked.c.rank)).label("score"),
+                text_ranked.c.rank.label("text_rank"),
+                literal_column("NULL::bigint").label("vector_rank"),
+                literal_column("NULL::integer[]").label("chunk_starts"),
+                literal_column("NULL::integer[]").label("chunk_ends")
+            )
+
+        fused = fused.order_by(desc("score")).limit(limit).subquery("fused")
+        return (
+            select(
+                SourceSection, fused.c.score, fused.c.text_rank, fused.c.vector_rank,
+                fused.c.chunk_starts, fused.c.chunk_ends
+            )
+            .join(fused, SourceSection.id == fused.c.id)
+            .order_by(fused.c.score.desc())
+            # Results are used as text; the 1536-dim vector would only cost transfer and parsing
+            .options(defer(SourceSection.embedding))
+        )
+
+    def _vector_ranked(self, current_documents, query_embedding: List[float], candidates: int):
+        """
+        Векторная ветка (CTE vector_ranked): ID секции, место в ветке и позиции найденных
+        фрагментов в content_text секции (chunk_starts, chunk_ends).
+        """
+        max_distance = 1 - settings.HYBRID_SEARCH_MIN_SIMILARITY
+        # The <=> operator (not cosine_distance()) is what the HNSW index serves.
+        # Only ORDER BY distance LIMIT is index-backed: a WHERE on the distance itself turns
+        # the branch into a sequential scan, so the similarity threshold is applied afterwards
+        if not settings.CHUNK_EMBEDDINGS_ENABLED:
+            distance = SourceSection.embedding.cosine_distance(query_embedding)
+            vector_candidates = (
+                select(SourceSection.id.label("id"), distance.label("distance"))
+                .where(
+                    SourceSection.document_id.in_(current_documents),
+                    SourceSection.embedding.isnot(None)
+                )
+                .order_by(distance)
+                .limit(candidates)
+                .subquery("vector_candidates")
+            )
+            return (
+                select(
+                    vector_candidates.c.id,
+                    func.row_number().over(order_by=vector_candidates.c.distance).label("rank"),
+                    literal_column("NULL::integer[]").label("chunk_starts"),
+                    literal_column("NULL::integer[]").label("chunk_ends")
+                )
+                .where(vector_candidates.c.distance <= max_distance)
+                .cte("vector_ranked")
+            )
+
+        distance = SourceSectionChunk.embedding.cosine_distance(query_embedding)
+        chunk_candidates = (
+            select(
+                SourceSectionChunk.section_id.label("id"),
+                SourceSectionChunk.char_start.label("char_start"),
+                SourceSectionChunk.char_end.label("char_end"),
+                distance.label("distance")
+            )
+            .where(
+                SourceSectionChunk.document_id.in_(current_documents),
+                SourceSectionChunk.embedding.isnot(None)
+            )
+            .order_by(distance)
+            .limit(candidates)
+            .subquery("chunk_candidates")
+        )
+        # A section ranks by its closest chunk; all its matched chunks form the excerpt
+        return (
+            select(
+                chunk_candidates.c.id,
+                func.row_number().over(order_by=func.min(chunk_candidates.c.distance)).label("rank"),
+                func.array_agg(
+                    aggregate_order_by(chunk_candidates.c.char_start, chunk_candidates.c.char_start)
+                ).label("chunk_starts"),
+                func.array_agg(
+                    aggregate_order_by(chunk_candidates.c.char_end, chunk_candidates.c.char_start)
+                ).label("chunk_ends")
+            )
+            .where(chunk_candidates.c.distance <= max_distance)
+            .group_by(chunk_candidates.c.id)
+            .cte("vector_ranked")
+        )
+
+    async def _configure_vector_scan(self, session: AsyncSession) -> None:
+        """
+        Настройки HNSW на текущую транзакцию (SET LOCAL): ef_search и, для pgvector >= 0.8,
+        iterative_scan - без него фильтр по проекту применяется после выборки ef_search
+        ближайших секций всей БД и может оставить меньше кандидатов, чем нужно.
+        """
+        global _iterative_scan_supported
+
+        await session.execute(text(f"SET LOCAL hnsw.ef_search = {int(settings.HYBRID_SEARCH_EF_SEARCH)}"))
+
+        scan_mode = settings.HYBRID_SEARCH_ITERATIVE_SCAN
+        if not (scan_mode and _iterative_scan_supported):
+            return
+        if scan_mode not in ("relaxed_order", "strict_order", "off"):
+            raise ValueError(f"Unsupported HYBRID_SEARCH_ITERATIVE_SCAN: {scan_mode}")
+        try:
+            # A savepoint keeps the caller's transaction usable if the parameter is unknown
+            async with session.begin_nested():
+                await session.execute(text(f"SET LOCAL hnsw.iterative_scan = {scan_mode}"))
+        except DBAPIError as e:
+            _iterative_scan_supported = False
+            print(f"hnsw.iterative_scan is not supported (pgvector < 0.8), project filter is applied after the scan: {str(e)}")
+
+
+def query_terms(query_text: str) -> List[str]:
+    """
+    Слова запроса для полнотекстовой ветки: в нижнем регистре, без служебных слов,
+    однобуквенных слов и повторов, не больше MAX_QUERY_TERMS.
+    """
+    terms: List[str] = []
+    for word in _WORD.findall(query_text.lower()):
+        if len(word) > 1 and word not in _STOP_WORDS and word not in terms:
+            terms.append(word)
+            if len(terms) == MAX_QUERY_TERMS:
+                break
+    return terms
+
+
+def _excerpt(content_text: Optional[str], starts: Optional[List[int]], ends: Optional[List[int]]) -> Optional[str]:
+    """
+    Выдержка из текста секции по найденным фрагментам: перекрывающиеся и соседние фрагменты
+    объединяются, несмежные разделяются "...". None, если фрагментов нет или они покрывают
+    весь текст секции (тогда в промпт идет сама секция с разметкой таблиц).
+    """
+    if not content_text or not starts:
+        return None
+    spans: List[List[int]] = []
+    for start, end in zip(starts, ends):
+        # Overlapping chunks, or consecutive ones separated only by whitespace
+        if spans and (start <= spans[-1][1] or not content_text[spans[-1][1]:start].strip()):
+            spans[-1][1] = max(spans[-1][1], end)
+        else:
+            spans.append([start, end])
+    if len(spans) == 1 and not content_text[:spans[0][0]].strip() and not content_text[spans[0][1]:].strip():
+        return None
+    return "\n\n...\n\n".join(content_text[start:end] for start, end in spans)
@@ -0,0 +1,111 @@
+"""
+Статистика обработки одного документа: время этапов (wall и CPU), счетчики
+и пиковое потребление памяти. Сохраняется в source_documents.parsing_metadata,
+чтобы медленные документы и регрессии между версиями парсера были видны прямо в БД.
+"""
+import resource
+import sys
+import time
+from contextlib import contextmanager
+from importlib import metadata
+from typing import Any, Dict, Iterator, Optional
+
+from config import settings
+from services.metrics import track_stage
+from services.tracing import start_span
+
+# Счетчики документа
+COUNTERS = (
+    "source_bytes",  # размер исходного файла
+    "bytes_downloaded",  # 0, если файл взят из чекпоинта
+    "tables_count",
+    "chunks_count",  # фрагменты секций с собственными эмбеддингами (source_section_chunks)
+    "embeddings_requested",  # тексты (секции и фрагменты), отправленные провайдеру эмбеддингов
+    "embeddings_cached",  # эмбеддинги, взятые из чекпоинта (повторная попытка)
+    "embeddings_failed",
+    "classification_queries",  # запросы классификации (эмбеддинг заголовка + векторный поиск)
+    "rows_inserted",  # строки source_sections
+)
+
+
+def _package_version(name: str) -> Optional[str]:
+    try:
+        return metadata.version(name)
+    except metadata.PackageNotFoundError:
+        return None
+
+
+class IngestionStats:
+    """
+    Сборщик статистики обработки документа.
+
+    Время этапа измеряется как wall time и CPU time процесса (time.process_time):
+    CPU учитывает все потоки процесса, поэтому точен в Celery worker, где процесс
+    обрабатывает одну задачу. Этапы дополнительно попадают в метрику Prometheus
+    ai_engine_stage_duration_seconds и в спан трассировки ingestion.<этап>.
+    """
+
+    def __init__(self):
+        self.stages: Dict[str, Dict[str, float]] = {}
+        self.counters: Dict[str, int] = {name: 0 for name in COUNTERS}
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        """
+        Измеряет этап (повторный вызов для того же этапа суммируется).
+
+        Пример:
+            with stats.stage("split"):
+                sections = parser.split_sections(markdown, tables)
+        """
+        wall_started = time.perf_counter()
+        cpu_started = time.process_time()
+        try:
+            with start_span(f"ingestion.{name}"), track_stage(name):
+                yield
+        finally:
+            entry = self.stages.setdefault(name, {"wall_seconds": 0.0, "cpu_seconds": 0.0})
+            entry["wall_seconds"] += time.perf_counter() - wall_started
+            entry["cpu_seconds"] += time.process_time() - cpu_started
+
+    def add(self, counter: str, value: int = 1) -> None:
+        """Увеличивает счетчик (см. COUNTERS)."""
+        self.counters[counter] = self.counters.get(counter, 0) + value
+
+    @staticmethod
+    def peak_rss_mb() -> float:
+        """Пиковый RSS процесса в МБ (за время жизни процесса, а не только этого документа)."""
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux reports kilobytes, macOS bytes
+        return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+    def as_dict(self) -> Dict[str, Any]:
+        """
+        Статистика для parsing_metadata:
+        {stages: {stage: {wall_seconds, cpu_seconds}}, counters: {...}, peak_rss_mb, versions: {...}}
+        """
+        return {
+            "stages": {
+                name: {key: round(value, 3) for key, value in entry.items()}
+                for name, entry in self.stages.items()
+            },
+            "counters": dict(self.counters),
+            "peak_rss_mb": round(self.peak_rss_mb(), 1),
+            "versions": {
+                "ai_engine": settings.APP_VERSION,
+                "docling": _package_version("docling"),
+            },
+        }
+
+
+@contextmanager
+def stage(stats: Optional[IngestionStats], name: str) -> Iterator[None]:
+    """
+    Измеряет этап в stats, если он передан; иначе - только метрикой Prometheus и спаном.
+    """
+    if stats is None:
+        with start_span(f"ingestion.{name}"), track_stage(name):
+            yield
+    else:
+        with stats.stage(name):
+            yield
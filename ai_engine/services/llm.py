@@ -2,10 +2,21 @@
 Сервис для работы с LLM и эмбеддингами.
 Поддерживает YandexGPT и OpenAI-compatible API.
 """
-from typing import List, Optional
+from typing import Any, AsyncIterator, Dict, List, Optional
 import os
+import time
 from openai import AsyncOpenAI
 from config import settings
+from services.embeddings import EmbeddingProvider, create_embedding_provider
+from services.llm_cache import LLMResponseCache, get_default_cache
+from services.llm_resilience import ResiliencePolicy, get_rate_limiter
+from services.metrics import record_cache, record_llm_call
+from services.tracing import get_tracer, record_error, set_attributes, start_span
+from services.prompt_manager import PromptManager
+
+
+class LLMError(Exception):
+    """Ошибка при обращении к LLM API (после исчерпания ретраев)."""
 
 
 class LLMClient:
@@ -14,20 +25,53 @@ class LLMClient:
     Поддерживает YandexGPT и OpenAI-compatible API.
     """
     
-    def __init__(self):
-        """Инициализация клиента."""
+    def __init__(
+        self,
+        cache: Optional[LLMResponseCache] = None,
+        embedding_provider: Optional[EmbeddingProvider] = None
+    ):
+        """
+        Инициализация клиента.
+        
+        Args:
+            cache: Кэш ответов LLM (по умолчанию общий кэш процесса, если LLM_CACHE_ENABLED=true)
+            embedding_provider: Провайдер эмбеддингов (по умолчанию согласно EMBEDDING_PROVIDER)
+        """
         self.api_key = settings.YANDEX_API_KEY or os.getenv("OPENAI_API_KEY")
         self.base_url = os.getenv("YANDEX_API_URL") or os.getenv("OPENAI_BASE_URL") or "https://api.openai.com/v1"
         
         # Используем OpenAI-compatible client (работает с YandexGPT и OpenAI)
+        # Built-in SDK retries are disabled: ResiliencePolicy owns retry/backoff
         self.client = AsyncOpenAI(
             api_key=self.api_key,
-            base_url=self.base_url
+            base_url=self.base_url,
+            max_retries=0,
+            timeout=settings.LLM_REQUEST_TIMEOUT
+        )
+        
+        # Ретраи, лимитер (общий на процесс для данного провайдера) и hedging
+        self.resilience = ResiliencePolicy(
+            limiter=get_rate_limiter(
+                self.base_url,
+                settings.LLM_RATE_LIMIT_RPS,
+                settings.LLM_RATE_LIMIT_BURST or None
+            ),
+            max_attempts=settings.LLM_MAX_ATTEMPTS,
+            base_delay=settings.LLM_RETRY_BASE_DELAY,
+            max_delay=settings.LLM_RETRY_MAX_DELAY,
+            hedge_delay=settings.LLM_HEDGE_DELAY_SECONDS
         )
         
         # Модели по умолчанию
         self.embedding_model = os.getenv("EMBEDDING_MODEL", "text-embedding-3-small")
         self.llm_model = os.getenv("LLM_MODEL", "gpt-4o-mini")
+        
+        # Провайдер эмбеддингов (удаленный API или локальная модель)
+        self.embedding_provider = embedding_provider or create_embedding_provider(self)
+        
+        # Кэш ответов (opt-in) и счетчики попаданий для trace_info
+        self.cache = cache if cache is not None else get_default_cache()
+        self.cache_stats: Dict[str, int] = {"hits": 0, "misses": 0}
     
     async def get_embedding(self, text: str) -> List[float]:
         """
@@ -40,60 +84,248 @@ class LLMClient:
             Список чисел (вектор размерности 1536)
             
         Raises:
-            Exception: Если произошла ошибка при получении эмбеддинга
+            LLMError: Если произошла ошибка при получении эмбеддинга (после ретраев)
         """
-        try:
-            # Для YandexGPT используем специальный endpoint
-            if "yandex" in self.base_url.lower():
-                # YandexGPT embeddings endpoint
-                response = await self.client.embeddings.create(
-                    model="text-search-doc",
-                    input=text
-                )
-            else:
-                # OpenAI-compatible endpoint
-                response = await self.client.embeddings.create(
-                    model=self.embedding_model,
-                    input=text
-                )
+        vectors = await self.get_embeddings([text])
+        return vectors[0]
+    
+    async def get_embeddings(self, texts: List[str]) -> List[List[float]]:
+        """
+        Получает эмбеддинги для списка текстов одним пакетом через настроенный провайдер.
+        
+        Args:
+            texts: Тексты для векторизации
             
-            return response.data[0].embedding
-        except Exception as e:
-            raise Exception(f"Ошибка при получении эмбеддинга: {str(e)}")
+        Returns:
+            Список векторов размерности 1536 (в порядке входных текстов)
+            
+        Raises:
+            LLMError: Если произошла ошибка при получении эмбеддингов
+        """
+        if not texts:
+            return []
+        
+        span_attributes = {
+            "embedding.provider": self.embedding_provider.name,
+            "embedding.texts_count": len(texts),
+        }
+        with start_span("llm.embed", **span_attributes):
+            try:
+                return await self.embedding_provider.embed(texts)
+            except Exception as e:
+                raise LLMError(f"Ошибка при получении эмбеддинга: {str(e)}") from e
     
     async def generate_text(
         self,
         system_prompt: str,
         user_prompt: str,
         temperature: float = 0.7,
-        max_tokens: Optional[int] = None
+        max_tokens: Optional[int] = None,
+        bypass_cache: bool = False
     ) -> str:
         """
         Генерирует текст с помощью LLM.
         
+        Если кэш включен, ответ на идентичный запрос (модель, промпты, температура,
+        max_tokens, версия промптов) берется из кэша без обращения к LLM.
+        
         Args:
             system_prompt: Системный промпт (инструкции для модели)
             user_prompt: Пользовательский промпт (контекст и запрос)
             temperature: Температура генерации (0.0-1.0)
             max_tokens: Максимальное количество токенов в ответе
+            bypass_cache: Не читать ответ из кэша ("сгенерировать заново"); новый ответ все равно сохраняется
             
         Returns:
             Сгенерированный текст
             
         Raises:
-            Exception: Если произошла ошибка при генерации
+            LLMError: Если произошла ошибка при генерации (после ретраев)
         """
+        with start_span("llm.generate", **self._span_attributes(max_tokens, temperature)) as span:
+            cache_key = self._cache_key(system_prompt, user_prompt, temperature, max_tokens)
+            cached = await self._cache_lookup(cache_key, bypass_cache)
+            set_attributes(span, **{"llm.cache_hit": cached is not None})
+            if cached is not None:
+                return cached
+            
+            started = time.perf_counter()
+            try:
+                raw = await self.resilience.call(
+                    lambda: self.client.chat.completions.with_raw_response.create(
+                        model=self.llm_model,
+                        messages=[
+                            {"role": "system", "content": system_prompt},
+                            {"role": "user", "content": user_prompt}
+                        ],
+                        temperature=temperature,
+                        max_tokens=max_tokens
+                    ),
+                    headers_of=lambda r: r.headers,
+                    hedge=True
+                )
+                response = raw.parse()
+            
+                content = response.choices[0].message.content
+            except Exception as e:
+                record_llm_call(self.llm_model, "generate", time.perf_counter() - started, status="error")
+                raise LLMError(f"Ошибка при генерации текста: {str(e)}") from e
+            
+            record_llm_call(self.llm_model, "generate", time.perf_counter() - started, usage=response.usage)
+            set_attributes(span, **self._usage_attributes(response.usage))
+            
+            await self._cache_store(cache_key, content)
+            return content
+    
+    async def stream_text(
+        self,
+        system_prompt: str,
+        user_prompt: str,
+        temperature: float = 0.7,
+        max_tokens: Optional[int] = None,
+        bypass_cache: bool = False
+    ) -> AsyncIterator[str]:
+        """
+        Генерирует текст с помощью LLM в потоковом режиме.
+        Возвращает фрагменты (дельты) ответа по мере их поступления от провайдера.
+        
+        Args:
+            system_prompt: Системный промпт (инструкции для модели)
+            user_prompt: Пользовательский промпт (контекст и запрос)
+            temperature: Температура генерации (0.0-1.0)
+            max_tokens: Максимальное количество токенов в ответе
+            bypass_cache: Не читать ответ из кэша; при попадании в кэш ответ отдается одним фрагментом
+            
+        Yields:
+            Фрагменты сгенерированного текста
+            
+        Raises:
+            LLMError: Если произошла ошибка при генерации
+        """
+        cache_key = self._cache_key(system_prompt, user_prompt, temperature, max_tokens)
+        cached = await self._cache_lookup(cache_key, bypass_cache)
+        if cached is not None:
+            yield cached
+            return
+        
+        # Not the current span: the consumer resumes this generator from other contexts
+        span = get_tracer().start_span("llm.stream")
+        set_attributes(span, **self._span_attributes(max_tokens, temperature))
+        parts: List[str] = []
+        usage = None
+        started = time.perf_counter()
         try:
-            response = await self.client.chat.completions.create(
-                model=self.llm_model,
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_prompt}
-                ],
-                temperature=temperature,
-                max_tokens=max_tokens
+            # Retries cover opening the stream; once tokens flow, errors are surfaced
+            stream = await self.resilience.call(
+                lambda: self.client.chat.completions.create(
+                    model=self.llm_model,
+                    messages=[
+                        {"role": "system", "content": system_prompt},
+                        {"role": "user", "content": user_prompt}
+                    ],
+                    temperature=temperature,
+                    max_tokens=max_tokens,
+                    stream=True
+                )
             )
             
-            return response.choices[0].message.content
+            async for chunk in stream:
+                # Some providers send service chunks without choices (e.g. usage)
+                if getattr(chunk, "usage", None):
+                    usage = chunk.usage
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta.content
+                if delta:
+                    parts.append(delta)
+                    yield delta
+        except Exception as e:
+            record_llm_call(self.llm_model, "stream", time.perf_counter() - started, status="error")
+            record_error(span, e)
+            raise LLMError(f"Ошибка при потоковой генерации текста: {str(e)}") from e
+        finally:
+            set_attributes(span, **self._usage_attributes(usage), **{"llm.chunks": len(parts)})
+            span.end()
+        
+        # Includes the time the consumer spent between chunks
+        record_llm_call(self.llm_model, "stream", time.perf_counter() - started, usage=usage)
+        # Only complete responses are cached
+        await self._cache_store(cache_key, "".join(parts))
+    
+    def _span_attributes(self, max_tokens: Optional[int], temperature: float) -> Dict[str, Any]:
+        """Атрибуты спана запроса к LLM (семантические соглашения gen_ai)."""
+        return {
+            "gen_ai.request.model": self.llm_model,
+            "gen_ai.request.max_tokens": max_tokens,
+            "gen_ai.request.temperature": temperature,
+            "server.address": self.base_url,
+        }
+    
+    @staticmethod
+    def _usage_attributes(usage: Optional[Any]) -> Dict[str, Any]:
+        """Токены из usage ответа провайдера для атрибутов спана."""
+        if usage is None:
+            return {}
+        return {
+            "gen_ai.usage.input_tokens": getattr(usage, "prompt_tokens", None),
+            "gen_ai.usage.output_tokens": getattr(usage, "completion_tokens", None),
+        }
+    
+    def _cache_key(
+        self,
+        system_prompt: str,
+        user_prompt: str,
+        temperature: float,
+        max_tokens: Optional[int]
+    ) -> Optional[str]:
+        """
+        Строит ключ кэша по всем параметрам запроса. Возвращает None, если кэш выключен.
+        """
+        if self.cache is None:
+            return None
+        
+        params: Dict[str, Any] = {
+            "base_url": self.base_url,
+            "model": self.llm_model,
+            "system_prompt": system_prompt,
+            "user_prompt": user_prompt,
+            "temperature": temperature,
+            "max_tokens": max_tokens,
+            "prompt_version": PromptManager().get_version(),
+        }
+        return LLMResponseCache.make_key(params)
+    
+    async def _cache_lookup(self, cache_key: Optional[str], bypass_cache: bool) -> Optional[str]:
+        """
+        Ищет ответ в кэше и обновляет счетчики попаданий/промахов.
+        """
+        if cache_key is None:
+            return None
+        
+        cached = None
+        if not bypass_cache:
+            try:
+                cached = await self.cache.get(cache_key)
+            except Exception as e:
+                # A broken cache backend must not break generation
+                print(f"Ошибка при чтении кэша LLM: {str(e)}")
+        
+        if cached is not None:
+            self.cache_stats["hits"] += 1
+        else:
+            self.cache_stats["misses"] += 1
+        if not bypass_cache:
+            record_cache("llm", cached is not None)
+        return cached
+    
+    async def _cache_store(self, cache_key: Optional[str], content: Optional[str]) -> None:
+        """
+        Сохраняет ответ в кэш (пустые ответы не кэшируются).
+        """
+        if cache_key is None or not content:
+            return
+        
+        try:
+            await self.cache.set(cache_key, content)
         except Exception as e:
-            raise Exception(f"Ошибка при генерации текста: {str(e)}")
+            print(f"Ошибка при записи в кэш LLM: {str(e)}")
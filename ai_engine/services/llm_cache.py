@@ -0,0 +1,129 @@
+"""
+Кэш ответов LLM.
+Детерминированный ключ по всем параметрам запроса и версии промптов,
+TTL/LRU вытеснение в памяти процесса и персистентный бэкенд в Redis.
+"""
+import hashlib
+import json
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from config import settings
+
+
+class LLMResponseCache:
+    """
+    Кэш ответов LLM.
+
+    Бэкенды:
+    - "memory": LRU в памяти процесса с TTL (по умолчанию)
+    - "redis": персистентный кэш в Redis (TTL через EXPIRE, вытеснение - политикой maxmemory Redis)
+    """
+
+    KEY_PREFIX = "llm_cache:"
+
+    def __init__(
+        self,
+        backend: str = "memory",
+        ttl_seconds: int = 7 * 24 * 3600,
+        max_entries: int = 1000,
+        redis_url: Optional[str] = None
+    ):
+        """
+        Инициализация кэша.
+
+        Args:
+            backend: Тип бэкенда ("memory" или "redis")
+            ttl_seconds: Время жизни записи в секундах
+            max_entries: Максимальное количество записей (только для "memory")
+            redis_url: URL Redis (только для "redis")
+
+        Raises:
+            ValueError: Если указан неизвестный бэкенд
+        """
+        if backend not in ("memory", "redis"):
+            raise ValueError(f"Unknown LLM cache backend: {backend}")
+
+        self.backend = backend
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self._redis = None
+
+        if backend == "redis":
+            import redis.asyncio as aioredis
+            self._redis = aioredis.from_url(redis_url or settings.CELERY_BROKER_URL)
+
+    @staticmethod
+    def make_key(params: Dict[str, Any]) -> str:
+        """
+        Строит детерминированный ключ кэша из параметров запроса.
+
+        Args:
+            params: Все параметры, влияющие на ответ (модель, промпты, температура, версия промптов и т.д.)
+
+        Returns:
+            SHA-256 хэш параметров в hex
+        """
+        payload = json.dumps(params, sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    async def get(self, key: str) -> Optional[str]:
+        """
+        Возвращает закэшированный ответ или None, если записи нет или она устарела.
+        """
+        if self._redis is not None:
+            value = await self._redis.get(self.KEY_PREFIX + key)
+            return value.decode("utf-8") if value is not None else None
+
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            return None
+
+        # Mark as most recently used
+        self._entries.move_to_end(key)
+        return value
+
+    async def set(self, key: str, value: str) -> None:
+        """
+        Сохраняет ответ в кэш.
+        """
+        if self._redis is not None:
+            await self._redis.set(self.KEY_PREFIX + key, value, ex=self.ttl_seconds)
+            return
+
+        self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+
+_default_cache: Optional[LLMResponseCache] = None
+
+
+def get_default_cache() -> Optional[LLMResponseCache]:
+    """
+    Возвращает общий для процесса кэш, если он включен (LLM_CACHE_ENABLED=true).
+
+    Returns:
+        Экземпляр LLMResponseCache или None, если кэш выключен
+    """
+    global _default_cache
+
+    if not settings.LLM_CACHE_ENABLED:
+        return None
+
+    if _default_cache is None:
+        _default_cache = LLMResponseCache(
+            backend=settings.LLM_CACHE_BACKEND,
+            ttl_seconds=settings.LLM_CACHE_TTL_SECONDS,
+            max_entries=settings.LLM_CACHE_MAX_ENTRIES,
+            redis_url=settings.LLM_CACHE_REDIS_URL
+        )
+    return _default_cache
@@ -0,0 +1,289 @@
+"""
+Слой устойчивости для вызовов LLM API.
+Ретраи с экспоненциальной задержкой на 429/5xx, учет Retry-After и rate-limit заголовков,
+клиентский token bucket (общий на процесс) и опциональные hedged-запросы.
+"""
+import asyncio
+import random
+import re
+import time
+from email.utils import parsedate_to_datetime
+from typing import Awaitable, Callable, Dict, Mapping, Optional, TypeVar
+
+import openai
+from tenacity import AsyncRetrying, retry_if_exception, stop_after_attempt
+
+T = TypeVar("T")
+
+# HTTP statuses worth retrying: timeout, conflict, rate limit and server errors
+RETRYABLE_STATUS_CODES = {408, 409, 429}
+
+_DURATION_PART = re.compile(r"(\d+(?:\.\d+)?)(ms|s|m|h)")
+_DURATION_UNITS = {"ms": 0.001, "s": 1.0, "m": 60.0, "h": 3600.0}
+
+
+class TokenBucket:
+    """
+    Асинхронный token bucket для ограничения частоты запросов на стороне клиента.
+    Поддерживает паузу до указанного момента (по rate-limit заголовкам провайдера).
+    """
+
+    def __init__(self, rate_per_second: float, capacity: Optional[float] = None):
+        """
+        Args:
+            rate_per_second: Скорость пополнения (запросов в секунду); 0 - без ограничения
+            capacity: Размер "всплеска" (по умолчанию равен rate_per_second, минимум 1)
+        """
+        self.rate = rate_per_second
+        self.capacity = capacity or max(rate_per_second, 1.0)
+        self._tokens = self.capacity
+        self._updated_at = time.monotonic()
+        self._paused_until = 0.0
+
+    async def acquire(self) -> None:
+        """
+        Ожидает, пока не появится свободный токен и не закончится пауза.
+        """
+        # No asyncio.Lock on purpose: the bucket is shared per process and Celery tasks
+        # run on fresh event loops, while a lock would be bound to the first one.
+        # The check-and-take below has no await inside, so it is atomic within a loop.
+        while True:
+            now = time.monotonic()
+            if now < self._paused_until:
+                await asyncio.sleep(self._paused_until - now)
+                continue
+
+            if self.rate <= 0:
+                return
+
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.rate)
+            self._updated_at = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return
+
+            await asyncio.sleep((1 - self._tokens) / self.rate)
+
+    def pause(self, seconds: float) -> None:
+        """
+        Приостанавливает выдачу токенов на указанное время (не сокращает уже действующую паузу).
+        """
+        if seconds > 0:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+
+_limiters: Dict[str, TokenBucket] = {}
+
+
+def get_rate_limiter(name: str, rate_per_second: float, burst: Optional[float] = None) -> TokenBucket:
+    """
+    Возвращает общий для процесса лимитер с указанным именем (например, base_url провайдера).
+    Все экземпляры LLMClient в процессе делят один бюджет запросов.
+    """
+    limiter = _limiters.get(name)
+    if limiter is None:
+        limiter = TokenBucket(rate_per_second, burst)
+        _limiters[name] = limiter
+    return limiter
+
+
+def parse_duration(value: str) -> Optional[float]:
+    """
+    Разбирает длительность в формате OpenAI rate-limit заголовков ("1s", "6m0s", "120ms")
+    или число секунд.
+    """
+    value = value.strip()
+    try:
+        return float(value)
+    except ValueError:
+        pass
+
+    parts = _DURATION_PART.findall(value)
+    if not parts:
+        return None
+    return sum(float(amount) * _DURATION_UNITS[unit] for amount, unit in parts)
+
+
+def parse_retry_after(headers: Optional[Mapping[str, str]]) -> Optional[float]:
+    """
+    Возвращает задержку в секундах из заголовков Retry-After / retry-after-ms.
+    Поддерживает число секунд и HTTP-дату.
+    """
+    if not headers:
+        return None
+
+    retry_after_ms = headers.get("retry-after-ms")
+    if retry_after_ms:
+        try:
+            return float(retry_after_ms) / 1000.0
+        except ValueError:
+            pass
+
+    retry_after = headers.get("retry-after")
+    if not retry_after:
+        return None
+
+    try:
+        return max(float(retry_after), 0.0)
+    except ValueError:
+        pass
+
+    try:
+        retry_at = parsedate_to_datetime(retry_after)
+        return max(retry_at.timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+
+def rate_limit_pause(headers: Optional[Mapping[str, str]]) -> Optional[float]:
+    """
+    Вычисляет, на сколько нужно приостановить запросы по x-ratelimit-* заголовкам:
+    если бюджет запросов или токенов исчерпан, ждем до его сброса.
+    """
+    if not headers:
+        return None
+
+    pause = None
+    for kind in ("requests", "tokens"):
+        remaining = headers.get(f"x-ratelimit-remaining-{kind}")
+        reset = headers.get(f"x-ratelimit-reset-{kind}")
+        if remaining is None or reset is None:
+            continue
+        try:
+            exhausted = float(remaining) <= 0
+        except ValueError:
+            continue
+        if exhausted:
+            reset_seconds = parse_duration(reset)
+            if reset_seconds is not None:
+                pause = max(pause or 0.0, reset_seconds)
+    return pause
+
+
+def is_retryable(exc: BaseException) -> bool:
+    """
+    Определяет, является ли ошибка провайдера временной (429, 5xx, таймауты, обрывы соединения).
+    """
+    if isinstance(exc, (openai.APIConnectionError, openai.APITimeoutError)):
+        return True
+    if isinstance(exc, openai.APIStatusError):
+        return exc.status_code in RETRYABLE_STATUS_CODES or exc.status_code >= 500
+    return False
+
+
+def _error_headers(exc: BaseException) -> Optional[Mapping[str, str]]:
+    response = getattr(exc, "response", None)
+    return getattr(response, "headers", None)
+
+
+class ResiliencePolicy:
+    """
+    Политика выполнения вызова LLM API: лимитер, ретраи с backoff и hedging.
+    """
+
+    def __init__(
+        self,
+        limiter: TokenBucket,
+        max_attempts: int = 5,
+        base_delay: float = 1.0,
+        max_delay: float = 30.0,
+        hedge_delay: float = 0.0
+    ):
+        """
+        Args:
+            limiter: Общий token bucket процесса
+            max_attempts: Максимальное количество попыток (включая первую)
+            base_delay: Базовая задержка экспоненциального backoff (секунды)
+            max_delay: Максимальная задержка между попытками (секунды)
+            hedge_delay: Через сколько секунд отправлять дублирующий запрос (0 - hedging выключен)
+        """
+        self.limiter = limiter
+        self.max_attempts = max(1, max_attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.hedge_delay = hedge_delay
+
+    def _wait(self, retry_state) -> float:
+        """
+        Задержка перед следующей попыткой: Retry-After провайдера, если он есть,
+        иначе экспоненциальный backoff с "full jitter".
+        """
+        exc = retry_state.outcome.exception() if retry_state.outcome else None
+        retry_after = parse_retry_after(_error_headers(exc)) if exc else None
+        if retry_after is not None:
+            # Other coroutines in this process should back off as well
+            self.limiter.pause(retry_after)
+            return min(retry_after, self.max_delay)
+
+        backoff = min(self.max_delay, self.base_delay * (2 ** (retry_state.attempt_number - 1)))
+        return random.uniform(0, backoff)
+
+    async def call(
+        self,
+        func: Callable[[], Awaitable[T]],
+        headers_of: Optional[Callable[[T], Optional[Mapping[str, str]]]] = None,
+        hedge: bool = False
+    ) -> T:
+        """
+        Выполняет вызов с ограничением частоты, ретраями и (опционально) hedging.
+
+        Args:
+            func: Фабрика корутины запроса (вызывается заново на каждую попытку)
+            headers_of: Функция извлечения заголовков ответа для учета x-ratelimit-*
+            hedge: Разрешить дублирующий запрос (только для идемпотентных вызовов)
+
+        Returns:
+            Результат успешного вызова
+
+        Raises:
+            Исключение последней попытки, если ошибка не временная или попытки исчерпаны
+        """
+        async def attempt() -> T:
+            if hedge and self.hedge_delay > 0:
+                result = await self._hedged(func)
+            else:
+                await self.limiter.acquire()
+                result = await func()
+
+            if headers_of is not None:
+                pause = rate_limit_pause(headers_of(result))
+                if pause:
+                    self.limiter.pause(pause)
+            return result
+
+        retrying = AsyncRetrying(
+            stop=stop_after_attempt(self.max_attempts),
+            wait=self._wait,
+            retry=retry_if_exception(is_retryable),
+            reraise=True,
+        )
+        return await retrying(attempt)
+
+    async def _hedged(self, func: Callable[[], Awaitable[T]]) -> T:
+        """
+        Отправляет запрос и, если он не завершился за hedge_delay секунд, дублирующий запрос.
+        Возвращает первый успешный результат и отменяет оставшийся запрос.
+        """
+        async def limited() -> T:
+            await self.limiter.acquire()
+            return await func()
+
+        primary = asyncio.ensure_future(limited())
+        done, _ = await asyncio.wait({primary}, timeout=self.hedge_delay)
+        if done:
+            return primary.result()
+
+        secondary = asyncio.ensure_future(limited())
+        pending = {primary, secondary}
+        error: Optional[BaseException] = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
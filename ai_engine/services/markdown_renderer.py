@@ -0,0 +1,157 @@
+"""
+Рендеринг Markdown (ответы LLM) в HTML.
+Используется Writer (генерация и потоковая генерация секций, IncrementalMarkdownRenderer);
+полученный content_html затем используется редактором и экспортом.
+
+Парсер markdown-it-py (CommonMark) с таблицами GFM и зачеркиванием.
+Сырой HTML из ответа модели не пропускается (экранируется), опасные ссылки
+(javascript:, vbscript:, file:, data: кроме изображений) отбрасываются.
+"""
+import html as html_lib
+from typing import Optional, Tuple
+
+from markdown_it import MarkdownIt
+
+
+class MarkdownRenderer:
+    """
+    Конвертер Markdown в HTML для контента секций.
+    Парсер собирается один раз; экземпляр переиспользуется (см. get_markdown_renderer).
+    """
+
+    def __init__(self):
+        # html=False: raw HTML from the model is escaped instead of passed through
+        self._md = (
+            MarkdownIt("commonmark", {"html": False})
+            .enable("table")
+            .enable("strikethrough")
+        )
+
+    def render(self, markdown_text: str) -> str:
+        """
+        Преобразует Markdown в HTML.
+
+        Args:
+            markdown_text: Текст в формате Markdown
+
+        Returns:
+            Текст в формате HTML
+        """
+        return self._md.render(markdown_text)
+
+    def render_section(self, markdown_text: str, title: str) -> str:
+        """
+        Преобразует Markdown секции в HTML, добавляя заголовок секции,
+        если текст не начинается с заголовка h1/h2.
+
+        Args:
+            markdown_text: Текст в формате Markdown
+            title: Заголовок секции
+
+        Returns:
+            Текст в формате HTML
+        """
+        return with_section_title(self.render(markdown_text), title)
+
+    def split_completed(self, markdown_text: str) -> Tuple[str, str]:
+        """
+        Делит текст на завершенные блоки верхнего уровня и незавершенный хвост.
+        Последний блок считается незавершенным: модель может еще дописывать его
+        (строки таблицы, пункты списка), поэтому он остается в хвосте.
+
+        Args:
+            markdown_text: Накопленный Markdown
+
+        Returns:
+            Кортеж (завершенные блоки, хвост)
+        """
+        tokens = self._md.parse(markdown_text)
+        starts = [
+            token.map[0] for token in tokens
+            if token.level == 0 and token.nesting in (0, 1) and token.map
+        ]
+        if len(starts) < 2:
+            return "", markdown_text
+
+        lines = markdown_text.splitlines(keepends=True)
+        boundary = starts[-1]
+        return "".join(lines[:boundary]), "".join(lines[boundary:])
+
+
+def with_section_title(html: str, title: str) -> str:
+    """
+    Добавляет заголовок секции, если HTML не начинается с заголовка h1/h2.
+    """
+    stripped = html.lstrip()
+    if stripped.startswith("<h1>") or stripped.startswith("<h2>"):
+        return html
+    return f"<h1>{html_lib.escape(title or '')}</h1>\n{html}"
+
+
+_default_renderer: Optional[MarkdownRenderer] = None
+
+
+def get_markdown_renderer() -> MarkdownRenderer:
+    """
+    Возвращает общий для процесса экземпляр MarkdownRenderer.
+    """
+    global _default_renderer
+
+    if _default_renderer is None:
+        _default_renderer = MarkdownRenderer()
+    return _default_renderer
+
+
+class IncrementalMarkdownRenderer:
+    """
+    Инкрементальный конвертер Markdown в HTML для потоковой генерации.
+    Накапливает фрагменты от LLM и отдает HTML только для завершенных блоков верхнего уровня
+    (абзац, таблица, список), чтобы клиент не получал оборванную разметку.
+    """
+
+    def __init__(self, title: str, renderer: Optional[MarkdownRenderer] = None):
+        """
+        Args:
+            title: Заголовок секции (добавляется, если текст не начинается с заголовка)
+            renderer: Рендерер Markdown (по умолчанию общий для процесса)
+        """
+        self.renderer = renderer or get_markdown_renderer()
+        self.title = title
+        self._buffer = ""
+        self._started = False
+
+    def feed(self, delta: str) -> Optional[str]:
+        """
+        Добавляет фрагмент текста и возвращает HTML для новых завершенных блоков.
+
+        Args:
+            delta: Очередной фрагмент Markdown
+
+        Returns:
+            HTML завершенных блоков или None, если ни один блок еще не завершен
+        """
+        self._buffer += delta
+        # A block can only complete at a line break, so skip re-parsing mid-line deltas
+        if "\n" not in delta:
+            return None
+
+        completed, self._buffer = self.renderer.split_completed(self._buffer)
+        return self._render(completed)
+
+    def flush(self) -> Optional[str]:
+        """
+        Возвращает HTML для оставшегося в буфере текста (вызывается в конце потока).
+        """
+        remaining, self._buffer = self._buffer, ""
+        return self._render(remaining)
+
+    def _render(self, markdown_text: str) -> Optional[str]:
+        if not markdown_text.strip():
+            return None
+        html = self.renderer.render(markdown_text)
+
+        # Same title rule as Writer._markdown_to_html, applied to the first block only
+        if not self._started:
+            self._started = True
+            html = with_section_title(html, self.title)
+        return html
@@ -0,0 +1,259 @@
+"""
+Метрики AI Engine в формате Prometheus.
+API отдает их на GET /metrics, Celery worker - через отдельный HTTP-экспортер
+(порт METRICS_WORKER_PORT).
+
+Метрики:
+- ai_engine_stage_duration_seconds{stage} - длительность этапов пайплайна (см. STAGES)
+- ai_engine_llm_requests_total{model, operation, status}, ai_engine_llm_request_duration_seconds{model, operation}
+- ai_engine_llm_tokens_total{model, kind} - токены запроса (prompt) и ответа (completion)
+- ai_engine_cache_requests_total{cache, result} - попадания и промахи кэшей (llm, export_fragment, export_document)
+- ai_engine_db_connections_in_use, ai_engine_db_connections_opened_total, ai_engine_db_checkouts_total
+- ai_engine_task_rss_bytes{task}, ai_engine_task_peak_rss_growth_bytes{task} - память процесса worker'а
+  после задачи и прирост его пикового RSS за задачу (см. services/worker_memory.py)
+
+Celery worker (prefork) собирает метрики из дочерних процессов через multiprocess-режим
+prometheus_client: переменная окружения PROMETHEUS_MULTIPROC_DIR должна быть задана до запуска worker'а.
+"""
+import glob
+import os
+import time
+from contextlib import contextmanager
+from typing import Any, Iterator, Optional, Tuple
+
+from celery import Celery
+from celery.signals import worker_init, worker_process_shutdown
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+    start_http_server,
+)
+from sqlalchemy import event
+
+from config import settings
+
+
+def _multiprocess_dir() -> Optional[str]:
+    return os.environ.get("PROMETHEUS_MULTIPROC_DIR") or os.environ.get("prometheus_multiproc_dir")
+
+
+# Metrics without labels open their value files on creation: the directory must exist first
+if _multiprocess_dir():
+    os.makedirs(_multiprocess_dir(), exist_ok=True)
+
+# Pipeline stages measured by ai_engine_stage_duration_seconds
+STAGES = (
+    "download",
+    "docling_convert",
+    "document_walk",
+    "markdown_export",
+    "table_extraction",
+    "split",
+    "embed",
+    "classify",
+    "db_write",
+    "hybrid_search",
+    "llm_generate",
+    "pandoc_export",
+)
+
+# From fast in-process steps (split) up to long Docling conversions
+_DURATION_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+
+STAGE_DURATION = Histogram(
+    "ai_engine_stage_duration_seconds",
+    "Длительность этапа пайплайна",
+    ["stage"],
+    buckets=_DURATION_BUCKETS,
+)
+LLM_REQUESTS = Counter(
+    "ai_engine_llm_requests_total",
+    "Запросы к LLM API (без попаданий в кэш)",
+    ["model", "operation", "status"],
+)
+LLM_LATENCY = Histogram(
+    "ai_engine_llm_request_duration_seconds",
+    "Длительность запроса к LLM API с учетом ретраев",
+    ["model", "operation"],
+    buckets=_DURATION_BUCKETS,
+)
+LLM_TOKENS = Counter(
+    "ai_engine_llm_tokens_total",
+    "Токены LLM по данным провайдера",
+    ["model", "kind"],
+)
+CACHE_REQUESTS = Counter(
+    "ai_engine_cache_requests_total",
+    "Обращения к кэшам",
+    ["cache", "result"],
+)
+DB_CONNECTIONS_IN_USE = Gauge(
+    "ai_engine_db_connections_in_use",
+    "Соединения с БД, выданные сессиям",
+    multiprocess_mode="livesum",
+)
+DB_CONNECTIONS_OPENED = Counter(
+    "ai_engine_db_connections_opened_total",
+    "Открытые соединения с БД (с NullPool - на каждую сессию)",
+)
+DB_CHECKOUTS = Counter(
+    "ai_engine_db_checkouts_total",
+    "Выдачи соединений из пула",
+)
+
+# From 16 MB up to 16 GB
+_MEMORY_BUCKETS = tuple(2 ** power * 1024 * 1024 for power in range(4, 15))
+
+TASK_RSS = Histogram(
+    "ai_engine_task_rss_bytes",
+    "RSS процесса worker'а после задачи (после освобождения памяти)",
+    ["task"],
+    buckets=_MEMORY_BUCKETS,
+)
+TASK_PEAK_RSS_GROWTH = Histogram(
+    "ai_engine_task_peak_rss_growth_bytes",
+    "Прирост пикового RSS процесса worker'а за задачу (0 - задача уложилась в прежний пик)",
+    ["task"],
+    buckets=(0,) + _MEMORY_BUCKETS,
+)
+
+
+@contextmanager
+def track_stage(stage: str) -> Iterator[None]:
+    """
+    Измеряет длительность этапа пайплайна (в том числе завершившегося ошибкой).
+
+    Пример:
+        with track_stage("split"):
+            sections = parser.split_sections(markdown, tables)
+    """
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_DURATION.labels(stage).observe(time.perf_counter() - started)
+
+
+def record_llm_call(
+    model: str,
+    operation: str,
+    seconds: float,
+    status: str = "ok",
+    usage: Optional[Any] = None
+) -> None:
+    """
+    Записывает запрос к LLM API.
+
+    Args:
+        model: Имя модели
+        operation: Тип запроса (generate, stream, embed)
+        seconds: Длительность запроса
+        status: ok или error
+        usage: Объект usage из ответа провайдера (prompt_tokens, completion_tokens), если есть
+    """
+    LLM_REQUESTS.labels(model, operation, status).inc()
+    LLM_LATENCY.labels(model, operation).observe(seconds)
+    if usage is not None:
+        prompt_tokens = getattr(usage, "prompt_tokens", None) or 0
+        completion_tokens = getattr(usage, "completion_tokens", None) or 0
+        if prompt_tokens:
+            LLM_TOKENS.labels(model, "prompt").inc(prompt_tokens)
+        if completion_tokens:
+            LLM_TOKENS.labels(model, "completion").inc(completion_tokens)
+
+
+def record_task_memory(task: str, rss_bytes: int, peak_growth_bytes: int) -> None:
+    """Записывает память процесса worker'а после задачи."""
+    TASK_RSS.labels(task).observe(rss_bytes)
+    TASK_PEAK_RSS_GROWTH.labels(task).observe(max(0, peak_growth_bytes))
+
+
+def record_cache(cache: str, hit: bool) -> None:
+    """Записывает попадание или промах кэша."""
+    CACHE_REQUESTS.labels(cache, "hit" if hit else "miss").inc()
+
+
+def instrument_engine(engine) -> None:
+    """
+    Подключает счетчики соединений к движку SQLAlchemy (события пула работают и с NullPool).
+
+    Args:
+        engine: AsyncEngine или Engine
+    """
+    sync_engine = getattr(engine, "sync_engine", engine)
+    event.listen(sync_engine, "connect", lambda *args: DB_CONNECTIONS_OPENED.inc())
+
+    def on_checkout(*args):
+        DB_CHECKOUTS.inc()
+        DB_CONNECTIONS_IN_USE.inc()
+
+    event.listen(sync_engine, "checkout", on_checkout)
+    event.listen(sync_engine, "checkin", lambda *args: DB_CONNECTIONS_IN_USE.dec())
+
+
+def _collect_registry() -> CollectorRegistry:
+    # In multiprocess mode every process writes its own files: aggregate them on scrape
+    if _multiprocess_dir():
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return registry
+    return REGISTRY
+
+
+def render_metrics() -> Tuple[bytes, str]:
+    """
+    Возвращает текущие метрики в текстовом формате Prometheus.
+
+    Returns:
+        Кортеж (тело ответа, content type)
+    """
+    return generate_latest(_collect_registry()), CONTENT_TYPE_LATEST
+
+
+def _on_worker_init(sender=None, **kwargs) -> None:
+    directory = _multiprocess_dir()
+    if directory:
+        # Several workers may share the directory: each node gets its own subdirectory,
+        # which pool processes inherit through the environment
+        node_name = getattr(sender, "hostname", None) or str(os.getpid())
+        directory = os.path.join(directory, node_name.replace(os.sep, "_"))
+        os.makedirs(directory, exist_ok=True)
+        os.environ["PROMETHEUS_MULTIPROC_DIR"] = directory
+        # Files of a previous run of this node would be summed into the new one;
+        # no pool processes exist yet, so everything but our own files is stale
+        suffix = f"_{os.getpid()}.db"
+        for path in glob.glob(os.path.join(directory, "*.db")):
+            if not path.endswith(suffix):
+                try:
+                    os.remove(path)
+                except OSError:
+                    continue
+    else:
+        print("PROMETHEUS_MULTIPROC_DIR не задан: метрики дочерних процессов prefork-пула не экспортируются")
+    try:
+        start_http_server(settings.METRICS_WORKER_PORT, registry=_collect_registry())
+    except OSError as exc:
+        # E.g. the port is taken by another worker on the same host: the worker itself keeps running
+        print(f"Экспортер метрик на порту {settings.METRICS_WORKER_PORT} не запущен: {exc}")
+
+
+def _on_worker_process_shutdown(pid=None, **kwargs) -> None:
+    if _multiprocess_dir():
+        multiprocess.mark_process_dead(pid or os.getpid())
+
+
+def register_worker_exporter(app: Celery) -> None:
+    """
+    Запускает HTTP-экспортер метрик в главном процессе Celery worker.
+    Ничего не делает, если METRICS_WORKER_PORT=0.
+    """
+    if not settings.METRICS_WORKER_PORT:
+        return
+    worker_init.connect(_on_worker_init, weak=False)
+    worker_process_shutdown.connect(_on_worker_process_shutdown, weak=False)
@@ -0,0 +1,7 @@
+-- Убирает обертки секций (div.section) для форматов без блоков div (Markdown):
+-- иначе pandoc выводит их как сырой HTML.
+function Div(el)
+  if el.classes:includes("section") then
+    return el.content
+  end
+end
@@ -3,22 +3,28 @@
 Интегрирован с классификатором секций для привязки к шаблонам.
 """
 import asyncio
-import tempfile
+import shutil
 import uuid
 import time
 from pathlib import Path
-from typing import List, Optional
+from typing import Any, Awaitable, Callable, Dict, List, Optional
 from datetime import datetime
 import httpx
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from sqlalchemy import delete, select
 
 from config import settings
 from database import AsyncSessionLocal
-from models import SourceSection, SourceDocument
-from services import DoclingParser, Section
+from models import SourceSection, SourceSectionChunk, SourceDocument, SourceTable
+from services import Section, get_docling_parser
+from services.types import index_tables
+from services.chunker import chunk_sections, embedding_text
 from services.llm import LLMClient
 from services.classifier import SectionClassifier
+from services.checkpoint import IngestionCheckpoint, prune_stale_checkpoints
+from services.ingestion_stats import IngestionStats
+from services.profiling import profile_run
+from services.tracing import set_attributes, start_span
 
 
 async def download_file_from_url(url: str, output_path: Path) -> None:
@@ -79,25 +85,68 @@ async def download_file_from_supabase_storage(
         f.write(data)
 
 
+async def copy_file_from_local_storage(file_path: str, output_path: Path) -> None:
+    """
+    Копирует файл из локального хранилища (LOCAL_STORAGE_DIR).
+    
+    Args:
+        file_path: Путь к файлу относительно LOCAL_STORAGE_DIR
+        output_path: Путь для сохранения файла
+        
+    Raises:
+        ValueError: Если путь выходит за пределы LOCAL_STORAGE_DIR
+        FileNotFoundError: Если файл не найден
+    """
+    root = Path(settings.LOCAL_STORAGE_DIR).resolve()
+    source = (root / file_path).resolve()
+    if not source.is_relative_to(root):
+        raise ValueError(f"File path is outside of LOCAL_STORAGE_DIR: {file_path}")
+    await asyncio.to_thread(shutil.copyfile, source, output_path)
+
+
+async def download_file_from_storage(file_path: str, output_path: Path) -> None:
+    """
+    Скачивает файл из хранилища документов согласно STORAGE_BACKEND (supabase или local).
+    """
+    if settings.STORAGE_BACKEND == "local":
+        await copy_file_from_local_storage(file_path, output_path)
+    else:
+        await download_file_from_supabase_storage(file_path, output_path)
+
+
 async def process_document(
     doc_id: str,
     file_url: Optional[str] = None,
     file_path: Optional[str] = None,
     template_id: Optional[str] = None,
-    session: Optional[AsyncSession] = None
-) -> List[dict]:
+    session: Optional[AsyncSession] = None,
+    on_stage: Optional[Callable[[str], Awaitable[None]]] = None,
+    profile: bool = False
+) -> dict:
     """
     Обрабатывает документ: скачивает, парсит, классифицирует секции и сохраняет в БД.
     
+    Обработка разбита на этапы с чекпоинтами во временном хранилище
+    (downloaded -> converted -> sectioned -> embedded -> classified -> stored).
+    Повторный вызов для того же документа и файла продолжает с последнего
+    завершенного этапа: файл не скачивается и Docling не запускается повторно.
+    
     Args:
         doc_id: UUID документа в таблице source_documents
         file_url: URL файла для скачивания (если файл доступен по URL)
-        file_path: Путь к файлу в Supabase Storage (если файл в Storage)
+        file_path: Путь к файлу в хранилище (Supabase Storage или LOCAL_STORAGE_DIR, см. STORAGE_BACKEND)
         template_id: UUID шаблона документа для классификации секций
         session: SQLAlchemy сессия (если не указана, создается новая)
+        on_stage: Опциональный callback, вызываемый с названием этапа после его завершения
+            (используется для прогресса пакетной загрузки)
+        profile: Профилировать обработку (при PROFILING_ENABLED=true); сведения о профиле
+            сохраняются в parsing_metadata["profile"], в том числе при ошибке обработки
         
     Returns:
-        Список словарей с секциями: [{header: str, content: str, page: int}]
+        Краткий итог: {document_id, status, sections_count, page_count, classified_count, section_ids}
+        (и profile при профилировании).
+        Содержимое секций не возвращается: оно сохранено в source_sections
+        (итог передается через result backend Celery)
         
     Raises:
         ValueError: Если не указан file_url или file_path
@@ -107,9 +156,83 @@ async def process_document(
     if not file_url and not file_path:
         raise ValueError("Either file_url or file_path must be provided")
     
+    span_attributes = {
+        "document.id": doc_id,
+        "document.source": file_url or file_path,
+        "template.id": template_id,
+    }
+    run = None
+    try:
+        with profile_run("process_document", profile, **{"document.id": doc_id}) as run:
+            with start_span("ingestion.process_document", **span_attributes) as span:
+                result = await _process_document(doc_id, file_url, file_path, template_id, session, on_stage)
+                set_attributes(
+                    span,
+                    **{
+                        "document.sections_count": result["sections_count"],
+                        "document.page_count": result["page_count"],
+                    }
+                )
+    finally:
+        # The profile is saved after the profiler has stopped, also for failed runs
+        if run and run.info:
+            await _save_document_profile(doc_id, run.info, session)
+    
+    if run and run.info:
+        result["profile"] = run.info
+    return result
+
+
+async def _save_document_profile(doc_id: str, profile_info: dict, session: Optional[AsyncSession] = None) -> None:
+    """
+    Добавляет сведения о профиле в parsing_metadata документа.
+    Во внешней сессии изменение не коммитится (как и результат обработки).
+    Ошибка записи только логируется: профиль остается доступен по profile_id.
+    """
+    use_external_session = session is not None
+    try:
+        if not use_external_session:
+            session = AsyncSessionLocal()
+        try:
+            doc_uuid = uuid.UUID(doc_id) if isinstance(doc_id, str) else doc_id
+            doc_result = await session.execute(
+                select(SourceDocument).where(SourceDocument.id == doc_uuid)
+            )
+            source_doc = doc_result.scalar_one_or_none()
+            if source_doc:
+                source_doc.parsing_metadata = {**(source_doc.parsing_metadata or {}), "profile": profile_info}
+                if not use_external_session:
+                    await session.commit()
+        finally:
+            if not use_external_session:
+                await session.close()
+    except Exception as e:
+        print(f"Failed to save profile {profile_info.get('profile_id')} for document {doc_id}: {str(e)}")
+
+
+async def _process_document(
+    doc_id: str,
+    file_url: Optional[str],
+    file_path: Optional[str],
+    template_id: Optional[str],
+    session: Optional[AsyncSession],
+    on_stage: Optional[Callable[[str], Awaitable[None]]]
+) -> dict:
+    """Реализация process_document (этапы с чекпоинтами)."""
     start_time = time.time()
-    temp_dir = Path(tempfile.gettempdir())
-    temp_file = temp_dir / f"doc_{uuid.uuid4().hex}.tmp"
+    stats = IngestionStats()
+    checkpoint = IngestionCheckpoint(str(doc_id), source=file_url or file_path)
+    resumed_from = checkpoint.last_stage
+    source_file = checkpoint.path("source.bin")
+    set_attributes(**{"ingestion.resumed_from_stage": resumed_from})
+    
+    async def mark_stage(stage: str, **meta: Any) -> None:
+        checkpoint.mark(stage, **meta)
+        if on_stage is not None:
+            await on_stage(stage)
+    
+    if resumed_from and on_stage is not None:
+        await on_stage(resumed_from)
     
     # Инициализируем сервисы
     llm_client = LLMClient()
@@ -121,58 +244,134 @@ async def process_document(
         session = AsyncSessionLocal()
     
     try:
-        # Скачиваем файл
-        if file_url:
-            if file_url.startswith("http://") or file_url.startswith("https://"):
-                await download_file_from_url(file_url, temp_file)
-            else:
-                await download_file_from_supabase_storage(file_url, temp_file)
-        elif file_path:
-            await download_file_from_supabase_storage(file_path, temp_file)
+        # Stage 1: downloaded - скачиваем файл
+        if not checkpoint.is_done("downloaded"):
+            with stats.stage("download"):
+                if file_url:
+                    if file_url.startswith("http://") or file_url.startswith("https://"):
+                        await download_file_from_url(file_url, source_file)
+                    else:
+                        await download_file_from_storage(file_url, source_file)
+                elif file_path:
+                    await download_file_from_storage(file_path, source_file)
+            stats.add("bytes_downloaded", source_file.stat().st_size)
+            await mark_stage("downloaded")
+        if source_file.exists():
+            stats.add("source_bytes", source_file.stat().st_size)
         
-        # Парсим документ через DoclingParser
-        parser = DoclingParser()
-        sections: List[Section] = await parser.parse(str(temp_file))
+        # Stage 2: converted - конвертация через Docling (Markdown + таблицы)
+        parser = get_docling_parser()
+        if checkpoint.is_done("converted"):
+            converted = checkpoint.load_json("converted.json")
+            markdown_content = converted["markdown"]
+            # JSON object keys are strings, page numbers are ints
+            tables_data = {int(page): tables for page, tables in converted["tables"].items()}
+            # Checkpoints written before the document tree walk have no blocks
+            blocks = converted.get("blocks")
+        else:
+            markdown_content, tables_data, blocks = await parser.convert(str(source_file), stats)
+            checkpoint.save_json(
+                "converted.json",
+                {"markdown": markdown_content, "tables": tables_data, "blocks": blocks}
+            )
+            await mark_stage("converted")
+        # Sections reference the document's tables by id, as produced by split_sections
+        tables, _ = index_tables(tables_data)
+        stats.add("tables_count", len(tables))
         
-        # Обновляем статус документа на "processing"
-        doc_uuid = uuid.UUID(doc_id) if isinstance(doc_id, str) else doc_id
-        doc_result = await session.execute(
-            select(SourceDocument).where(SourceDocument.id == doc_uuid)
-        )
-        source_doc = doc_result.scalar_one_or_none()
-        if source_doc:
-            source_doc.status = "processing"
+        # Stage 3: sectioned - разбиение на секции
+        if checkpoint.is_done("sectioned"):
+            sections = [Section.from_dict(data, tables) for data in checkpoint.load_json("sections.json")]
+        else:
+            with stats.stage("split"):
+                sections = parser.split_sections(markdown_content, tables_data, blocks)
+            checkpoint.save_json("sections.json", [section.to_dict() for section in sections])
+            await mark_stage("sectioned")
+        
+        # Stage 4: embedded - эмбеддинги секций и их фрагментов (для гибридного поиска)
+        # Chunks are derived from the sections, so only their embeddings are checkpointed
+        chunks = chunk_sections(sections) if settings.CHUNK_EMBEDDINGS_ENABLED else []
+        stats.add("chunks_count", len(chunks))
+        if checkpoint.is_done("embedded"):
+            embeddings = checkpoint.load_json("embeddings.json")
+            stats.add("embeddings_cached", sum(1 for vector in embeddings if vector is not None))
+            # Checkpoints written before chunk embeddings (or with other chunk settings) have none
+            if checkpoint.stage_meta("embedded").get("chunks") == len(chunks):
+                chunk_embeddings = checkpoint.load_json("chunk_embeddings.json")
+                stats.add("embeddings_cached", sum(1 for vector in chunk_embeddings if vector is not None))
+            else:
+                with stats.stage("embed"):
+                    chunk_embeddings = await _embed_chunks(chunks, sections, llm_client, stats)
+        else:
+            with stats.stage("embed"):
+                embeddings = await _embed_sections(sections, llm_client, stats)
+                chunk_embeddings = await _embed_chunks(chunks, sections, llm_client, stats)
+            checkpoint.save_json("embeddings.json", embeddings)
+            checkpoint.save_json("chunk_embeddings.json", chunk_embeddings)
+            await mark_stage("embedded", chunks=len(chunks))
         
-        # Классифицируем и сохраняем секции
+        # Stage 5: classified - привязка секций к шаблону
         template_uuid = None
         if template_id:
             template_uuid = uuid.UUID(template_id) if isinstance(template_id, str) else template_id
         
-        result_sections = []
-        for section in sections:
-            # Классифицируем секцию, если указан template_id (custom_template_id)
-            # custom_section_id теперь ссылается на custom_section_id
-            custom_section_id = None
-            if template_uuid and section.header:
-                custom_section_id = await classifier.classify_section(
-                    session, section.header, template_uuid
-                )
-            
-            result_sections.append({
-                "header": section.header,
-                "content": section.content_markdown or section.content_text or "",
-                "page": section.page_number,
-                "custom_section_id": str(custom_section_id) if custom_section_id else None
-            })
+        if checkpoint.is_done("classified"):
+            custom_section_ids = [
+                uuid.UUID(value) if value else None
+                for value in checkpoint.load_json("classification.json")
+            ]
+        else:
+            custom_section_ids = []
+            with stats.stage("classify"):
+                for section in sections:
+                    # Классифицируем секцию, если указан template_id (custom_template_id)
+                    custom_section_id = None
+                    if template_uuid and section.header:
+                        stats.add("classification_queries")
+                        custom_section_id = await classifier.classify_section(
+                            session, section.header, template_uuid
+                        )
+                    custom_section_ids.append(custom_section_id)
+            checkpoint.save_json(
+                "classification.json",
+                [str(value) if value else None for value in custom_section_ids]
+            )
+            await mark_stage("classified")
+        
+        page_count = max((s.page_end or s.page_number or 0 for s in sections), default=0)
+        
+        def summary(section_ids: List[Any]) -> dict:
+            return {
+                "document_id": str(doc_id),
+                "status": "indexed",
+                "sections_count": len(sections),
+                "page_count": page_count,
+                "classified_count": sum(1 for value in custom_section_ids if value),
+                "section_ids": [str(value) for value in section_ids],
+            }
+        
+        # Stage 6: stored - сохранение в БД
+        doc_uuid = uuid.UUID(doc_id) if isinstance(doc_id, str) else doc_id
+        if checkpoint.is_done("stored"):
+            # IDs in section order, same as _save_sections_to_db returns them
+            stored_ids = checkpoint.stage_meta("stored").get("section_ids", [])
+            checkpoint.clear()
+            return summary(stored_ids)
         
-        # Сохраняем секции в БД
-        await _save_sections_to_db(
-            session, doc_id, sections, template_uuid, classifier, llm_client
+        doc_result = await session.execute(
+            select(SourceDocument).where(SourceDocument.id == doc_uuid)
         )
+        source_doc = doc_result.scalar_one_or_none()
         
-        # Собираем метрики парсинга
+        with stats.stage("db_write"):
+            section_ids = await _save_sections_to_db(
+                session, doc_id, sections, embeddings, custom_section_ids, tables,
+                chunks, chunk_embeddings
+            )
+            stats.add("rows_inserted", len(section_ids))
+        
+        # Собираем метрики парсинга (после db_write, чтобы этап попал в parsing_metadata)
         parsing_time = time.time() - start_time
-        page_count = max((s.page_number or 0 for s in sections), default=0)
         
         # Обновляем метаданные документа
         if source_doc:
@@ -180,19 +379,29 @@ async def process_document(
                 "parsing_time_seconds": parsing_time,
                 "page_count": page_count,
                 "sections_count": len(sections),
-                "parsed_at": datetime.utcnow().isoformat()
+                "resumed_from_stage": resumed_from,
+                "parsed_at": datetime.utcnow().isoformat(),
+                **stats.as_dict()
             }
+            source_doc.detected_tables_count = stats.counters["tables_count"]
             source_doc.status = "indexed"
         
         if not use_external_session:
             await session.commit()
         
-        return result_sections
+        if not use_external_session:
+            await mark_stage("stored", section_ids=[str(value) for value in section_ids])
+            checkpoint.clear()
+        
+        return summary(section_ids)
         
     except Exception as e:
         # Обновляем статус на "error" при ошибке
         if session:
             try:
+                if not use_external_session:
+                    # Drop the failed transaction before recording the error
+                    await session.rollback()
                 doc_uuid = uuid.UUID(doc_id) if isinstance(doc_id, str) else doc_id
                 doc_result = await session.execute(
                     select(SourceDocument).where(SourceDocument.id == doc_uuid)
@@ -202,7 +411,9 @@ async def process_document(
                     source_doc.status = "error"
                     source_doc.parsing_metadata = {
                         "error": str(e),
-                        "parsed_at": datetime.utcnow().isoformat()
+                        "failed_after_stage": checkpoint.last_stage,
+                        "parsed_at": datetime.utcnow().isoformat(),
+                        **stats.as_dict()
                     }
                 if not use_external_session:
                     await session.commit()
@@ -210,9 +421,9 @@ async def process_document(
                 pass
         raise
     finally:
-        # Удаляем временный файл
-        if temp_file.exists():
-            temp_file.unlink()
+        # Чекпоинты (включая скачанный файл) сохраняются до успешного завершения,
+        # устаревшие удаляются по INGESTION_CHECKPOINT_TTL_HOURS
+        prune_stale_checkpoints()
         # Закрываем сессию только если мы её создали
         if not use_external_session and session:
             await session.close()
@@ -222,50 +433,70 @@ async def _save_sections_to_db(
     session: AsyncSession,
     document_id: str,
     sections: List[Section],
-    template_id: Optional[uuid.UUID] = None,
-    classifier: Optional[SectionClassifier] = None,
-    llm_client: Optional[LLMClient] = None
-) -> None:
+    embeddings: List[Optional[List[float]]],
+    custom_section_ids: List[Optional[uuid.UUID]],
+    tables: Optional[List[Dict[str, Any]]] = None,
+    chunks: Optional[List[Dict[str, Any]]] = None,
+    chunk_embeddings: Optional[List[Optional[List[float]]]] = None
+) -> List[uuid.UUID]:
     """
-    Сохраняет секции документа в таблицу source_sections.
-    Классифицирует секции и создает эмбеддинги.
+    Сохраняет секции документа в таблицу source_sections, таблицы документа - в source_tables,
+    фрагменты секций - в source_section_chunks.
+    Эмбеддинги и классификация вычисляются на предыдущих этапах обработки.
+    
+    Каждая таблица сохраняется один раз на документ; content_structure секции хранит
+    ссылки на нее (Section.table_references), а не копию таблицы.
+    
+    Ранее сохраненные секции документа удаляются, поэтому повторное
+    сохранение (например, при повторной попытке задачи) не создает дубликатов.
     
     Args:
         session: SQLAlchemy асинхронная сессия
         document_id: UUID документа
         sections: Список секций для сохранения
-        template_id: UUID шаблона для классификации
-        classifier: Классификатор секций (опционально)
-        llm_client: Клиент для создания эмбеддингов (опционально)
+        embeddings: Эмбеддинги секций (в порядке sections)
+        custom_section_ids: ID секций шаблона (в порядке sections)
+        tables: Таблицы документа (index_tables), на которые ссылаются секции;
+            None - таблицы копируются в content_structure секций
+        chunks: Фрагменты секций (chunker.chunk_sections)
+        chunk_embeddings: Эмбеддинги фрагментов (в порядке chunks)
+        
+    Returns:
+        ID сохраненных секций (в порядке sections)
     """
     # Преобразуем document_id в UUID, если это строка
     doc_uuid = uuid.UUID(document_id) if isinstance(document_id, str) else document_id
     
-    # Создаем записи для каждой секции
-    for section in sections:
-        # Классифицируем секцию, если указан template_id и classifier
-        custom_section_id = None
-        if template_id and classifier and section.header:
-            custom_section_id = await classifier.classify_section(
-                session, section.header, template_id
-            )
-        
-        # Создаем эмбеддинг для секции (для гибридного поиска)
-        embedding = None
-        if llm_client:
-            # Используем заголовок + начало контента для эмбеддинга
-            text_for_embedding = section.header or ""
-            if section.content_text:
-                # Берем первые 500 символов контента
-                text_for_embedding += " " + section.content_text[:500]
-            
-            if text_for_embedding.strip():
-                try:
-                    embedding = await llm_client.get_embedding(text_for_embedding.strip())
-                except Exception as e:
-                    print(f"Ошибка при создании эмбеддинга для секции: {str(e)}")
-        
+    await session.execute(
+        delete(SourceSectionChunk).where(SourceSectionChunk.document_id == doc_uuid)
+    )
+    await session.execute(
+        delete(SourceSection).where(SourceSection.document_id == doc_uuid)
+    )
+    await session.execute(
+        delete(SourceTable).where(SourceTable.document_id == doc_uuid)
+    )
+    
+    # Таблицы документа - по одной записи; ID задаются заранее, чтобы сослаться на них из секций
+    table_row_ids = [uuid.uuid4() for _ in tables or ()]
+    session.add_all([
+        SourceTable(
+            id=table_row_id,
+            document_id=doc_uuid,
+            table_index=table_index,
+            page_number=table.get("page_number"),
+            row_count=table.get("row_count", 0),
+            column_count=table.get("column_count", 0),
+            content=table
+        )
+        for table_index, (table_row_id, table) in enumerate(zip(table_row_ids, tables or ()))
+    ])
+    
+    # Создаем записи для каждой секции (ID заранее - на них ссылаются фрагменты)
+    db_sections = []
+    for section, embedding, custom_section_id in zip(sections, embeddings, custom_section_ids):
         db_section = SourceSection(
+            id=uuid.uuid4(),
             document_id=doc_uuid,
             custom_section_id=custom_section_id,
             section_number=section.section_number,
@@ -273,10 +504,128 @@ async def _save_sections_to_db(
             page_number=section.page_number,
             content_text=section.content_text,
             content_markdown=section.content_markdown,
-            content_structure=section.content_structure,
+            content_structure=(
+                section.table_references(table_row_ids) if tables is not None else section.content_structure
+            ),
+            bbox=section.bbox,
             embedding=embedding
         )
         session.add(db_section)
+        db_sections.append(db_section)
+    
+    session.add_all([
+        SourceSectionChunk(
+            section_id=db_sections[chunk["section_index"]].id,
+            document_id=doc_uuid,
+            chunk_index=chunk["chunk_index"],
+            content=chunk["content"],
+            token_count=chunk["token_count"],
+            char_start=chunk["char_start"],
+            char_end=chunk["char_end"],
+            embedding=chunk_embedding
+        )
+        for chunk, chunk_embedding in zip(chunks or (), chunk_embeddings or ())
+    ])
     
     # Коммитим изменения
     await session.flush()
+    return [db_section.id for db_section in db_sections]
+
+
+async def _embed_sections(
+    sections: List[Section],
+    llm_client: LLMClient,
+    stats: Optional[IngestionStats] = None
+) -> List[Optional[List[float]]]:
+    """
+    Создает эмбеддинги секций (заголовок + начало контента) пакетно через провайдер эмбеддингов.
+    
+    Args:
+        sections: Список секций
+        llm_client: Клиент для создания эмбеддингов
+        stats: Статистика обработки документа (запрошенные и неудавшиеся эмбеддинги)
+        
+    Returns:
+        Список эмбеддингов (None для секций без текста или с ошибкой), в порядке секций
+    """
+    # Используем заголовок + начало контента для эмбеддинга
+    texts = {}
+    for index, section in enumerate(sections):
+        text_for_embedding = section.header or ""
+        if section.content_text:
+            # Берем первые 500 символов контента
+            text_for_embedding += " " + section.content_text[:500]
+        if text_for_embedding.strip():
+            texts[index] = text_for_embedding.strip()
+    
+    return await _embed_texts(texts, len(sections), llm_client, stats)
+
+
+async def _embed_chunks(
+    chunks: List[Dict[str, Any]],
+    sections: List[Section],
+    llm_client: LLMClient,
+    stats: Optional[IngestionStats] = None
+) -> List[Optional[List[float]]]:
+    """
+    Создает эмбеддинги фрагментов секций (заголовок секции + текст фрагмента) пакетно.
+    
+    Args:
+        chunks: Фрагменты секций (chunker.chunk_sections)
+        sections: Секции документа, на которые ссылаются фрагменты
+        llm_client: Клиент для создания эмбеддингов
+        stats: Статистика обработки документа
+        
+    Returns:
+        Список эмбеддингов (None при ошибке), в порядке фрагментов
+    """
+    texts = {
+        index: embedding_text(chunk, sections[chunk["section_index"]])
+        for index, chunk in enumerate(chunks)
+    }
+    return await _embed_texts(texts, len(chunks), llm_client, stats)
+
+
+async def _embed_texts(
+    texts: Dict[int, str],
+    count: int,
+    llm_client: LLMClient,
+    stats: Optional[IngestionStats] = None
+) -> List[Optional[List[float]]]:
+    """
+    Создает эмбеддинги текстов одним пакетом. Если пакетный запрос не удался, повторяет
+    по одному тексту, чтобы один проблемный текст не оставил без эмбеддингов весь документ.
+    
+    Args:
+        texts: Тексты по позициям результата
+        count: Размер результата
+        llm_client: Клиент для создания эмбеддингов
+        stats: Статистика обработки документа (запрошенные и неудавшиеся эмбеддинги)
+        
+    Returns:
+        Список эмбеддингов длины count (None для позиций без текста или с ошибкой)
+    """
+    embeddings: List[Optional[List[float]]] = [None] * count
+    if not texts:
+        return embeddings
+    
+    indices = list(texts.keys())
+    if stats is not None:
+        stats.add("embeddings_requested", len(indices))
+    try:
+        vectors = await llm_client.get_embeddings([texts[i] for i in indices])
+        for index, vector in zip(indices, vectors):
+            embeddings[index] = vector
+        return embeddings
+    except Exception as e:
+        print(f"Ошибка при пакетном создании эмбеддингов, повтор по одному тексту: {str(e)}")
+    
+    for index in indices:
+        try:
+            embeddings[index] = await llm_client.get_embedding(texts[index])
+        except Exception as e:
+            print(f"Ошибка при создании эмбеддинга: {str(e)}")
+            if stats is not None:
+                stats.add("embeddings_failed")
+    
+    return embeddings
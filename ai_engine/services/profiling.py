@@ -0,0 +1,143 @@
+"""
+Профилирование отдельных запусков по запросу: сэмплирующий профайлер (pyinstrument)
+вокруг одного /generate, экспорта или process_document.
+
+Профилирование включается для конкретного запуска: заголовком X-Profile: 1 или
+параметром ?profile=true в API, аргументом profile=True в Celery-задаче. На сервере
+должно быть PROFILING_ENABLED=true, иначе API отклоняет такие запросы, а задачи
+выполняются без профайлера.
+
+Профиль сохраняется в PROFILING_DIR (общая директория API и worker) в двух форматах:
+- <profile_id>.html - интерактивное дерево вызовов pyinstrument
+- <profile_id>.speedscope.json - flamegraph в формате speedscope (https://www.speedscope.app),
+  том же, что у py-spy record --format speedscope
+и отдается через GET /api/v1/profiles/{profile_id}?format=html|speedscope.
+"""
+import time
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, Optional
+
+from config import settings
+from services.tracing import set_attributes
+
+# Формат -> (суффикс файла, media type)
+PROFILE_FORMATS = {
+    "html": (".html", "text/html"),
+    "speedscope": (".speedscope.json", "application/json"),
+}
+
+
+class ProfileRun:
+    """Профиль одного запуска; info заполняется после выхода из блока profile_run."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.profile_id = uuid.uuid4().hex
+        self.info: Optional[Dict[str, Any]] = None
+
+
+def profile_url(profile_id: str) -> str:
+    """URL скачивания профиля (HTML по умолчанию)."""
+    return f"/api/v1/profiles/{profile_id}"
+
+
+def profile_path(profile_id: str, profile_format: str = "html", root: Optional[Path] = None) -> Path:
+    """
+    Путь к файлу профиля.
+
+    Raises:
+        ValueError: Если формат не поддерживается или profile_id не является UUID
+    """
+    if profile_format not in PROFILE_FORMATS:
+        raise ValueError(
+            f"Unsupported profile format: {profile_format} (expected one of {', '.join(PROFILE_FORMATS)})"
+        )
+    # Only the canonical hex id reaches the file system
+    profile_id = uuid.UUID(str(profile_id)).hex
+    return Path(root or settings.PROFILING_DIR) / f"{profile_id}{PROFILE_FORMATS[profile_format][0]}"
+
+
+@contextmanager
+def profile_run(name: str, enabled: bool = True, **attributes: Any) -> Iterator[Optional[ProfileRun]]:
+    """
+    Профилирует блок, если enabled и PROFILING_ENABLED; иначе отдает None.
+    Блок должен выполняться в том потоке (и для корутин - в той задаче asyncio),
+    в котором его нужно профилировать: внутри async_to_sync, а не снаружи.
+    Ошибка сохранения профиля не прерывает сам запуск.
+
+    Пример:
+        with profile_run("process_document", profile, **{"document.id": doc_id}) as run:
+            result = await process_document(...)
+        if run and run.info:
+            ...  # run.info["profile_id"], run.info["download_url"]
+    """
+    if not (enabled and settings.PROFILING_ENABLED):
+        yield None
+        return
+    try:
+        from pyinstrument import Profiler
+    except ImportError:
+        print("Profiling requested but pyinstrument is not installed; running without profiler")
+        yield None
+        return
+
+    run = ProfileRun(name)
+    set_attributes(**{"profile.id": run.profile_id})
+    profiler = Profiler(interval=settings.PROFILING_INTERVAL_SECONDS, async_mode="enabled")
+    profiler.start()
+    try:
+        yield run
+    finally:
+        session = profiler.stop()
+        try:
+            run.info = _save_profile(profiler, run, session, attributes)
+        except Exception as e:
+            print(f"Failed to save profile {run.profile_id} ({name}): {str(e)}")
+
+
+def _save_profile(profiler, run: ProfileRun, session, attributes: Dict[str, Any]) -> Dict[str, Any]:
+    from pyinstrument.renderers import SpeedscopeRenderer
+
+    root = Path(settings.PROFILING_DIR)
+    root.mkdir(parents=True, exist_ok=True)
+    prune_stale_profiles(root)
+    profile_path(run.profile_id, "html", root).write_text(profiler.output_html(), encoding="utf-8")
+    profile_path(run.profile_id, "speedscope", root).write_text(
+        profiler.output(SpeedscopeRenderer()), encoding="utf-8"
+    )
+    return {
+        "profile_id": run.profile_id,
+        "name": run.name,
+        "duration_seconds": round(session.duration, 3),
+        "sample_count": session.sample_count,
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "formats": list(PROFILE_FORMATS),
+        "download_url": profile_url(run.profile_id),
+        **{key: str(value) for key, value in attributes.items() if value is not None},
+    }
+
+
+def prune_stale_profiles(root: Optional[Path] = None, max_age_hours: Optional[float] = None) -> int:
+    """
+    Удаляет профили старше max_age_hours (по умолчанию PROFILING_TTL_HOURS).
+
+    Returns:
+        Количество удаленных файлов
+    """
+    root = Path(root or settings.PROFILING_DIR)
+    max_age_hours = settings.PROFILING_TTL_HOURS if max_age_hours is None else max_age_hours
+    if not root.exists():
+        return 0
+
+    cutoff = time.time() - max_age_hours * 3600
+    removed = 0
+    for entry in root.iterdir():
+        try:
+            if entry.is_file() and entry.stat().st_mtime < cutoff:
+                entry.unlink()
+                removed += 1
+        except OSError:
+            continue
+    return removed
@@ -0,0 +1,146 @@
+"""
+Отслеживание прогресса пакетной загрузки документов (batch ingestion) в Redis.
+Worker'ы отмечают этап каждого документа, API отдает агрегированный прогресс:
+количество документов по этапам, пропускную способность и ETA.
+"""
+import time
+import uuid
+from typing import Any, Dict, List, Optional
+
+import redis.asyncio as aioredis
+
+from config import settings
+
+# Этапы документа в пакете: ожидание в очереди, этапы обработки (см. services/checkpoint.py), ошибка
+QUEUED = "queued"
+STARTED = "started"
+FAILED = "failed"
+FINISHED_STAGES = ("stored", FAILED)
+
+# Статусы пакета
+BATCH_RUNNING = "running"
+BATCH_EXTRACTING = "extracting_globals"
+BATCH_COMPLETED = "completed"
+BATCH_COMPLETED_WITH_ERRORS = "completed_with_errors"
+
+
+class BatchProgressTracker:
+    """
+    Прогресс одного пакета в Redis.
+
+    Ключи:
+    - ingestion_batch:<id> - hash с метаданными пакета (total, project_id, status, время)
+    - ingestion_batch:<id>:docs - hash doc_id -> текущий этап
+    - ingestion_batch:<id>:errors - hash doc_id -> текст ошибки
+    """
+
+    KEY_PREFIX = "ingestion_batch:"
+
+    def __init__(self, batch_id: str, redis_url: Optional[str] = None):
+        """
+        Args:
+            batch_id: ID пакета
+            redis_url: URL Redis (по умолчанию CELERY_BROKER_URL)
+        """
+        self.batch_id = batch_id
+        # A client per tracker: Celery tasks run on fresh event loops, and a client is bound to its loop
+        self._redis = aioredis.from_url(redis_url or settings.CELERY_BROKER_URL, decode_responses=True)
+        self._meta_key = f"{self.KEY_PREFIX}{batch_id}"
+        self._docs_key = f"{self._meta_key}:docs"
+        self._errors_key = f"{self._meta_key}:errors"
+
+    @staticmethod
+    def new_batch_id() -> str:
+        return str(uuid.uuid4())
+
+    async def create(self, project_id: str, document_ids: List[str]) -> None:
+        """
+        Регистрирует пакет: все документы в этапе "queued".
+        """
+        now = time.time()
+        async with self._redis.pipeline(transaction=True) as pipe:
+            pipe.hset(self._meta_key, mapping={
+                "project_id": project_id,
+                "total": len(document_ids),
+                "status": BATCH_RUNNING,
+                "created_at": now,
+            })
+            pipe.hset(self._docs_key, mapping={doc_id: QUEUED for doc_id in document_ids})
+            self._expire(pipe)
+            await pipe.execute()
+
+    async def set_stage(self, document_id: str, stage: str) -> None:
+        """
+        Отмечает текущий этап документа.
+        """
+        async with self._redis.pipeline(transaction=True) as pipe:
+            pipe.hset(self._docs_key, document_id, stage)
+            if stage in FINISHED_STAGES:
+                pipe.hset(self._meta_key, "last_finished_at", time.time())
+            self._expire(pipe)
+            await pipe.execute()
+
+    async def set_failed(self, document_id: str, error: str) -> None:
+        """
+        Отмечает документ как окончательно упавший (после всех повторных попыток).
+        """
+        await self._redis.hset(self._errors_key, document_id, error[:1000])
+        await self.set_stage(document_id, FAILED)
+
+    async def set_status(self, status: str, **fields: Any) -> None:
+        """
+        Обновляет статус пакета и дополнительные поля (например, ошибку извлечения глобальных переменных).
+        """
+        mapping = {"status": status, **{key: str(value) for key, value in fields.items()}}
+        if status in (BATCH_COMPLETED, BATCH_COMPLETED_WITH_ERRORS):
+            mapping["completed_at"] = time.time()
+        await self._redis.hset(self._meta_key, mapping=mapping)
+
+    async def get(self) -> Optional[Dict[str, Any]]:
+        """
+        Возвращает агрегированный прогресс пакета или None, если пакет не найден (или истек TTL).
+        """
+        meta = await self._redis.hgetall(self._meta_key)
+        if not meta:
+            return None
+        docs = await self._redis.hgetall(self._docs_key)
+        errors = await self._redis.hgetall(self._errors_key)
+
+        stages: Dict[str, int] = {}
+        for stage in docs.values():
+            stages[stage] = stages.get(stage, 0) + 1
+
+        total = int(meta.get("total", 0))
+        finished = sum(stages.get(stage, 0) for stage in FINISHED_STAGES)
+        created_at = float(meta["created_at"])
+        end = float(meta.get("last_finished_at") or 0) if finished == total else time.time()
+        elapsed = max(end - created_at, 0.0)
+
+        # Throughput over finished documents; ETA assumes the remaining ones go at the same rate
+        throughput = finished / elapsed * 60 if finished and elapsed else None
+        remaining = total - finished
+        eta_seconds = remaining / (throughput / 60) if throughput and remaining else (0.0 if not remaining else None)
+
+        return {
+            "batch_id": self.batch_id,
+            "project_id": meta.get("project_id"),
+            "status": meta.get("status"),
+            "total": total,
+            "finished": finished,
+            "failed": stages.get(FAILED, 0),
+            "stages": stages,
+            "documents": docs,
+            "errors": errors,
+            "elapsed_seconds": round(elapsed, 1),
+            "throughput_per_minute": round(throughput, 2) if throughput else None,
+            "eta_seconds": round(eta_seconds, 1) if eta_seconds is not None else None,
+            "globals_error": meta.get("globals_error"),
+        }
+
+    async def close(self) -> None:
+        await self._redis.aclose()
+
+    def _expire(self, pipe) -> None:
+        ttl = settings.BATCH_PROGRESS_TTL_SECONDS
+        for key in (self._meta_key, self._docs_key, self._errors_key):
+            pipe.expire(key, ttl)
@@ -0,0 +1,172 @@
+"""
+Метрики очередей Celery: глубина очереди, время ожидания и время выполнения задач.
+Нужны для подбора числа и concurrency worker'ов под каждую нагрузку
+(см. очереди в celery_app.py).
+
+Время ожидания считается по заголовку enqueued_at, который добавляется при публикации
+задачи; выборки хранятся в Redis (последние QUEUE_METRICS_SAMPLES на очередь).
+"""
+import os
+import time
+from typing import Any, Dict, List, Optional
+
+import redis
+import redis.asyncio as aioredis
+from celery import Celery
+from celery.signals import before_task_publish, task_failure, task_postrun, task_prerun
+
+from config import settings
+
+KEY_PREFIX = "celery_queue_metrics:"
+ENQUEUED_AT_HEADER = "enqueued_at"
+
+# Task start times in this worker process: task_id -> (queue, perf_counter at start)
+_started: Dict[str, tuple] = {}
+_client: Optional[redis.Redis] = None
+_client_pid: Optional[int] = None
+
+
+def _get_client() -> redis.Redis:
+    # Prefork children must not share the parent's connection pool
+    global _client, _client_pid
+    if _client is None or _client_pid != os.getpid():
+        _client = redis.Redis.from_url(settings.CELERY_BROKER_URL, decode_responses=True)
+        _client_pid = os.getpid()
+    return _client
+
+
+def _samples_key(queue: str, kind: str) -> str:
+    return f"{KEY_PREFIX}{queue}:{kind}"
+
+
+def _record(queue: str, **samples: float) -> None:
+    # Metrics are best effort: a Redis hiccup must not fail the task
+    try:
+        with _get_client().pipeline(transaction=False) as pipe:
+            for kind, value in samples.items():
+                key = _samples_key(queue, kind)
+                pipe.lpush(key, round(value, 3))
+                pipe.ltrim(key, 0, settings.QUEUE_METRICS_SAMPLES - 1)
+            pipe.execute()
+    except Exception as e:
+        print(f"Failed to record queue metrics for {queue}: {str(e)}")
+
+
+def _queue_of(task) -> str:
+    delivery_info = task.request.delivery_info or {}
+    return delivery_info.get("routing_key") or task.app.conf.task_default_queue
+
+
+def _on_publish(headers=None, **kwargs) -> None:
+    if headers is not None:
+        headers.setdefault(ENQUEUED_AT_HEADER, time.time())
+
+
+def _on_prerun(task_id=None, task=None, **kwargs) -> None:
+    queue = _queue_of(task)
+    _started[task_id] = (queue, time.perf_counter())
+
+    enqueued_at = getattr(task.request, ENQUEUED_AT_HEADER, None)
+    # Retries and countdowns wait on purpose: only immediate deliveries measure queueing
+    if enqueued_at and not task.request.eta:
+        _record(queue, wait_seconds=max(time.time() - float(enqueued_at), 0.0))
+
+
+def _on_postrun(task_id=None, state=None, **kwargs) -> None:
+    started = _started.pop(task_id, None)
+    if started is None:
+        return
+    queue, started_at = started
+    _record(queue, run_seconds=time.perf_counter() - started_at)
+
+
+def _on_failure(task_id=None, sender=None, **kwargs) -> None:
+    try:
+        _get_client().incr(_samples_key(_queue_of(sender), "failed"))
+    except Exception:
+        pass
+
+
+def register_signal_handlers(app: Celery) -> None:
+    """
+    Подключает сбор метрик к сигналам Celery (публикация в API, выполнение в worker).
+    Ничего не делает, если QUEUE_METRICS_ENABLED=false.
+    """
+    if not settings.QUEUE_METRICS_ENABLED:
+        return
+    before_task_publish.connect(_on_publish, weak=False)
+    task_prerun.connect(_on_prerun, weak=False)
+    task_postrun.connect(_on_postrun, weak=False)
+    task_failure.connect(_on_failure, weak=False)
+
+
+def _percentile(values: List[float], percent: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(int(round(percent / 100 * (len(ordered) - 1))), len(ordered) - 1)
+    return round(ordered[index], 3)
+
+
+def _summary(values: List[float]) -> Dict[str, Any]:
+    return {
+        "samples": len(values),
+        "p50": _percentile(values, 50),
+        "p95": _percentile(values, 95),
+        "max": round(max(values), 3) if values else None,
+    }
+
+
+class QueueMetrics:
+    """
+    Чтение метрик очередей для API.
+    Глубина очереди - число сообщений в Redis с учетом подочередей приоритетов.
+    """
+
+    def __init__(self, app: Celery, redis_url: Optional[str] = None):
+        """
+        Args:
+            app: Приложение Celery (список очередей и настройки приоритетов)
+            redis_url: URL Redis (по умолчанию CELERY_BROKER_URL)
+        """
+        self.queues = [queue.name for queue in app.conf.task_queues]
+        transport_options = app.conf.broker_transport_options or {}
+        self._priority_steps = transport_options.get("priority_steps", [0, 3, 6, 9])
+        self._sep = transport_options.get("sep", "\x06\x16")
+        self._redis = aioredis.from_url(redis_url or settings.CELERY_BROKER_URL, decode_responses=True)
+
+    def _broker_keys(self, queue: str) -> List[str]:
+        # Kombu keeps priority 0 in the queue key itself and the others in <queue><sep><priority>
+        return [queue] + [f"{queue}{self._sep}{step}" for step in self._priority_steps if step]
+
+    async def collect(self) -> Dict[str, Any]:
+        """
+        Возвращает метрики по каждой очереди:
+        {queue: {depth, by_priority, wait_seconds: {samples, p50, p95, max}, run_seconds: {...}, failed}}
+        """
+        result: Dict[str, Any] = {}
+        for queue in self.queues:
+            broker_keys = self._broker_keys(queue)
+            async with self._redis.pipeline(transaction=False) as pipe:
+                for key in broker_keys:
+                    pipe.llen(key)
+                pipe.lrange(_samples_key(queue, "wait_seconds"), 0, -1)
+                pipe.lrange(_samples_key(queue, "run_seconds"), 0, -1)
+                pipe.get(_samples_key(queue, "failed"))
+                values = await pipe.execute()
+
+            depths = values[:len(broker_keys)]
+            wait, run, failed = values[len(broker_keys):]
+            result[queue] = {
+                "depth": sum(depths),
+                "by_priority": {
+                    str(step): depth for step, depth in zip([0] + [s for s in self._priority_steps if s], depths)
+                },
+                "wait_seconds": _summary([float(value) for value in wait]),
+                "run_seconds": _summary([float(value) for value in run]),
+                "failed": int(failed or 0),
+            }
+        return result
+
+    async def close(self) -> None:
+        await self._redis.aclose()
@@ -0,0 +1,170 @@
+"""
+Распределенная трассировка (OpenTelemetry): FastAPI -> Celery -> Docling -> LLM API -> Postgres.
+
+Код сервиса создает спаны через opentelemetry-api (без SDK это no-op), поэтому
+трассировка включается только настройкой TRACING_ENABLED=true. Для нее нужны
+opentelemetry-sdk и экспортер; автоматическая инструментация FastAPI, Celery
+(передача контекста в заголовках задач), SQLAlchemy и httpx (OpenAI SDK, скачивание
+файлов) подключается для установленных пакетов opentelemetry-instrumentation-*.
+
+Экспортеры (TRACING_EXPORTER):
+- otlp - OTLP/HTTP на TRACING_OTLP_ENDPOINT (Jaeger, Tempo, OpenTelemetry Collector)
+- console - спаны в stdout
+- file - спаны в TRACING_FILE_PATH (JSON lines), для сред без коллектора
+"""
+import json
+from contextlib import contextmanager
+from typing import Any, Iterator, Optional
+
+from celery import Celery
+from celery.signals import worker_process_init
+from opentelemetry import trace
+
+from config import settings
+
+_TRACER_NAME = "ai_engine"
+_configured = False
+
+
+def get_tracer() -> trace.Tracer:
+    return trace.get_tracer(_TRACER_NAME)
+
+
+@contextmanager
+def start_span(name: str, **attributes: Any) -> Iterator[trace.Span]:
+    """
+    Открывает спан как текущий; атрибуты со значением None пропускаются.
+    Исключение внутри блока записывается в спан и пробрасывается дальше.
+
+    Пример:
+        with start_span("ingestion.process_document", **{"document.id": doc_id}):
+            ...
+    """
+    with get_tracer().start_as_current_span(name) as span:
+        set_attributes(span, **attributes)
+        yield span
+
+
+def set_attributes(span: Optional[trace.Span] = None, **attributes: Any) -> None:
+    """
+    Добавляет атрибуты в спан (по умолчанию - в текущий).
+    Значения, которые OpenTelemetry не поддерживает (UUID и т.д.), приводятся к строке.
+    """
+    span = span or trace.get_current_span()
+    for key, value in attributes.items():
+        if value is None:
+            continue
+        if not isinstance(value, (str, bool, int, float)):
+            value = str(value)
+        span.set_attribute(key, value)
+
+
+def record_error(span: trace.Span, error: BaseException) -> None:
+    """Записывает исключение в спан, открытый вручную, и помечает спан как ошибочный."""
+    span.record_exception(error)
+    span.set_status(trace.Status(trace.StatusCode.ERROR, str(error)))
+
+
+def _create_exporter():
+    exporter = settings.TRACING_EXPORTER
+    if exporter == "otlp":
+        from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+        return OTLPSpanExporter(endpoint=settings.TRACING_OTLP_ENDPOINT)
+
+    from opentelemetry.sdk.trace.export import ConsoleSpanExporter
+    if exporter == "console":
+        return ConsoleSpanExporter()
+    if exporter == "file":
+        # One compact JSON object per line; the file stays open for the life of the process
+        out = open(settings.TRACING_FILE_PATH, "a", encoding="utf-8")
+        return ConsoleSpanExporter(
+            out=out,
+            formatter=lambda span: json.dumps(json.loads(span.to_json()), ensure_ascii=False) + "\n"
+        )
+    raise ValueError(f"Unknown TRACING_EXPORTER: {exporter} (expected otlp, console or file)")
+
+
+def _instrument_libraries(app=None) -> None:
+    # Each instrumentation is optional: only installed packages are enabled
+    try:
+        from opentelemetry.instrumentation.httpx import HTTPXClientInstrumentor
+        HTTPXClientInstrumentor().instrument()
+    except ImportError:
+        print("opentelemetry-instrumentation-httpx не установлен: HTTP-вызовы LLM API не трассируются")
+
+    try:
+        from opentelemetry.instrumentation.sqlalchemy import SQLAlchemyInstrumentor
+        from database import engine
+        SQLAlchemyInstrumentor().instrument(engine=engine.sync_engine)
+    except ImportError:
+        print("opentelemetry-instrumentation-sqlalchemy не установлен: запросы к БД не трассируются")
+
+    try:
+        from opentelemetry.instrumentation.celery import CeleryInstrumentor
+        CeleryInstrumentor().instrument()
+    except ImportError:
+        print("opentelemetry-instrumentation-celery не установлен: контекст не передается в задачи Celery")
+
+    if app is not None:
+        try:
+            from opentelemetry.instrumentation.fastapi import FastAPIInstrumentor
+            FastAPIInstrumentor.instrument_app(app, excluded_urls="health,metrics")
+        except ImportError:
+            print("opentelemetry-instrumentation-fastapi не установлен: запросы API не трассируются")
+
+
+def setup_tracing(service_name: str, app=None) -> None:
+    """
+    Настраивает провайдер трассировки, экспортер и автоматическую инструментацию.
+    Ничего не делает, если TRACING_ENABLED=false, и при повторном вызове в процессе.
+
+    Args:
+        service_name: Имя сервиса в трассах (ai-engine-api, ai-engine-worker)
+        app: Приложение FastAPI для инструментации входящих запросов
+
+    Raises:
+        RuntimeError: Если трассировка включена, но opentelemetry-sdk не установлен
+    """
+    global _configured
+
+    if not settings.TRACING_ENABLED or _configured:
+        return
+
+    try:
+        from opentelemetry.sdk.resources import Resource
+        from opentelemetry.sdk.trace import TracerProvider
+        from opentelemetry.sdk.trace.export import BatchSpanProcessor
+        from opentelemetry.sdk.trace.sampling import ParentBased, TraceIdRatioBased
+    except ImportError:
+        raise RuntimeError(
+            "TRACING_ENABLED=true requires opentelemetry-sdk: "
+            "pip install opentelemetry-sdk opentelemetry-exporter-otlp-proto-http "
+            "opentelemetry-instrumentation-fastapi opentelemetry-instrumentation-celery "
+            "opentelemetry-instrumentation-sqlalchemy opentelemetry-instrumentation-httpx"
+        )
+
+    provider = TracerProvider(
+        resource=Resource.create({
+            "service.name": service_name,
+            "service.version": settings.APP_VERSION,
+        }),
+        # Child spans follow the caller's decision, so a trace is never cut in half
+        sampler=ParentBased(TraceIdRatioBased(settings.TRACING_SAMPLE_RATIO)),
+    )
+    provider.add_span_processor(BatchSpanProcessor(_create_exporter()))
+    trace.set_tracer_provider(provider)
+    _instrument_libraries(app)
+    _configured = True
+
+
+def _on_worker_process_init(**kwargs) -> None:
+    # The span processor's export thread does not survive fork: set up in each pool process
+    setup_tracing("ai-engine-worker")
+
+
+def register_worker_tracing(app: Celery) -> None:
+    """
+    Включает трассировку в процессах пула Celery worker (если TRACING_ENABLED=true).
+    """
+    if settings.TRACING_ENABLED:
+        worker_process_init.connect(_on_worker_process_init, weak=False)
@@ -1,20 +1,219 @@
 """
 Типы данных для парсинга документов.
 """
-from dataclasses import dataclass
-from typing import Optional, Dict, List, Any
+import re
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+
+def markdown_to_text(markdown: Optional[str]) -> str:
+    """
+    Преобразует Markdown в чистый текст (удаляет разметку).
+
+    Args:
+        markdown: Markdown текст
+
+    Returns:
+        Чистый текст без разметки
+    """
+    if not markdown:
+        return ""
+
+    # Удаляем заголовки
+    text = re.sub(r'^#{1,6}\s+', '', markdown, flags=re.MULTILINE)
+
+    # Удаляем жирный и курсив
+    text = re.sub(r'\*\*([^*]+)\*\*', r'\1', text)
+    text = re.sub(r'\*([^*]+)\*', r'\1', text)
+    text = re.sub(r'__([^_]+)__', r'\1', text)
+    text = re.sub(r'_([^_]+)_', r'\1', text)
+
+    # Удаляем ссылки [текст](url) -> текст
+    text = re.sub(r'\[([^\]]+)\]\([^\)]+\)', r'\1', text)
+
+    # Удаляем изображения ![alt](url)
+    text = re.sub(r'!\[([^\]]*)\]\([^\)]+\)', '', text)
+
+    # Удаляем код блоки
+    text = re.sub(r'```[\s\S]*?```', '', text)
+    text = re.sub(r'`([^`]+)`', r'\1', text)
+
+    # Удаляем списки (маркеры)
+    text = re.sub(r'^\s*[-*+]\s+', '', text, flags=re.MULTILINE)
+    text = re.sub(r'^\s*\d+\.\s+', '', text, flags=re.MULTILINE)
+
+    # Удаляем горизонтальные линии
+    text = re.sub(r'^---+$', '', text, flags=re.MULTILINE)
+
+    # Очищаем множественные пробелы и переносы строк
+    text = re.sub(r'\n\s*\n\s*\n+', '\n\n', text)
+    text = re.sub(r' +', ' ', text)
+
+    return text.strip()
+
+
+def index_tables(
+    tables_data: Dict[int, List[Dict[str, Any]]]
+) -> Tuple[List[Dict[str, Any]], Dict[int, Tuple[int, ...]]]:
+    """
+    Собирает таблицы документа в один список, на который ссылаются секции.
+
+    Args:
+        tables_data: Таблицы по номерам страниц (результат DoclingParser.convert)
+
+    Returns:
+        Кортеж (таблицы документа, ID таблиц по номерам страниц); ID - позиция в списке,
+        порядок совпадает с порядком tables_data, поэтому ID воспроизводятся после чекпоинта
+    """
+    tables: List[Dict[str, Any]] = []
+    ids_by_page: Dict[int, Tuple[int, ...]] = {}
+    for page, page_tables in tables_data.items():
+        ids_by_page[page] = tuple(range(len(tables), len(tables) + len(page_tables)))
+        tables.extend(page_tables)
+    return tables, ids_by_page
 
 
-@dataclass
 class Section:
     """
     Представляет секцию документа после парсинга.
     Соответствует структуре таблицы source_sections.
+
+    Компактное представление для документов на тысячи секций:
+    - __slots__ вместо __dict__ у каждого экземпляра
+    - content_text по умолчанию не хранится, а вычисляется из content_markdown при обращении
+    - таблицы не копируются в секцию: секция хранит ID таблиц (table_ids) и ссылку на общий
+      список таблиц документа (index_tables), content_structure собирается при обращении
     """
-    section_number: Optional[str] = None  # например "3.1.2"
-    header: Optional[str] = None  # например "Критерии включения"
-    content_text: Optional[str] = None  # Чистый текст для поиска
-    content_markdown: Optional[str] = None  # Текст с разметкой таблиц (для LLM)
-    content_structure: Optional[Dict[str, Any]] = None  # Структурированное представление таблиц (JSON)
-    page_number: Optional[int] = None
-    hierarchy_level: Optional[int] = None  # Уровень вложенности заголовка (1 для H1, 2 для H2 и т.д.)
+
+    __slots__ = (
+        "section_number",
+        "header",
+        "content_markdown",
+        "page_number",
+        "page_end",
+        "hierarchy_level",
+        "bbox",
+        "table_ids",
+        "_tables",
+        "_content_text",
+        "_content_structure",
+    )
+
+    def __init__(
+        self,
+        section_number: Optional[str] = None,  # например "3.1.2"
+        header: Optional[str] = None,  # например "Критерии включения"
+        content_text: Optional[str] = None,  # Чистый текст для поиска (None - из content_markdown)
+        content_markdown: Optional[str] = None,  # Текст с разметкой таблиц (для LLM)
+        content_structure: Optional[Dict[str, Any]] = None,  # Явное представление таблиц (вместо table_ids)
+        page_number: Optional[int] = None,
+        hierarchy_level: Optional[int] = None,  # Уровень вложенности заголовка (1 для H1, 2 для H2 и т.д.)
+        page_end: Optional[int] = None,  # Последняя страница секции (по дереву документа Docling)
+        bbox: Optional[Dict[str, Any]] = None,  # Область секции в PDF: {"page", "x", "y", "w", "h", ...}
+        table_ids: Sequence[int] = (),  # ID таблиц секции в списке tables
+        tables: Optional[List[Dict[str, Any]]] = None  # Общий список таблиц документа
+    ):
+        self.section_number = section_number
+        self.header = header
+        self.content_markdown = content_markdown
+        self.page_number = page_number
+        self.hierarchy_level = hierarchy_level
+        self.page_end = page_end
+        self.bbox = bbox
+        self.table_ids = tuple(table_ids)
+        self._tables = tables
+        self._content_text = content_text
+        self._content_structure = content_structure
+
+    @property
+    def content_text(self) -> Optional[str]:
+        """Чистый текст для поиска: заданный явно или полученный из content_markdown."""
+        if self._content_text is not None:
+            return self._content_text
+        return markdown_to_text(self.content_markdown)
+
+    @content_text.setter
+    def content_text(self, value: Optional[str]) -> None:
+        self._content_text = value
+
+    @property
+    def content_structure(self) -> Optional[Dict[str, Any]]:
+        """Структурированное представление таблиц секции (JSON) или None."""
+        if self.table_ids and self._tables is not None:
+            tables = [self._tables[table_id] for table_id in self.table_ids]
+            return {"tables": tables, "table_count": len(tables)}
+        return self._content_structure
+
+    @content_structure.setter
+    def content_structure(self, value: Optional[Dict[str, Any]]) -> None:
+        self.table_ids = ()
+        self._content_structure = value
+
+    def table_references(self, table_row_ids: Sequence[Any]) -> Optional[Dict[str, Any]]:
+        """
+        content_structure для source_sections, когда таблицы документа сохранены один раз
+        в source_tables: ссылки на таблицы (ID строки и диапазон строк таблицы) вместо копий.
+        
+        Args:
+            table_row_ids: ID строк source_tables по ID таблиц документа (позициям в tables)
+            
+        Returns:
+            {"tables": [{"table_id", "table_index", "row_start", "row_end"}], "table_count": N};
+            явно заданный content_structure возвращается как есть
+        """
+        if not (self.table_ids and self._tables is not None):
+            return self._content_structure
+        references = [
+            {
+                "table_id": str(table_row_ids[table_id]),
+                "table_index": table_id,
+                "row_start": 0,
+                "row_end": self._tables[table_id].get("row_count", len(self._tables[table_id].get("rows", []))),
+            }
+            for table_id in self.table_ids
+        ]
+        return {"tables": references, "table_count": len(references)}
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        Сериализует секцию для чекпоинта: таблицы - только ID, текст - только если задан явно.
+        Восстанавливается from_dict с тем же списком таблиц.
+        """
+        return {
+            "section_number": self.section_number,
+            "header": self.header,
+            "content_text": self._content_text,
+            "content_markdown": self.content_markdown,
+            "content_structure": self._content_structure,
+            "page_number": self.page_number,
+            "hierarchy_level": self.hierarchy_level,
+            "page_end": self.page_end,
+            "bbox": self.bbox,
+            "table_ids": list(self.table_ids),
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any], tables: Optional[List[Dict[str, Any]]] = None) -> "Section":
+        """Восстанавливает секцию из to_dict (и из прежнего формата с полными полями)."""
+        return cls(**data, tables=tables)
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, Section):
+            return NotImplemented
+        return (
+            self.section_number == other.section_number
+            and self.header == other.header
+            and self.content_text == other.content_text
+            and self.content_markdown == other.content_markdown
+            and self.content_structure == other.content_structure
+            and self.page_number == other.page_number
+            and self.hierarchy_level == other.hierarchy_level
+            and self.page_end == other.page_end
+            and self.bbox == other.bbox
+        )
+
+    def __repr__(self) -> str:
+        return (
+            f"Section(section_number={self.section_number!r}, header={self.header!r}, "
+            f"page_number={self.page_number!r}, page_end={self.page_end!r}, hierarchy_level={self.hierarchy_level!r}, "
+            f"table_ids={self.table_ids!r})"
+        )
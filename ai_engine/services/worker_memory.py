@@ -0,0 +1,94 @@
+"""
+Управление памятью Celery worker'ов.
+
+- Перезапуск процесса пула по памяти, а не по числу задач: штатный механизм Celery
+  worker_max_memory_per_child (после каждой задачи сравнивает пиковый RSS процесса
+  с WORKER_MAX_MEMORY_MB, см. celery_app.py). Процессы после небольших документов
+  не перезапускаются и сохраняют загруженные модели Docling.
+- RSS процесса после каждой задачи и прирост пикового RSS за задачу - в метриках
+  ai_engine_task_rss_bytes и ai_engine_task_peak_rss_growth_bytes (по ним подбираются
+  WORKER_MAX_MEMORY_MB и пороги очереди parse_large).
+- release_memory() - явное освобождение памяти после тяжелых этапов.
+"""
+import ctypes
+import ctypes.util
+import gc
+import os
+import resource
+import sys
+from typing import Dict
+
+from celery import Celery
+from celery.signals import task_postrun, task_prerun
+
+from config import settings
+from services.metrics import record_task_memory
+
+_MB = 1024 * 1024
+
+# Peak RSS of the pool process when the task started, by task id
+_peak_at_start: Dict[str, int] = {}
+_libc = None
+
+
+def peak_rss_bytes() -> int:
+    """Пиковый RSS процесса за время его жизни."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def current_rss_bytes() -> int:
+    """Текущий RSS процесса (вне Linux - пиковый)."""
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return peak_rss_bytes()
+
+
+def _malloc_trim() -> None:
+    global _libc
+    if _libc is None:
+        try:
+            _libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6")
+            _libc.malloc_trim  # glibc only
+        except (OSError, AttributeError):
+            _libc = False
+    if _libc:
+        _libc.malloc_trim(0)
+
+
+def release_memory() -> None:
+    """
+    Освобождает память после тяжелого этапа: собирает циклические ссылки (результат
+    конвертации Docling, DataFrame таблиц) и возвращает свободную память кучи ОС
+    (malloc_trim в glibc) - без этого RSS процесса не уменьшается и после удаления объектов.
+    """
+    gc.collect()
+    _malloc_trim()
+
+
+def _on_task_prerun(task_id=None, **kwargs) -> None:
+    _peak_at_start[task_id] = peak_rss_bytes()
+
+
+def _on_task_postrun(task_id=None, task=None, **kwargs) -> None:
+    peak_before = _peak_at_start.pop(task_id, None)
+    release_memory()
+    peak = peak_rss_bytes()
+    growth = peak - peak_before if peak_before is not None else 0
+    record_task_memory(task.name, current_rss_bytes(), growth)
+
+    limit = settings.WORKER_MAX_MEMORY_MB * _MB
+    if limit and peak > limit:
+        print(
+            f"Task {task.name} [{task_id}]: peak RSS {peak / _MB:.0f} MB exceeds "
+            f"WORKER_MAX_MEMORY_MB={settings.WORKER_MAX_MEMORY_MB}, the pool process will be recycled"
+        )
+
+
+def register_memory_tracking(app: Celery) -> None:
+    """Подключает учет памяти задач к Celery worker'у (сигналы task_prerun/task_postrun)."""
+    task_prerun.connect(_on_task_prerun, weak=False)
+    task_postrun.connect(_on_task_postrun, weak=False)
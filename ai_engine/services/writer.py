@@ -2,7 +2,7 @@
 Сервис для генерации секций документов на основе Template Graph.
 Использует граф связей между секциями для генерации целевых секций.
 """
-from typing import List, Optional, Tuple, Dict, Any
+from typing import AsyncIterator, List, Optional, Tuple, Dict, Any
 from uuid import UUID
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, and_, desc
@@ -12,8 +12,31 @@ from models import (
     CustomSection, CustomMapping, IdealMapping, SourceSection, StudyGlobal, 
     SourceDocument, DeliverableSection, Deliverable, DeliverableSectionHistory
 )
+from config import settings
+from services.hybrid_search import HybridSearch
 from services.llm import LLMClient
 from services.prompt_manager import PromptManager
+from services.markdown_renderer import IncrementalMarkdownRenderer, get_markdown_renderer
+from services.metrics import track_stage
+
+
+def add_cache_trace(trace_info: Dict[str, Any], llm_client: LLMClient, bypass_cache: bool) -> None:
+    """
+    Добавляет в trace_info счетчики попаданий/промахов кэша LLM (если кэш включен).
+    
+    Args:
+        trace_info: Словарь trace_info для дополнения
+        llm_client: Клиент LLM, выполнивший генерацию
+        bypass_cache: Был ли кэш пропущен по запросу пользователя
+    """
+    if llm_client.cache is None:
+        return
+    
+    trace_info["llm_cache"] = {
+        "hits": llm_client.cache_stats["hits"],
+        "misses": llm_client.cache_stats["misses"],
+        "bypassed": bypass_cache
+    }
 
 
 class Writer:
@@ -31,12 +54,15 @@ class Writer:
         """
         self.llm_client = llm_client
         self.prompt_manager = PromptManager()
+        self.markdown_renderer = get_markdown_renderer()
+        self.hybrid_search = HybridSearch(llm_client)
     
     async def generate_section(
         self,
         session: AsyncSession,
         deliverable_section_id: UUID,
-        changed_by_user_id: UUID
+        changed_by_user_id: UUID,
+        bypass_cache: bool = False
     ) -> str:
         """
         Генерирует секцию документа на основе Template Graph.
@@ -50,6 +76,7 @@ class Writer:
             session: SQLAlchemy асинхронная сессия
             deliverable_section_id: UUID секции deliverable для генерации
             changed_by_user_id: UUID пользователя, инициировавшего генерацию (для истории)
+            bypass_cache: Сгенерировать заново, не используя кэш ответов LLM
             
         Returns:
             Сгенерированный текст секции в формате HTML/Markdown
@@ -57,6 +84,152 @@ class Writer:
         Raises:
             ValueError: Если секция не найдена или нет данных для генерации
         """
+        prepared = await self._prepare_generation(session, deliverable_section_id)
+        
+        if prepared["empty_content"] is not None:
+            await self._update_deliverable_section(
+                session, prepared["deliverable_section"], prepared["empty_content"], [], changed_by_user_id, None
+            )
+            return prepared["empty_content"]
+        
+        custom_section = prepared["custom_section"]
+        source_content_data = prepared["source_content_data"]
+        
+        try:
+            with track_stage("llm_generate"):
+                generated_content = await self.llm_client.generate_text(
+                    system_prompt=prepared["system_prompt"],
+                    user_prompt=prepared["user_prompt"],
+                    temperature=0.7,
+                    max_tokens=3000,
+                    bypass_cache=bypass_cache
+                )
+            
+            # Преобразуем Markdown в HTML
+            content_html = self._markdown_to_html(generated_content, custom_section.title)
+            
+            # Step 5: Формируем trace_info для audit trail
+            trace_info = self._build_trace_info(prepared["mappings"], source_content_data)
+            add_cache_trace(trace_info, self.llm_client, bypass_cache)
+            
+            # Step 6: Обновляем deliverable_sections и создаем историю
+            await self._update_deliverable_section(
+                session,
+                prepared["deliverable_section"],
+                content_html,
+                source_content_data["section_ids"],
+                changed_by_user_id,
+                trace_info
+            )
+            
+            return content_html
+            
+        except Exception as e:
+            raise Exception(f"Ошибка при генерации секции через LLM: {str(e)}")
+    
+    async def stream_section(
+        self,
+        session: AsyncSession,
+        deliverable_section_id: UUID,
+        changed_by_user_id: UUID,
+        bypass_cache: bool = False
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Потоковый вариант generate_section.
+        
+        Отдает события по мере генерации:
+        - "delta": очередной фрагмент Markdown от LLM
+        - "html": HTML для завершенных блоков Markdown (инкрементальная конвертация)
+        - "done": итоговый HTML секции после сохранения в deliverable_sections и истории
+        
+        Контент и DeliverableSectionHistory сохраняются только после завершения потока.
+        
+        Args:
+            session: SQLAlchemy асинхронная сессия
+            deliverable_section_id: UUID секции deliverable для генерации
+            changed_by_user_id: UUID пользователя, инициировавшего генерацию (для истории)
+            bypass_cache: Сгенерировать заново, не используя кэш ответов LLM
+            
+        Yields:
+            Словари вида {"event": str, "data": dict}
+            
+        Raises:
+            ValueError: Если секция не найдена или нет данных для генерации
+        """
+        prepared = await self._prepare_generation(session, deliverable_section_id)
+        
+        if prepared["empty_content"] is not None:
+            await self._update_deliverable_section(
+                session, prepared["deliverable_section"], prepared["empty_content"], [], changed_by_user_id, None
+            )
+            yield {"event": "done", "data": {"content": prepared["empty_content"]}}
+            return
+        
+        custom_section = prepared["custom_section"]
+        source_content_data = prepared["source_content_data"]
+        renderer = IncrementalMarkdownRenderer(custom_section.title, self.markdown_renderer)
+        markdown_parts: List[str] = []
+        
+        try:
+            # Same stage as generate_section; includes the time the client takes to read the events
+            with track_stage("llm_generate"):
+                async for delta in self.llm_client.stream_text(
+                    system_prompt=prepared["system_prompt"],
+                    user_prompt=prepared["user_prompt"],
+                    temperature=0.7,
+                    max_tokens=3000,
+                    bypass_cache=bypass_cache
+                ):
+                    markdown_parts.append(delta)
+                    yield {"event": "delta", "data": {"text": delta}}
+                    
+                    html_fragment = renderer.feed(delta)
+                    if html_fragment:
+                        yield {"event": "html", "data": {"html": html_fragment}}
+        except Exception as e:
+            raise Exception(f"Ошибка при генерации секции через LLM: {str(e)}")
+        
+        html_fragment = renderer.flush()
+        if html_fragment:
+            yield {"event": "html", "data": {"html": html_fragment}}
+        
+        # The persisted HTML is rendered from the full text, same as generate_section
+        content_html = self._markdown_to_html("".join(markdown_parts), custom_section.title)
+        trace_info = self._build_trace_info(prepared["mappings"], source_content_data)
+        add_cache_trace(trace_info, self.llm_client, bypass_cache)
+        
+        await self._update_deliverable_section(
+            session,
+            prepared["deliverable_section"],
+            content_html,
+            source_content_data["section_ids"],
+            changed_by_user_id,
+            trace_info
+        )
+        
+        yield {"event": "done", "data": {"content": content_html}}
+    
+    async def _prepare_generation(
+        self,
+        session: AsyncSession,
+        deliverable_section_id: UUID
+    ) -> Dict[str, Any]:
+        """
+        Выполняет все шаги генерации до вызова LLM: загрузку секции,
+        Context Resolution, Data Retrieval, сбор глобального контекста и сборку промптов.
+        
+        Args:
+            session: SQLAlchemy асинхронная сессия
+            deliverable_section_id: UUID секции deliverable для генерации
+            
+        Returns:
+            Словарь с ключами deliverable_section, custom_section, mappings,
+            source_content_data, system_prompt, user_prompt и empty_content
+            (HTML-заглушка, если генерировать не из чего, иначе None)
+            
+        Raises:
+            ValueError: Если секция, шаблонная секция или deliverable не найдены
+        """
         # Получаем deliverable_section с загруженными связями
         deliverable_section_result = await session.execute(
             select(DeliverableSection)
@@ -87,16 +260,23 @@ class Writer:
         
         project_id = deliverable.project_id
         
+        prepared = {
+            "deliverable_section": deliverable_section,
+            "custom_section": custom_section,
+            "mappings": [],
+            "source_content_data": None,
+            "system_prompt": None,
+            "user_prompt": None,
+            "empty_content": None,
+        }
+        
         # Step 1: Context Resolution (Поиск правил)
         mappings, instructions = await self._resolve_context(session, custom_section)
         
         if not mappings:
             # Если нет правил, создаем пустую секцию
-            empty_content = f"<h1>{custom_section.title}</h1><p>Секция требует заполнения.</p>"
-            await self._update_deliverable_section(
-                session, deliverable_section, empty_content, [], changed_by_user_id, None
-            )
-            return empty_content
+            prepared["empty_content"] = f"<h1>{custom_section.title}</h1><p>Секция требует заполнения.</p>"
+            return prepared
         
         # Step 2: Data Retrieval (Фильтрация версий)
         source_content_data = await self._retrieve_source_sections(
@@ -104,50 +284,31 @@ class Writer:
         )
         
         if not source_content_data or not source_content_data["section_ids"]:
-            # Если нет исходных секций, создаем секцию с описанием
-            empty_content = f"<h1>{custom_section.title}</h1><p>Исходные данные для генерации не найдены.</p>"
-            await self._update_deliverable_section(
-                session, deliverable_section, empty_content, [], changed_by_user_id, None
+            # Страховка: гибридный поиск по актуальным документам проекта
+            source_content_data = await self._search_source_sections(
+                session, project_id, custom_section, instructions
             )
-            return empty_content
+        
+        if not source_content_data or not source_content_data["section_ids"]:
+            # Если нет исходных секций, создаем секцию с описанием
+            prepared["empty_content"] = f"<h1>{custom_section.title}</h1><p>Исходные данные для генерации не найдены.</p>"
+            return prepared
         
         # Step 3: Загружаем глобальные переменные
         globals_text = await self._collect_global_context(session, project_id)
         
-        # Step 4: Generation - Формируем промпт и вызываем LLM
+        # Step 4: Формируем промпты
         system_prompt, user_prompt = self._build_prompts(
             custom_section, globals_text, source_content_data, instructions
         )
         
-        try:
-            generated_content = await self.llm_client.generate_text(
-                system_prompt=system_prompt,
-                user_prompt=user_prompt,
-                temperature=0.7,
-                max_tokens=3000
-            )
-            
-            # Преобразуем Markdown в HTML (базовое преобразование)
-            # В продакшене лучше использовать библиотеку markdown или подобную
-            content_html = self._markdown_to_html(generated_content, custom_section.title)
-            
-            # Step 5: Формируем trace_info для audit trail
-            trace_info = self._build_trace_info(mappings, source_content_data)
-            
-            # Step 6: Обновляем deliverable_sections и создаем историю
-            await self._update_deliverable_section(
-                session,
-                deliverable_section,
-                content_html,
-                source_content_data["section_ids"],
-                changed_by_user_id,
-                trace_info
-            )
-            
-            return content_html
-            
-        except Exception as e:
-            raise Exception(f"Ошибка при генерации секции через LLM: {str(e)}")
+        prepared.update({
+            "mappings": mappings,
+            "source_content_data": source_content_data,
+            "system_prompt": system_prompt,
+            "user_prompt": user_prompt,
+        })
+        return prepared
     
     async def _resolve_context(
         self,
@@ -293,26 +454,98 @@ class Writer:
         if not all_sections:
             return None
         
-        # Формируем контент из найденных секций
+        return {
+            "content": self._combine_source_content(source_section for source_section, _ in all_sections),
+            "section_ids": all_section_ids,
+            "mappings_with_sections": all_sections  # Сохраняем информацию о маппингах для trace_info
+        }
+    
+    async def _search_source_sections(
+        self,
+        session: AsyncSession,
+        project_id: UUID,
+        custom_section: CustomSection,
+        instructions: List[str]
+    ) -> Optional[dict]:
+        """
+        Находит исходные секции гибридным поиском (HybridSearch), когда маппинги
+        не нашли секций: запрос - заголовок целевой секции и инструкции маппингов.
+        
+        Args:
+            session: SQLAlchemy асинхронная сессия
+            project_id: UUID проекта
+            custom_section: Целевая секция шаблона
+            instructions: Список инструкций из маппингов
+            
+        Returns:
+            Словарь в формате _retrieve_source_sections (без mappings_with_sections,
+            с результатами поиска в "hybrid_search") или None, если ничего не найдено
+        """
+        if not settings.HYBRID_SEARCH_ENABLED:
+            return None
+        
+        query_text = "\n".join([custom_section.title or "", *instructions]).strip()
+        try:
+            # A savepoint: a failed search (e.g. migration 005 not applied) must not abort
+            # the transaction the section and its history are written to afterwards
+            async with session.begin_nested():
+                results = await self.hybrid_search.search(session, project_id, query_text)
+        except Exception as e:
+            print(f"Ошибка гибридного поиска исходных секций: {str(e)}")
+            return None
+        
+        if not results:
+            return None
+        
+        # Long sections found by their chunks contribute only the matched fragments
+        excerpts = {result["section"].id: result["excerpt"] for result in results if result["excerpt"]}
+        return {
+            "content": self._combine_source_content((result["section"] for result in results), excerpts),
+            "section_ids": [result["section"].id for result in results],
+            "mappings_with_sections": [],
+            "hybrid_search": [
+                {
+                    "source_id": str(result["section"].id),
+                    "score": round(result["score"], 6),
+                    "text_rank": result["text_rank"],
+                    "vector_rank": result["vector_rank"],
+                    "excerpt_chars": len(result["excerpt"]) if result["excerpt"] else None,
+                }
+                for result in results
+            ]
+        }
+    
+    @staticmethod
+    def _combine_source_content(source_sections, excerpts: Optional[Dict[UUID, str]] = None) -> str:
+        """
+        Объединяет контент исходных секций для промпта.
+        
+        Args:
+            source_sections: Итерируемые SourceSection в нужном порядке
+            excerpts: Выдержки из секций по ID (найденные гибридным поиском фрагменты),
+                используются вместо полного текста секции
+            
+        Returns:
+            Контент секций с заголовками, разделенный "---"
+        """
         content_parts = []
         
-        for source_section, mapping in all_sections:
+        for source_section in source_sections:
             header = source_section.header or f"Section {source_section.section_number or 'N/A'}"
             
-            # Используем content_markdown, если есть, иначе content_text
+            # Используем выдержку, если есть, иначе content_markdown или content_text
             # Для manual_entry обрабатываем так же, как для обычных файлов
-            content = source_section.content_markdown or source_section.content_text or ""
+            content = (
+                (excerpts or {}).get(source_section.id)
+                or source_section.content_markdown
+                or source_section.content_text
+                or ""
+            )
             
             if content:
                 content_parts.append(f"**Заголовок:** {header}\n\n**Контент:**\n{content}")
         
-        combined_content = "\n\n---\n\n".join(content_parts)
-        
-        return {
-            "content": combined_content,
-            "section_ids": all_section_ids,
-            "mappings_with_sections": all_sections  # Сохраняем информацию о маппингах для trace_info
-        }
+        return "\n\n---\n\n".join(content_parts)
     
     async def _collect_global_context(
         self,
@@ -389,8 +622,8 @@ class Writer:
     
     def _markdown_to_html(self, markdown_text: str, title: str) -> str:
         """
-        Простое преобразование Markdown в HTML.
-        В продакшене лучше использовать библиотеку markdown или подобную.
+        Преобразует Markdown ответа LLM в HTML (заголовки, списки, таблицы GFM),
+        добавляя заголовок секции, если его нет.
         
         Args:
             markdown_text: Текст в формате Markdown
@@ -399,54 +632,7 @@ class Writer:
         Returns:
             Текст в формате HTML
         """
-        # Базовое преобразование Markdown в HTML
-        # Обрабатываем заголовки
-        lines = markdown_text.split("\n")
-        html_lines = []
-        in_paragraph = False
-        
-        for line in lines:
-            line_stripped = line.strip()
-            
-            # Заголовки
-            if line_stripped.startswith("# "):
-                if in_paragraph:
-                    html_lines.append("</p>")
-                    in_paragraph = False
-                html_lines.append(f"<h1>{line_stripped[2:]}</h1>")
-            elif line_stripped.startswith("## "):
-                if in_paragraph:
-                    html_lines.append("</p>")
-                    in_paragraph = False
-                html_lines.append(f"<h2>{line_stripped[3:]}</h2>")
-            elif line_stripped.startswith("### "):
-                if in_paragraph:
-                    html_lines.append("</p>")
-                    in_paragraph = False
-                html_lines.append(f"<h3>{line_stripped[4:]}</h3>")
-            elif line_stripped == "":
-                # Пустая строка - закрываем параграф
-                if in_paragraph:
-                    html_lines.append("</p>")
-                    in_paragraph = False
-            else:
-                # Обычный текст
-                if not in_paragraph:
-                    html_lines.append("<p>")
-                    in_paragraph = True
-                html_lines.append(line_stripped + " ")
-        
-        # Закрываем последний параграф
-        if in_paragraph:
-            html_lines.append("</p>")
-        
-        html = "".join(html_lines)
-        
-        # Добавляем заголовок, если его нет
-        if not html.strip().startswith("<h1>") and not html.strip().startswith("<h2>"):
-            html = f"<h1>{title}</h1>{html}"
-        
-        return html
+        return self.markdown_renderer.render_section(markdown_text, title)
     
     def _build_trace_info(
         self,
@@ -501,10 +687,14 @@ class Writer:
                 
                 trace_entries.append(entry)
         
-        return {
+        trace_info = {
             "mappings": trace_entries,
             "total_source_sections": len(source_content_data.get("section_ids", []))
         }
+        if "hybrid_search" in source_content_data:
+            # Sections found by the hybrid search fallback, with their RRF scores
+            trace_info["hybrid_search"] = source_content_data["hybrid_search"]
+        return trace_info
     
     async def _update_deliverable_section(
         self,
@@ -585,7 +775,8 @@ class ContentWriter:
         self,
         project_id: UUID,
         target_custom_section_id: UUID,
-        session: AsyncSession
+        session: AsyncSession,
+        bypass_cache: bool = False
     ) -> GenerationResult:
         """
         Генерирует черновик раздела на основе данных из Протокола, используя Граф Шаблонов и Глобальный контекст.
@@ -601,6 +792,7 @@ class ContentWriter:
             project_id: UUID проекта
             target_custom_section_id: UUID целевой пользовательской секции (custom_section_id)
             session: SQLAlchemy асинхронная сессия
+            bypass_cache: Сгенерировать заново, не используя кэш ответов LLM
             
         Returns:
             GenerationResult с сгенерированным контентом и метаданными
@@ -636,12 +828,14 @@ class ContentWriter:
         
         # Step 5: Генерация и Ответ
         try:
-            generated_content = await self.llm_client.generate_text(
-                system_prompt=system_prompt,
-                user_prompt=user_prompt,
-                temperature=0.7,
-                max_tokens=3000
-            )
+            with track_stage("llm_generate"):
+                generated_content = await self.llm_client.generate_text(
+                    system_prompt=system_prompt,
+                    user_prompt=user_prompt,
+                    temperature=0.7,
+                    max_tokens=3000,
+                    bypass_cache=bypass_cache
+                )
         except Exception as e:
             raise Exception(f"Ошибка при генерации контента через LLM: {str(e)}")
         
@@ -664,6 +858,7 @@ class ContentWriter:
         
         # Формируем trace_info для audit trail
         trace_info = self._build_trace_info_for_content_writer(mappings, source_content_data)
+        add_cache_trace(trace_info, self.llm_client, bypass_cache)
         
         return GenerationResult(
             content=generated_content,
@@ -2,12 +2,33 @@
 Celery tasks for document processing.
 Handles async database operations within synchronous Celery workers.
 """
+import os
 from typing import List, Optional
+from uuid import UUID
 from asgiref.sync import async_to_sync
+from celery import chord, group
+from sqlalchemy import select
 
-from celery_app import celery_app
+from celery_app import (
+    celery_app,
+    PRIORITY_HIGH,
+    PRIORITY_LOW,
+    QUEUE_PARSE_BULK,
+    QUEUE_PARSE_INTERACTIVE,
+    QUEUE_PARSE_LARGE,
+)
+from config import settings
 from database import AsyncSessionLocal
+from models import Deliverable, DeliverableSection
+from services import progress
+from services.extractor import GlobalExtractor
+from services.llm import LLMClient
 from services.parser import process_document
+from services.profiling import profile_run
+from services.progress import BatchProgressTracker
+from services.tracing import set_attributes
+from services.writer import Writer
+from services.exporter import export_deliverable_to_file, export_filename, get_exporter, prune_stale_exports
 
 
 @celery_app.task(
@@ -21,8 +42,10 @@ def process_document_task(
     doc_id: str,
     file_url: Optional[str] = None,
     file_path: Optional[str] = None,
-    template_id: Optional[str] = None
-) -> List[dict]:
+    template_id: Optional[str] = None,
+    batch_id: Optional[str] = None,
+    profile: bool = False
+):
     """
     Celery task for processing documents.
     Downloads, parses, classifies sections, and saves to database.
@@ -32,36 +55,333 @@ def process_document_task(
         file_url: URL файла для скачивания (если файл доступен по URL)
         file_path: Путь к файлу в Supabase Storage (если файл в Storage)
         template_id: UUID шаблона документа для классификации секций
+        batch_id: ID пакета загрузки (для прогресса в Redis); см. start_ingestion_batch
+        profile: Профилировать обработку (PROFILING_ENABLED=true); профиль - в parsing_metadata["profile"]
         
     Returns:
-        Список словарей с секциями: [{header: str, content: str, page: int}]
+        Краткий итог {document_id, status, sections_count, page_count, classified_count, section_ids};
+        секции сохранены в source_sections.
+        В пакете после исчерпания попыток - {document_id, status: "error", error}
         
     Raises:
-        Exception: Если произошла ошибка при обработке (будет повторена попытка)
+        Exception: Если произошла ошибка при обработке (будет повторена попытка).
+            В пакете после исчерпания попыток ошибка не пробрасывается, а возвращается
+            в итоге, чтобы остальные документы и финализация пакета продолжились.
     """
+    # Task span is created by the Celery instrumentation (trace context comes in task headers)
+    set_attributes(**{"document.id": doc_id, "batch.id": batch_id, "celery.retries": self.request.retries})
+    
     async def _process():
         """Async wrapper for process_document."""
-        # Create a new async session for this task
-        async with AsyncSessionLocal() as session:
+        tracker = BatchProgressTracker(batch_id) if batch_id else None
+        
+        async def on_stage(stage: str) -> None:
+            # Progress is best effort: a Redis hiccup must not fail the ingestion
             try:
-                # Call the original async process_document function
-                result = await process_document(
-                    doc_id=doc_id,
-                    file_url=file_url,
-                    file_path=file_path,
-                    template_id=template_id,
-                    session=session
-                )
-                return result
+                await tracker.set_stage(doc_id, stage)
             except Exception as e:
-                # Log error and re-raise for Celery retry mechanism
-                print(f"Error processing document {doc_id}: {str(e)}")
-                raise
+                print(f"Failed to report stage {stage} for document {doc_id}: {str(e)}")
+        
+        try:
+            if tracker:
+                await on_stage(progress.STARTED)
+            # process_document owns its session: it commits the result and records
+            # stage checkpoints, so a retry resumes after the last completed stage
+            return await process_document(
+                doc_id=doc_id,
+                file_url=file_url,
+                file_path=file_path,
+                template_id=template_id,
+                on_stage=on_stage if tracker else None,
+                profile=profile
+            )
+        except Exception as e:
+            # Log error and re-raise for Celery retry mechanism
+            print(f"Error processing document {doc_id}: {str(e)}")
+            if tracker and self.request.retries >= self.max_retries:
+                try:
+                    await tracker.set_failed(doc_id, str(e))
+                except Exception:
+                    pass
+            raise
+        finally:
+            if tracker:
+                await tracker.close()
     
     # Execute async function in sync context using async_to_sync
     # This creates a new event loop if needed and runs the async function
     try:
-        return async_to_sync(_process)()
+        result = async_to_sync(_process)()
     except Exception as exc:
+        if batch_id and self.request.retries >= self.max_retries:
+            # A raising header task would fail the whole chord and skip finalization
+            return {"document_id": doc_id, "status": "error", "error": str(exc)}
         # Retry task on failure
         raise self.retry(exc=exc)
+    
+    # Only the summary (plain section ids) goes through the result backend: section contents live in Postgres
+    return result
+
+
+@celery_app.task(
+    bind=True,
+    name="ai_engine.finalize_ingestion_batch",
+    max_retries=2,
+    default_retry_delay=30,
+)
+def finalize_ingestion_batch_task(self, results: List[dict], batch_id: str, project_id: str) -> dict:
+    """
+    Celery chord callback: runs after every document of the batch has finished.
+    Extracts study globals (GlobalExtractor) from the freshly indexed documents.
+    
+    Args:
+        results: Итоги process_document_task по документам пакета
+        batch_id: ID пакета загрузки
+        project_id: UUID проекта
+        
+    Returns:
+        Итог пакета: {batch_id, indexed, failed, globals}, где globals - имена
+        извлеченных переменных (значения сохранены в БД)
+    """
+    indexed = [r["document_id"] for r in results if r.get("status") == "indexed"]
+    failed = [r["document_id"] for r in results if r.get("status") != "indexed"]
+    set_attributes(**{"batch.id": batch_id, "project.id": project_id, "batch.failed": len(failed)})
+    
+    async def _finalize():
+        tracker = BatchProgressTracker(batch_id)
+        try:
+            if not indexed:
+                await tracker.set_status(progress.BATCH_COMPLETED_WITH_ERRORS)
+                return {}
+            
+            await tracker.set_status(progress.BATCH_EXTRACTING)
+            try:
+                async with AsyncSessionLocal() as session:
+                    extractor = GlobalExtractor(LLMClient())
+                    globals_dict = await extractor.extract_globals(session, UUID(project_id))
+                    await session.commit()
+            except Exception as e:
+                if self.request.retries < self.max_retries:
+                    raise
+                await tracker.set_status(progress.BATCH_COMPLETED_WITH_ERRORS, globals_error=str(e))
+                return {}
+            
+            await tracker.set_status(
+                progress.BATCH_COMPLETED_WITH_ERRORS if failed else progress.BATCH_COMPLETED
+            )
+            return globals_dict
+        finally:
+            await tracker.close()
+    
+    try:
+        globals_dict = async_to_sync(_finalize)()
+    except Exception as exc:
+        raise self.retry(exc=exc)
+    
+    return {
+        "batch_id": batch_id,
+        "indexed": len(indexed),
+        "failed": len(failed),
+        "globals": sorted(globals_dict),
+    }
+
+
+def parse_queue(
+    file_size_bytes: Optional[int] = None,
+    page_count: Optional[int] = None,
+    default: str = QUEUE_PARSE_INTERACTIVE
+) -> str:
+    """
+    Выбирает очередь обработки документа по оценке его размера.
+    Большие документы (от PARSE_LARGE_MIN_BYTES или PARSE_LARGE_MIN_PAGES) идут в parse_large,
+    который обслуживает worker с низкой конкурентностью и большим лимитом памяти;
+    документ без оценки размера остается в очереди default.
+    
+    Args:
+        file_size_bytes: Размер файла (известен клиенту после загрузки)
+        page_count: Число страниц, если известно
+        default: Очередь для документов обычного размера
+    """
+    if file_size_bytes and file_size_bytes >= settings.PARSE_LARGE_MIN_BYTES:
+        return QUEUE_PARSE_LARGE
+    if page_count and page_count >= settings.PARSE_LARGE_MIN_PAGES:
+        return QUEUE_PARSE_LARGE
+    return default
+
+
+def start_ingestion_batch(project_id: str, documents: List[dict], batch_id: str):
+    """
+    Запускает пакетную загрузку: group из process_document_task по документам
+    и finalize_ingestion_batch_task после завершения всех (Celery chord).
+    
+    Args:
+        project_id: UUID проекта
+        documents: Список {doc_id, file_url, file_path, template_id} и, если известны,
+            file_size_bytes и page_count (для выбора очереди, см. parse_queue)
+        batch_id: ID пакета (прогресс должен быть зарегистрирован заранее)
+        
+    Returns:
+        AsyncResult chord callback
+    """
+    # Batch documents go to parse_bulk (large ones to parse_large) with low priority,
+    # so interactive uploads are never queued behind them
+    header = group(
+        process_document_task.s(
+            doc_id=document["doc_id"],
+            file_url=document.get("file_url"),
+            file_path=document.get("file_path"),
+            template_id=document.get("template_id"),
+            batch_id=batch_id
+        ).set(
+            queue=parse_queue(document.get("file_size_bytes"), document.get("page_count"), QUEUE_PARSE_BULK),
+            priority=PRIORITY_LOW
+        )
+        for document in documents
+    )
+    callback = finalize_ingestion_batch_task.s(batch_id=batch_id, project_id=project_id).set(priority=PRIORITY_HIGH)
+    return chord(header)(callback)
+
+
+@celery_app.task(
+    bind=True,
+    name="ai_engine.export_deliverable",
+    max_retries=2,
+    default_retry_delay=10,
+)
+def export_deliverable_task(
+    self,
+    deliverable_id: str,
+    reference_docx: Optional[str] = None,
+    export_format: str = "docx",
+    profile: bool = False
+) -> dict:
+    """
+    Celery task for exporting a deliverable (docx, pdf, markdown or html bundle).
+    The file is written to EXPORT_DIR as <task_id>.<extension> and served by the download endpoint;
+    files older than EXPORT_TTL_HOURS are removed when the next export starts.
+    
+    Args:
+        deliverable_id: UUID документа (deliverable) для экспорта
+        reference_docx: Опциональный путь к шаблону DOCX с корпоративными стилями
+        export_format: Формат экспорта (docx, pdf, markdown, html)
+        profile: Профилировать экспорт (PROFILING_ENABLED=true)
+        
+    Returns:
+        Словарь с результатом: {file_path: str, filename: str, media_type: str, size_bytes: int}
+        (и profile - сведения о профиле, если он запрошен)
+        
+    Raises:
+        ValueError: Если deliverable не найден, нет секций или формат не поддерживается (без повторных попыток)
+        Exception: Если произошла ошибка при конвертации (будет повторена попытка)
+    """
+    exporter = get_exporter(export_format)
+    set_attributes(**{"deliverable.id": deliverable_id, "export.format": exporter.format})
+    
+    async def _export():
+        """Async wrapper for export_deliverable_to_file."""
+        async with AsyncSessionLocal() as session:
+            deliverable_uuid = UUID(deliverable_id)
+            result = await session.execute(
+                select(Deliverable.title).where(Deliverable.id == deliverable_uuid)
+            )
+            title = result.scalar_one_or_none()
+            
+            output_path = os.path.join(settings.EXPORT_DIR, f"{self.request.id}.{exporter.extension}")
+            os.makedirs(settings.EXPORT_DIR, exist_ok=True)
+            # Files of earlier jobs are kept for download until EXPORT_TTL_HOURS
+            prune_stale_exports()
+            with profile_run("export_deliverable", profile, **{"deliverable.id": deliverable_id}) as run:
+                await export_deliverable_to_file(
+                    deliverable_id=deliverable_uuid,
+                    db=session,
+                    output_path=output_path,
+                    export_format=exporter.format,
+                    reference_docx=reference_docx
+                )
+            return {
+                "file_path": output_path,
+                "filename": export_filename(title, exporter.extension),
+                "media_type": exporter.media_type,
+                "size_bytes": os.path.getsize(output_path),
+                "profile": run.info if run else None,
+            }
+    
+    try:
+        return async_to_sync(_export)()
+    except ValueError:
+        # Missing deliverable or sections: retrying will not help
+        raise
+    except Exception as exc:
+        raise self.retry(exc=exc)
+
+
+@celery_app.task(
+    bind=True,
+    name="ai_engine.generate_section",
+    max_retries=2,
+    default_retry_delay=30,
+)
+def generate_section_task(
+    self,
+    deliverable_id: str,
+    deliverable_section_id: str,
+    changed_by_user_id: str,
+    regenerate: bool = False,
+    profile: bool = False
+) -> dict:
+    """
+    Celery task for generating a deliverable section (queue: generation).
+    The result is saved to deliverable_sections (with history) by Writer.generate_section.
+    
+    Args:
+        deliverable_id: UUID документа (deliverable)
+        deliverable_section_id: UUID секции deliverable для генерации
+        changed_by_user_id: UUID пользователя, инициировавшего генерацию (для истории)
+        regenerate: Сгенерировать заново, не используя кэш ответов LLM
+        profile: Профилировать генерацию (PROFILING_ENABLED=true)
+        
+    Returns:
+        Словарь с результатом: {deliverable_section_id: str, content_length: int,
+        profile: сведения о профиле или None}; текст секции сохранен в deliverable_sections
+        
+    Raises:
+        ValueError: Если секция не найдена или нет данных для генерации (без повторных попыток)
+        Exception: Если произошла ошибка LLM или БД (будет повторена попытка)
+    """
+    set_attributes(**{"deliverable.id": deliverable_id, "deliverable_section.id": deliverable_section_id})
+    
+    async def _generate():
+        """Async wrapper for Writer.generate_section."""
+        async with AsyncSessionLocal() as session:
+            section_uuid = UUID(deliverable_section_id)
+            result = await session.execute(
+                select(DeliverableSection.id).where(
+                    DeliverableSection.deliverable_id == UUID(deliverable_id),
+                    DeliverableSection.id == section_uuid
+                )
+            )
+            if result.scalar_one_or_none() is None:
+                raise ValueError(f"Deliverable section not found: {deliverable_section_id}")
+            
+            writer = Writer(LLMClient())
+            with profile_run("generate_section", profile, **{"deliverable_section.id": deliverable_section_id}) as run:
+                content = await writer.generate_section(
+                    session=session,
+                    deliverable_section_id=section_uuid,
+                    changed_by_user_id=UUID(changed_by_user_id),
+                    bypass_cache=regenerate
+                )
+            await session.commit()
+            return {
+                "deliverable_section_id": deliverable_section_id,
+                "content_length": len(content),
+                "profile": run.info if run else None,
+            }
+    
+    try:
+        return async_to_sync(_generate)()
+    except ValueError:
+        # Missing section or source data: retrying will not help
+        raise
+    except Exception as exc:
+        raise self.retry(exc=exc)
@@ -0,0 +1,52 @@
+"""
+Тесты полнотекстового запроса гибридного поиска (services/hybrid_search.py).
+"""
+from sqlalchemy.dialects import postgresql
+
+from services.hybrid_search import MAX_QUERY_TERMS, HybridSearch, query_terms
+
+WRITER_QUERY = (
+    "Критерии включения\n"
+    "Перенесите критерии включения из протокола и сохраните нумерацию.\n"
+    "Keep the numbering of the inclusion criteria as in the protocol."
+)
+
+
+def test_query_terms_drop_function_words_and_repeats():
+    assert query_terms(WRITER_QUERY) == [
+        "критерии", "включения", "перенесите", "протокола", "сохраните", "нумерацию",
+        "keep", "numbering", "inclusion", "criteria", "protocol",
+    ]
+
+
+def test_query_terms_split_like_simple_parser():
+    assert query_terms("ECG_v2: 12-lead, 3.1.2 (Day-1)") == ["ecg", "v2", "12", "lead", "day"]
+
+
+def test_query_terms_are_capped():
+    terms = query_terms(" ".join(f"term{index}" for index in range(100)))
+    assert len(terms) == MAX_QUERY_TERMS
+    assert terms[0] == "term0"
+
+
+def test_query_terms_without_content_words():
+    assert query_terms("и в the of, - !") == []
+
+
+def _compile(query_text):
+    query = HybridSearch(llm_client=None)._build_query(
+        "00000000-0000-0000-0000-000000000000", query_text, None, 5
+    )
+    return str(query.compile(dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True}))
+
+
+def test_text_branch_uses_or_query():
+    sql = _compile(WRITER_QUERY)
+    assert "to_tsquery('simple'::regconfig, 'критерии | включения | перенесите" in sql
+    assert "websearch_to_tsquery" not in sql
+
+
+def test_text_branch_is_empty_without_terms():
+    sql = _compile("и the")
+    assert "to_tsquery" not in sql
+    assert "false" in sql
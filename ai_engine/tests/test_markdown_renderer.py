@@ -0,0 +1,138 @@
+"""
+Тесты рендеринга Markdown в HTML (services/markdown_renderer.py) и инкрементального
+рендеринга потоковой генерации (IncrementalMarkdownRenderer).
+"""
+import pytest
+
+from services.markdown_renderer import (
+    IncrementalMarkdownRenderer,
+    MarkdownRenderer,
+    get_markdown_renderer,
+    with_section_title,
+)
+
+SECTION_MARKDOWN = (
+    "Исследование проводится в два этапа.\n"
+    "Второй абзац продолжает первый.\n"
+    "\n"
+    "| Визит | День |\n"
+    "|-------|------|\n"
+    "| V1 | 1 |\n"
+    "| V2 | 14 |\n"
+    "\n"
+    "- Критерий 1\n"
+    "- Критерий 2\n"
+    "  - Подпункт\n"
+    "\n"
+    "1. Скрининг\n"
+    "2. Рандомизация\n"
+    "\n"
+    "## Безопасность\n"
+    "\n"
+    "Препарат ~~не~~ хорошо переносится.\n"
+)
+
+
+@pytest.fixture
+def renderer():
+    return MarkdownRenderer()
+
+
+def test_renders_gfm_table(renderer):
+    html = renderer.render("| a | b |\n|---|---|\n| 1 | 2 |\n")
+    assert "<table>" in html
+    assert "<th>a</th>" in html
+    assert "<td>2</td>" in html
+
+
+def test_renders_lists(renderer):
+    html = renderer.render("- x\n- y\n  - z\n\n1. one\n2. two\n")
+    assert "<ul>\n<li>x</li>" in html
+    assert "<li>y\n<ul>\n<li>z</li>\n</ul>\n</li>" in html
+    assert "<ol>\n<li>one</li>\n<li>two</li>\n</ol>" in html
+
+
+def test_renders_strikethrough(renderer):
+    assert renderer.render("~~old~~ new") == "<p><s>old</s> new</p>\n"
+
+
+def test_escapes_raw_html(renderer):
+    html = renderer.render("<script>alert(1)</script>\n\ntext <b>bold</b>")
+    assert "<script>" not in html
+    assert "&lt;script&gt;alert(1)&lt;/script&gt;" in html
+    assert "&lt;b&gt;bold&lt;/b&gt;" in html
+
+
+@pytest.mark.parametrize("markdown_text", [
+    "[link](javascript:alert(1))",
+    "[link](JavaScript:alert(1))",
+    "[link](vbscript:msgbox(1))",
+    "[link](file:///etc/passwd)",
+    "[link](data:text/html,<script>alert(1)</script>)",
+    "<javascript:alert(1)>",
+])
+def test_drops_dangerous_links(renderer, markdown_text):
+    html = renderer.render(markdown_text)
+    assert "<a " not in html
+    assert "href=" not in html
+
+
+def test_keeps_safe_links_and_data_images(renderer):
+    html = renderer.render("[site](https://example.com) ![img](data:image/png;base64,AAAA)")
+    assert '<a href="https://example.com">site</a>' in html
+    assert '<img src="data:image/png;base64,AAAA" alt="img" />' in html
+
+
+def test_with_section_title_escapes_title():
+    html = with_section_title("<p>text</p>\n", '<img src=x onerror="alert(1)"> & Co')
+    assert html == "<h1>&lt;img src=x onerror=&quot;alert(1)&quot;&gt; &amp; Co</h1>\n<p>text</p>\n"
+
+
+def test_with_section_title_keeps_existing_heading():
+    assert with_section_title("<h2>Цели</h2>\n", "Другой заголовок") == "<h2>Цели</h2>\n"
+    assert with_section_title("<h3>Цели</h3>\n", "Цели").startswith("<h1>Цели</h1>\n")
+
+
+def test_render_section_adds_title(renderer):
+    assert renderer.render_section("Текст", "Цели") == "<h1>Цели</h1>\n<p>Текст</p>\n"
+    assert renderer.render_section("# Цели\n\nТекст", "Другой") == "<h1>Цели</h1>\n<p>Текст</p>\n"
+
+
+def test_split_completed_keeps_last_block_open(renderer):
+    completed, tail = renderer.split_completed("Первый абзац.\n\n| a | b |\n|---|---|\n| 1 |")
+    assert completed == "Первый абзац.\n\n"
+    assert tail == "| a | b |\n|---|---|\n| 1 |"
+    assert renderer.split_completed("Один абзац\nбез конца") == ("", "Один абзац\nбез конца")
+
+
+def test_split_completed_blocks_render_as_whole(renderer):
+    completed, tail = renderer.split_completed(SECTION_MARKDOWN)
+    assert completed + tail == SECTION_MARKDOWN
+    assert renderer.render(completed) + renderer.render(tail) == renderer.render(SECTION_MARKDOWN)
+
+
+@pytest.mark.parametrize("step", [1, 3, 7, 40, len(SECTION_MARKDOWN)])
+def test_incremental_renderer_matches_full_render(renderer, step):
+    incremental = IncrementalMarkdownRenderer("Дизайн исследования", renderer)
+    parts = []
+    for start in range(0, len(SECTION_MARKDOWN), step):
+        html = incremental.feed(SECTION_MARKDOWN[start:start + step])
+        if html:
+            parts.append(html)
+    html = incremental.flush()
+    if html:
+        parts.append(html)
+
+    assert "".join(parts) == renderer.render_section(SECTION_MARKDOWN, "Дизайн исследования")
+
+
+def test_incremental_renderer_escapes_title_once():
+    incremental = IncrementalMarkdownRenderer("<b>Цели</b>")
+    first = incremental.feed("Абзац 1\n\nАбзац 2\n\n")
+    rest = incremental.flush()
+    assert first == "<h1>&lt;b&gt;Цели&lt;/b&gt;</h1>\n<p>Абзац 1</p>\n"
+    assert rest == "<p>Абзац 2</p>\n"
+
+
+def test_get_markdown_renderer_is_shared():
+    assert get_markdown_renderer() is get_markdown_renderer()
@@ -0,0 +1,53 @@
+-- ============================================
+-- Миграция 004: Таблицы исходных документов (source_tables)
+-- Таблица документа хранится один раз, секции ссылаются на нее по ID
+-- ============================================
+
+-- 1. Создание таблицы source_tables
+CREATE TABLE IF NOT EXISTS source_tables (
+    id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    document_id UUID NOT NULL REFERENCES source_documents(id) ON DELETE CASCADE,
+    table_index INTEGER NOT NULL,
+    page_number INTEGER,
+    row_count INTEGER NOT NULL DEFAULT 0,
+    column_count INTEGER NOT NULL DEFAULT 0,
+    content JSONB NOT NULL,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    UNIQUE (document_id, table_index)
+);
+
+COMMENT ON TABLE source_tables IS 'Таблицы исходных документов (по одной записи на таблицу), на которые ссылаются source_sections.content_structure';
+COMMENT ON COLUMN source_tables.table_index IS 'Порядковый номер таблицы в документе';
+COMMENT ON COLUMN source_tables.content IS 'Structured table from Docling: headers, rows, has_merged_cells (JSON format)';
+
+-- 2. Индексы
+CREATE INDEX IF NOT EXISTS idx_source_tables_document_page ON source_tables(document_id, page_number);
+CREATE INDEX IF NOT EXISTS idx_source_tables_content ON source_tables USING GIN(content jsonb_path_ops);
+
+-- Поиск секций по таблице: content_structure @> '{"tables": [{"table_id": "<uuid>"}]}'
+CREATE INDEX IF NOT EXISTS idx_source_sections_content_structure ON source_sections USING GIN(content_structure jsonb_path_ops) WHERE content_structure IS NOT NULL;
+
+COMMENT ON COLUMN source_sections.content_structure IS 'References to source_tables: {"tables": [{"table_id", "table_index", "row_start", "row_end"}], "table_count"}; legacy rows contain table copies';
+
+-- 3. RLS: таблицы видны участникам проекта документа (записывает AI Engine)
+ALTER TABLE source_tables ENABLE ROW LEVEL SECURITY;
+
+DROP POLICY IF EXISTS "Project members can read tables" ON source_tables;
+
+CREATE POLICY "Project members can read tables"
+ON source_tables FOR SELECT
+USING (
+  EXISTS (
+    SELECT 1 FROM source_documents
+    JOIN project_members ON project_members.project_id = source_documents.project_id
+    WHERE source_documents.id = source_tables.document_id
+    AND project_members.user_id = auth.uid()
+  )
+  OR
+  EXISTS (
+    SELECT 1 FROM source_documents
+    JOIN projects ON projects.id = source_documents.project_id
+    WHERE source_documents.id = source_tables.document_id
+    AND is_org_admin(projects.organization_id, auth.uid())
+  )
+);
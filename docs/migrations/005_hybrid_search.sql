@@ -0,0 +1,34 @@
+-- ============================================
+-- Миграция 005: Гибридный поиск по source_sections
+-- Полнотекстовый индекс (tsvector + GIN) и HNSW индекс эмбеддингов
+-- ============================================
+
+-- 1. Полнотекстовое представление секции: заголовок (вес A) и чистый текст (вес B)
+-- Конфигурация 'simple' - без стемминга, одинаково для русских и английских документов
+ALTER TABLE source_sections
+ADD COLUMN IF NOT EXISTS content_tsv TSVECTOR
+GENERATED ALWAYS AS (
+    setweight(to_tsvector('simple', coalesce(header, '')), 'A') ||
+    setweight(to_tsvector('simple', coalesce(content_text, '')), 'B')
+) STORED;
+
+COMMENT ON COLUMN source_sections.content_tsv IS 'Full-text representation of header and content_text for hybrid search (generated)';
+
+CREATE INDEX IF NOT EXISTS idx_source_sections_content_tsv ON source_sections USING GIN(content_tsv);
+
+-- 2. HNSW вместо IVFFlat для эмбеддингов: не требует обучения на данных (IVFFlat, созданный
+-- на пустой таблице, дает плохой recall) и стабильно отвечает за миллисекунды на 1M+ секций.
+-- На большой таблице выполнять вне транзакции: CREATE INDEX CONCURRENTLY ...
+CREATE INDEX IF NOT EXISTS idx_source_sections_embedding_hnsw
+ON source_sections USING hnsw (embedding vector_cosine_ops)
+WITH (m = 16, ef_construction = 64);
+
+DROP INDEX IF EXISTS idx_source_sections_embedding;
+
+-- 3. Фильтр по проекту: актуальные версии документов проекта
+CREATE INDEX IF NOT EXISTS idx_source_documents_project_current
+ON source_documents(project_id)
+WHERE is_current_version = TRUE;
+
+-- 4. Статистика для планировщика после добавления колонки
+ANALYZE source_sections;
@@ -0,0 +1,61 @@
+-- ============================================
+-- Миграция 006: Фрагменты секций с эмбеддингами (source_section_chunks)
+-- Длинные секции делятся на перекрывающиеся фрагменты с собственными эмбеддингами
+-- ============================================
+
+-- 1. Создание таблицы source_section_chunks
+CREATE TABLE IF NOT EXISTS source_section_chunks (
+    id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    section_id UUID NOT NULL REFERENCES source_sections(id) ON DELETE CASCADE,
+    document_id UUID NOT NULL REFERENCES source_documents(id) ON DELETE CASCADE,
+    chunk_index INTEGER NOT NULL,
+    content TEXT NOT NULL,
+    token_count INTEGER NOT NULL,
+    char_start INTEGER NOT NULL,
+    char_end INTEGER NOT NULL,
+    embedding vector(1536),
+    created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    UNIQUE (section_id, chunk_index)
+);
+
+COMMENT ON TABLE source_section_chunks IS 'Overlapping token-bounded fragments of source_sections.content_text with their own embeddings (vector search)';
+COMMENT ON COLUMN source_section_chunks.document_id IS 'Document of the section (denormalized: the search filters chunks by current documents of the project)';
+COMMENT ON COLUMN source_section_chunks.char_start IS 'Start of the fragment in source_sections.content_text';
+COMMENT ON COLUMN source_section_chunks.char_end IS 'End of the fragment in source_sections.content_text';
+
+-- 2. Индексы
+CREATE INDEX IF NOT EXISTS idx_source_section_chunks_document_id ON source_section_chunks(document_id);
+
+-- Векторный поиск по фрагментам (как idx_source_sections_embedding_hnsw, миграция 005).
+-- На большой таблице выполнять вне транзакции: CREATE INDEX CONCURRENTLY ...
+CREATE INDEX IF NOT EXISTS idx_source_section_chunks_embedding_hnsw
+ON source_section_chunks USING hnsw (embedding vector_cosine_ops)
+WITH (m = 16, ef_construction = 64);
+
+-- Документы, обработанные до миграции, получают фрагменты при повторной обработке;
+-- до этого векторная ветка гибридного поиска их не находит (полнотекстовая находит)
+
+ANALYZE source_section_chunks;
+
+-- 3. RLS: фрагменты видны участникам проекта документа (записывает AI Engine)
+ALTER TABLE source_section_chunks ENABLE ROW LEVEL SECURITY;
+
+DROP POLICY IF EXISTS "Project members can read section chunks" ON source_section_chunks;
+
+CREATE POLICY "Project members can read section chunks"
+ON source_section_chunks FOR SELECT
+USING (
+  EXISTS (
+    SELECT 1 FROM source_documents
+    JOIN project_members ON project_members.project_id = source_documents.project_id
+    WHERE source_documents.id = source_section_chunks.document_id
+    AND project_members.user_id = auth.uid()
+  )
+  OR
+  EXISTS (
+    SELECT 1 FROM source_documents
+    JOIN projects ON projects.id = source_documents.project_id
+    WHERE source_documents.id = source_section_chunks.document_id
+    AND is_org_admin(projects.organization_id, auth.uid())
+  )
+);
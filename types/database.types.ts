@@ -722,6 +722,60 @@ export type Database = {
           },
         ]
       }
+      source_section_chunks: {
+        Row: {
+          char_end: number
+          char_start: number
+          chunk_index: number
+          content: string
+          created_at: string
+          document_id: string
+          embedding: string | null
+          id: string
+          section_id: string
+          token_count: number
+        }
+        Insert: {
+          char_end: number
+          char_start: number
+          chunk_index: number
+          content: string
+          created_at?: string
+          document_id: string
+          embedding?: string | null
+          id?: string
+          section_id: string
+          token_count: number
+        }
+        Update: {
+          char_end?: number
+          char_start?: number
+          chunk_index?: number
+          content?: string
+          created_at?: string
+          document_id?: string
+          embedding?: string | null
+          id?: string
+          section_id?: string
+          token_count?: number
+        }
+        Relationships: [
+          {
+            foreignKeyName: "source_section_chunks_document_id_fkey"
+            columns: ["document_id"]
+            isOneToOne: false
+            referencedRelation: "source_documents"
+            referencedColumns: ["id"]
+          },
+          {
+            foreignKeyName: "source_section_chunks_section_id_fkey"
+            columns: ["section_id"]
+            isOneToOne: false
+            referencedRelation: "source_sections"
+            referencedColumns: ["id"]
+          },
+        ]
+      }
       source_sections: {
         Row: {
           bbox: Json | null
@@ -729,6 +783,7 @@ export type Database = {
           content_markdown: string | null
           content_structure: Json | null
           content_text: string | null
+          content_tsv: unknown | null
           created_at: string | null
           custom_section_id: string | null
           document_id: string | null
@@ -745,6 +800,7 @@ export type Database = {
           content_markdown?: string | null
           content_structure?: Json | null
           content_text?: string | null
+          content_tsv?: unknown | null
           created_at?: string | null
           custom_section_id?: string | null
           document_id?: string | null
@@ -761,6 +817,7 @@ export type Database = {
           content_markdown?: string | null
           content_structure?: Json | null
           content_text?: string | null
+          content_tsv?: unknown | null
           created_at?: string | null
           custom_section_id?: string | null
           document_id?: string | null
@@ -788,6 +845,47 @@ export type Database = {
           },
         ]
       }
+      source_tables: {
+        Row: {
+          column_count: number
+          content: Json
+          created_at: string
+          document_id: string
+          id: string
+          page_number: number | null
+          row_count: number
+          table_index: number
+        }
+        Insert: {
+          column_count?: number
+          content: Json
+          created_at?: string
+          document_id: string
+          id?: string
+          page_number?: number | null
+          row_count?: number
+          table_index: number
+        }
+        Update: {
+          column_count?: number
+          content?: Json
+          created_at?: string
+          document_id?: string
+          id?: string
+          page_number?: number | null
+          row_count?: number
+          table_index?: number
+        }
+        Relationships: [
+          {
+            foreignKeyName: "source_tables_document_id_fkey"
+            columns: ["document_id"]
+            isOneToOne: false
+            referencedRelation: "source_documents"
+            referencedColumns: ["id"]
+          },
+        ]
+      }
       study_globals: {
         Row: {
           created_at: string | null